@@ -0,0 +1,83 @@
+"""
+Compare the throughput (samples/sec) of one epoch over a synthetic dataset with:
+
+- ``PrefeaturizedTorchDataset`` + DataLoader (per-sample tensors, default collation)
+- ``StackedTorchDataset.as_dataloader()`` (one gather per batch)
+- ``ShardedIterableTorchDataset`` read from disk, for each ``--workers`` count
+
+Usage:
+
+    python devtools/scripts/benchmark_torch_datasets.py --samples 100000 --features 1024
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from kinoml.datasets.arrays import write_xy
+from kinoml.datasets.torch_datasets import (
+    PrefeaturizedTorchDataset,
+    ShardedIterableTorchDataset,
+    StackedTorchDataset,
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, default=50_000)
+    parser.add_argument("--features", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--shuffle", action="store_true")
+    parser.add_argument("--pin-memory", action="store_true")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--shard-size", type=int, default=10_000)
+    parser.add_argument("--shuffle-buffer", type=int, default=0)
+    parser.add_argument("--workers", type=int, nargs="*", default=[0, 1, 2, 4])
+    return parser.parse_args()
+
+
+def throughput(loader, n_samples, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for X, y in loader:
+            X.sum()  # make sure the batch is materialized
+        best = min(best, time.perf_counter() - start)
+    return n_samples / best
+
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(0)
+    X = rng.random((args.samples, args.features), dtype="float32")
+    y = rng.random(args.samples, dtype="float32")
+
+    baseline = PrefeaturizedTorchDataset(X, y).as_dataloader(
+        batch_size=args.batch_size, shuffle=args.shuffle
+    )
+    stacked = StackedTorchDataset(X, y, pin_memory=args.pin_memory).as_dataloader(
+        batch_size=args.batch_size, shuffle=args.shuffle
+    )
+    print(f"{args.samples} samples x {args.features} features, batch size {args.batch_size}")
+    print(f"device: {'cuda' if torch.cuda.is_available() else 'cpu'}")
+    loaders = {"PrefeaturizedTorchDataset": baseline, "StackedTorchDataset": stacked}
+    for name, loader in loaders.items():
+        rate = throughput(loader, args.samples, args.repeats)
+        print(f"{name:>26}: {rate:>14,.0f} samples/sec")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_xy(f"{tmp}/shards", X, y, shard_size=args.shard_size)
+        dataset = ShardedIterableTorchDataset(path, shuffle_buffer=args.shuffle_buffer)
+        for workers in args.workers:
+            loader = torch.utils.data.DataLoader(
+                dataset, batch_size=args.batch_size, num_workers=workers
+            )
+            rate = throughput(loader, args.samples, args.repeats)
+            name = f"Sharded ({workers} workers)"
+            print(f"{name:>26}: {rate:>14,.0f} samples/sec")
+
+
+if __name__ == "__main__":
+    main()
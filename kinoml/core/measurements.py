@@ -24,6 +24,13 @@ from .systems import System
 LN10 = np.log(10)
 
 
+def _log(x):
+    """
+    ``np.log``, except that torch tensors (per-sample parameters) stay on their device
+    """
+    return x.log() if type(x).__module__.startswith("torch") else np.log(x)
+
+
 class BaseMeasurement:
     """
     We will have several subclasses depending on the experiment.
@@ -40,7 +47,7 @@ class BaseMeasurement:
     errors : float or array-like of floats, optional
         The associated errors to ``values``. Must be same
         shape as ``values``. If float, it will be
-        reshaped to a single-element array.
+        used for every replicate in ``values``.
     conditions : AssayConditions
         Experimental conditions of this measurement
     system : System
@@ -77,8 +84,10 @@ class BaseMeasurement:
         metadata: dict = None,
         **kwargs,
     ):
-        self._values = np.reshape(values, (1,))
-        self._errors = np.reshape(errors, (1,))
+        self._values = np.ravel(values)
+        self._errors = np.ravel(errors)
+        if self._errors.shape == (1,) and self._values.shape != (1,):
+            self._errors = np.repeat(self._errors, self._values.shape[0])
         self.conditions = conditions
         self.system = system
         self.group = group
@@ -211,7 +220,7 @@ class PercentageDisplacementMeasurement(ObservationModelMeasurement):
     def check(self):
         super().check()
         assert (
-            self.RANGE[0] <= self.values <= self.RANGE[1]
+            (self.RANGE[0] <= self.values) & (self.values <= self.RANGE[1])
         ).all(), "One or more values are not in [0, 100]"
 
     @staticmethod
@@ -324,7 +333,7 @@ class pIC50Measurement(ObservationModelMeasurement):
     def _observation_model_pytorch(
         dG_over_KT, substrate_conc=1e-6, michaelis_constant=1, standard_conc=1, **kwargs
     ):
-        constant = np.log((1 + substrate_conc / michaelis_constant) * standard_conc)
+        constant = _log((1 + substrate_conc / michaelis_constant) * standard_conc)
         return -(dG_over_KT + constant) / LN10
 
     # implementation does not rely on any torch.* methods so we can just reuse it
@@ -364,7 +373,7 @@ class pIC50Measurement(ObservationModelMeasurement):
     def check(self):
         super().check()
         msg = f"Values for {self.__class__.__name__} are expected to be in the [0, 15] range."
-        assert (self.RANGE[0] <= self.values <= self.RANGE[1]).all(), msg
+        assert ((self.RANGE[0] <= self.values) & (self.values <= self.RANGE[1])).all(), msg
 
 
 class pKiMeasurement(ObservationModelMeasurement):
@@ -386,7 +395,7 @@ class pKiMeasurement(ObservationModelMeasurement):
 
     @staticmethod
     def _observation_model_pytorch(dG_over_KT, standard_conc=1, **kwargs):
-        return -(dG_over_KT + np.log(standard_conc)) / LN10
+        return -(dG_over_KT + _log(standard_conc)) / LN10
 
     # implementation does not rely on any torch.* methods so we can just reuse it
     # for other backends via aliases
@@ -410,7 +419,7 @@ class pKiMeasurement(ObservationModelMeasurement):
     def check(self):
         super().check()
         msg = f"Values for {self.__class__.__name__} are expected to be in the [0, 15] range."
-        assert (self.RANGE[0] <= self.values <= self.RANGE[1]).all(), msg
+        assert ((self.RANGE[0] <= self.values) & (self.values <= self.RANGE[1])).all(), msg
 
 
 class pKdMeasurement(ObservationModelMeasurement):
@@ -433,7 +442,7 @@ class pKdMeasurement(ObservationModelMeasurement):
 
     @staticmethod
     def _observation_model_pytorch(dG_over_KT, standard_conc=1, **kwargs):
-        return -(dG_over_KT + np.log(standard_conc)) / LN10
+        return -(dG_over_KT + _log(standard_conc)) / LN10
 
     # implementation does not rely on any torch.* methods so we can just reuse it
     # for other backends via aliases
@@ -457,7 +466,7 @@ class pKdMeasurement(ObservationModelMeasurement):
     def check(self):
         super().check()
         msg = f"Values for {self.__class__.__name__} are expected to be in the [0, 15] range."
-        assert (self.RANGE[0] <= self.values <= self.RANGE[1]).all(), msg
+        assert ((self.RANGE[0] <= self.values) & (self.values <= self.RANGE[1])).all(), msg
 
 
 def null_observation_model(arg):
@@ -474,3 +483,75 @@ def null_observation_model(arg):
         DeprecationWarning,
     )
     return arg
+
+
+def observation_model_parameters(measurement_type, backend="pytorch") -> dict:
+    """
+    Keyword parameters of the observation model of ``measurement_type``,
+    with their default values (e.g. ``{"standard_conc": 1}`` for ``pKdMeasurement``)
+    """
+    import inspect
+
+    signature = inspect.signature(measurement_type.observation_model(backend=backend))
+    return {
+        name: parameter.default
+        for name, parameter in signature.parameters.items()
+        if parameter.default is not inspect.Parameter.empty
+    }
+
+
+def mixed_observation_model(measurement_types: Iterable, parameters: Iterable[str] = ()):
+    """
+    PyTorch observation model for batches that mix several measurement types.
+
+    Every type's model is evaluated over the whole batch and the right result
+    is picked per sample with ``torch.where``, so a batch takes a single pass
+    with no data-dependent indexing (nor host/device synchronization).
+    Unselected samples are evaluated at ``dG_over_KT = 0`` with default
+    parameters, which keeps their (discarded) outputs and gradients finite.
+
+    Parameters
+    ----------
+    measurement_types : list of ObservationModelMeasurement subclasses
+        Sample ``i`` is of type ``measurement_types[types[i]]``
+    parameters : list of str, optional
+        Names of the ``conditions`` columns, as returned by
+        ``observation_model_parameters`` (e.g. ``"inhibitor_conc"``).
+        NaN entries fall back to the default of each observation model.
+
+    Returns
+    -------
+    callable
+        ``observation_model(dG_over_KT, types, conditions=None)``, where ``types``
+        holds one integer code per sample and ``conditions`` is a
+        ``(n_samples, len(parameters))`` tensor
+    """
+    from functools import partial
+
+    models = [
+        (type_.observation_model(backend="pytorch"), observation_model_parameters(type_))
+        for type_ in measurement_types
+    ]
+    # a partial (unlike a closure) can be pickled into DataLoader worker processes
+    return partial(_mixed_observation_model, models, list(parameters))
+
+
+def _mixed_observation_model(models, parameters, dG_over_KT, types, conditions=None):
+    import torch
+
+    shape = (-1,) + (1,) * (dG_over_KT.dim() - 1)
+    types = types.reshape(shape)
+    zeros = torch.zeros_like(dG_over_KT)
+    predicted = zeros
+    for code, (model, defaults) in enumerate(models):
+        mask = types == code
+        kwargs = {}
+        for name, default in defaults.items():
+            if conditions is None or name not in parameters:
+                continue
+            column = conditions[:, parameters.index(name)].reshape(shape)
+            column = column.to(dG_over_KT.dtype)
+            kwargs[name] = torch.where(mask & ~torch.isnan(column), column, default)
+        values = model(torch.where(mask, dG_over_KT, zeros), **kwargs)
+        predicted = torch.where(mask, values, predicted)
+    return predicted
@@ -2,11 +2,11 @@
 Sequence-like objects to build MolecularComponents and others.
 """
 from string import ascii_letters
-from collections import Counter
+from functools import lru_cache
 import logging
 import re
 import json
-from typing import Union, Iterable
+from typing import Union, Iterable, List
 
 import requests
 
@@ -17,12 +17,6 @@ class Biosequence(str):
     """
     Base class for string representations of biological polymers
     (nucleic acids, peptides, proteins...)
-
-    Note
-    ----
-    How to handle several mutations at the same time, while
-    keeping indices relevant (after a deletion, a replacement
-    or insertion position might be wrong).
     """
 
     ALPHABET = set(ascii_letters)
@@ -154,16 +148,27 @@ class Biosequence(str):
         """
         Apply a mutation on the sequence using biological notation.
 
+        All mutations are parsed and validated against the coordinates of
+        the original sequence first, so positions do not drift after
+        insertions or deletions. The edited sequence is then built in a
+        single pass.
+
         Parameters
         ----------
         mutations : str
-            Mutations to be applied. Indices are always 1-indexed. It can be one of:
+            Mutations to be applied. Indices are always 1-indexed and refer to
+            the original sequence. It can be one of:
             (1) substitution, like ``C234T`` (C at position 234 will be replaced by T);
             (2) deletion, like ``L746-A750del`` (delete everything between L at position 746
             A at position 750, bounds not included);
             (3) insertion, like ``1151Tins`` (insert a T after position 1151)
         raise_errors : bool, optional=True
-            Raise ``ValueError`` if one of the mutations is not supported.
+            Raise ``ValueError`` if one of the mutations is not supported, its
+            wild-type elements (e.g. ``C`` in ``C234T``) do not match this
+            sequence, or the mutations cannot be applied together. Otherwise,
+            unsupported mutations are skipped, mismatches are applied with a
+            warning, and ``None`` is returned if the mutations overlap or fall
+            out of the sequence.
 
         Returns
         -------
@@ -179,115 +184,176 @@ class Biosequence(str):
         "ATTHCTCH"
         >>> s.mutate("5Tins")
         "ATCGTTHCTCH"
+        >>> s.mutate("A1T", "T2-G4del", "5Tins")
+        "TTGTTHCTCH"
         """
-        # We can only handle one insertion or deletion at once now
-        mutation_types = {m: self._type_mutation(m, raise_errors) for m in mutations}
-        mutation_count = Counter(mutation_types.values())
-        if mutation_count["insertion"] + mutation_count["deletion"] > 1:
-            msg = f"Only one simultaneous insertion or deletion is currently supported. You provided `{','.join(mutations)}`"
+        try:
+            edits = self._edits_for(mutations, raise_errors=raise_errors)
+        except ValueError as exc:
             if raise_errors:
-                raise ValueError(msg)
-            logger.warning("Warning: %s", msg)
+                raise
+            logger.warning("Warning: %s", exc)
             return None
+        return self._apply_edits(edits, mutations)
 
-        # Reverse alphabetical order (substitutions will come first)
-        mutated = self
-        for mutation in sorted(mutations, key=lambda m: mutation_count[m], reverse=True):
-            if None in (mutation, mutation_types[mutation]):
-                continue
-            operation = getattr(mutated, f"_mutate_with_{mutation_types[mutation]}")
-            mutated = operation(mutation)
-        mutated.name += f" (mutations: {', '.join(mutations)})"
-        mutated.metadata.update({"mutations": mutations})
-        return mutated
-
-    @staticmethod
-    def _type_mutation(mutation, raise_errors=True):
-        """
-        Guess which kind of operation ``mutation`` is asking for.
-        """
-        if "ins" in mutation:
-            return "insertion"
-        if "del" in mutation:
-            return "deletion"
-        if re.search(r"([A-Z])(\d+)([A-Z])", mutation) is not None:
-            return "substitution"
-        if raise_errors:
-            raise ValueError(f"Mutation `{mutation}` is not recognized")
-
-    def _mutate_with_substitution(self, mutation: str) -> "Biosequence":
+    def mutate_many(
+        self, *variants: Union[str, Iterable[str]], raise_errors: bool = True
+    ) -> List["Biosequence"]:
         """
-        Given ``XYYYZ``, replace element ``X`` at position ``YYY`` with ``Z``.
+        Generate many mutated variants of this sequence at once, e.g. for
+        saturation mutagenesis scans. Each mutation string is only parsed
+        once, even if it appears in several variants.
 
         Parameters
         ----------
-        mutation : str
-            Replacement to apply. It must be formatted as
-            ``[existing element][1-indexed position][new element]``
+        variants : str or list of str
+            Each variant is a mutation string or a collection of mutation
+            strings to be applied together, as accepted by ``.mutate()``.
+        raise_errors : bool, optional=True
+            Same as in ``.mutate()``. If False, variants that cannot be built
+            are returned as ``None``.
 
         Returns
         -------
-        Biosequence
-            Replaced sequence
+        list of Biosequence
+
+        Examples
+        --------
+        >>> s = Biosequence("ATCG")
+        >>> s.mutate_many("A1T", ("A1T", "C3G"), "2Cins")
+        ["TTCG", "TTGG", "ATCCG"]
+        >>> scan = [f"{s[i]}{i + 1}{new}" for i in range(len(s)) for new in "ATCG" if new != s[i]]
+        >>> len(s.mutate_many(*scan))
+        12
         """
-        # replacement: e.g. C1156Y
-        search = re.search(r"([A-Z])(\d+)([A-Z])", mutation)
-        if search is None:
-            raise ValueError(f"Mutation `{mutation}` is not a valid substitution.")
-        old, position, new = search.groups()
-        assert (
-            new in self.ALPHABET
-        ), f"{new} is not a valid {self.__class__.__name__} character ({self.ALPHABET})"
-        index = int(position) - 1
-        return self.__class__(f"{self[:index]}{new}{self[index+1:]}")
-
-    def _mutate_with_deletion(self, mutation: str) -> "Biosequence":
+        results = []
+        for variant in variants:
+            if isinstance(variant, str):
+                variant = (variant,)
+            results.append(self.mutate(*variant, raise_errors=raise_errors))
+        return results
+
+    def _edits_for(self, mutations: Iterable[str], raise_errors: bool = True) -> list:
         """
-        Given ``AXXX-BYYYdel``, delete everything between elements ``A`` and ``B`` at positions
-        ``XXX`` and ``YYY``, respectively. ``A`` and ``B`` will still be part of the resulting sequence.
-
-        Parameters
-        ----------
-        mutation : str
-            Replacement to apply. It must be formatted as
-            ``[starting element][1-indexed starting position]-[ending element][1-indexed ending position]del``
+        Parse ``mutations`` into ``(start, end, replacement)`` edits, in
+        0-indexed, end-exclusive coordinates of this sequence, sorted by position.
+
+        Raises
+        ------
+        ValueError
+            If a mutation is not supported or names a wild-type element that
+            does not match this sequence (only if ``raise_errors``; otherwise
+            a warning is logged), uses characters out of the alphabet, falls
+            out of the sequence, or overlaps with another mutation.
+        """
+        edits = []
+        for order, mutation in enumerate(mutations):
+            edit = self._parse_mutation(mutation)
+            if edit is None:
+                if raise_errors:
+                    raise ValueError(f"Mutation `{mutation}` is not recognized")
+                continue
+            start, end, replacement, wildtype = edit
+            if not 0 <= start <= end <= len(self):
+                raise ValueError(
+                    f"Mutation `{mutation}` falls out of the sequence (length {len(self)})"
+                )
+            mismatches = [
+                f"{residue}{index + 1} is {self[index] if 0 <= index < len(self) else 'missing'}"
+                for index, residue in wildtype
+                if not 0 <= index < len(self) or self[index] != residue
+            ]
+            if mismatches:
+                msg = f"Mutation `{mutation}` does not match the sequence: {', '.join(mismatches)}"
+                if raise_errors:
+                    raise ValueError(msg)
+                logger.warning("Warning: %s", msg)
+            if not set(replacement).issubset(self.ALPHABET):
+                raise ValueError(
+                    f"Mutation `{mutation}` uses characters not in {self.ALPHABET}"
+                )
+            # order keeps insertions at the same position in the given order
+            edits.append((start, end, order, replacement, mutation))
+        edits.sort()
+
+        for previous, current in zip(edits, edits[1:]):
+            if current[0] < previous[1]:
+                raise ValueError(f"Mutations `{previous[4]}` and `{current[4]}` overlap")
+        return [(start, end, replacement) for start, end, _, replacement, _ in edits]
+
+    def _apply_edits(self, edits: list, mutations: Iterable[str]) -> "Biosequence":
+        """
+        Build the edited sequence in one pass. ``edits`` must have been validated
+        by ``._edits_for()``, so the alphabet check in ``__new__`` is skipped.
+        """
+        pieces = []
+        cursor = 0
+        for start, end, replacement in edits:
+            pieces.append(self[cursor:start])
+            pieces.append(replacement)
+            cursor = end
+        pieces.append(self[cursor:])
+        return self._from_validated(
+            "".join(pieces),
+            name=f"{self.name}{' ' if self.name else ''}(mutations: {', '.join(mutations)})",
+            metadata={"mutations": mutations},
+        )
 
-        Returns
-        -------
-        Biosequence
-            Edited sequence
+    @classmethod
+    def _from_validated(cls, value: str, name: str = "", metadata: dict = None) -> "Biosequence":
         """
-        # deletion: e.g. L746-A750del
-        search = re.search(r"[A-Z](\d+)-[A-Z](\d+)del", mutation)
-        if search is None:
-            raise ValueError(f"Mutation `{mutation}` is not a valid deletion.")
-        start = int(search.group(1))
-        end = int(search.group(2)) - 1
-        return self.__class__(f"{self[:start]}{self[end:]}")
-
-    def _mutate_with_insertion(self, mutation: str) -> "Biosequence":
+        Build a new instance without checking ``value`` against the alphabet.
+        Only use with strings known to be valid.
         """
-        Given ``XXXAdel``, insert element ``A`` at position ``XXX``.
+        s = str.__new__(cls, value)
+        s.name = name
+        s.sequence = value
+        s.metadata = dict(metadata or {})
+        return s
 
-        Parameters
-        -----------
-        mutation : str
-            Insertion to apply. It must be formatted as
-            ``[1-indexed insert position][element to be inserted]ins``
+    @staticmethod
+    @lru_cache(maxsize=100_000)
+    def _parse_mutation(mutation: str) -> Union[tuple, None]:
+        """
+        Translate a mutation string into a ``(start, end, replacement, wildtype)``
+        edit, using 0-indexed, end-exclusive positions of the original sequence.
+        ``wildtype`` holds the ``(index, element)`` pairs the mutation string
+        expects in the original sequence. Supported formats:
+
+        - Substitution: ``[existing element][1-indexed position][new element]``,
+          e.g. ``C1156Y``, replaces the element at position ``1156``.
+        - Deletion: ``[starting element][1-indexed starting position]-[ending element]
+          [1-indexed ending position]del``, e.g. ``L746-A750del``, deletes everything
+          between both positions. Bounds are kept in the resulting sequence.
+        - Insertion: ``[1-indexed insert position][elements to be inserted]ins``,
+          e.g. ``1151Tins``, inserts the elements after position ``1151``.
 
         Returns
         -------
-        Biosequence
-            Edited sequence
+        tuple or None
+            ``None`` if ``mutation`` is not recognized.
         """
-        # insertion: e.g. 1151Tins
-        search = re.search(r"(\d+)([A-Z]+)ins", mutation)
-        if search is None:
-            raise ValueError(f"Mutation `{mutation}` is not a valid insertion.")
-        position = int(search.group(1))
-        residue = search.group(2)
-        assert all(r in self.ALPHABET for r in residue)
-        return self.__class__(f"{self[:position]}{residue}{self[position:]}")
+        if "ins" in mutation:
+            search = re.search(r"(\d+)([A-Z]+)ins", mutation)
+            if search is None:
+                raise ValueError(f"Mutation `{mutation}` is not a valid insertion.")
+            position = int(search.group(1))
+            return position, position, search.group(2), ()
+        if "del" in mutation:
+            search = re.search(r"([A-Z])(\d+)-([A-Z])(\d+)del", mutation)
+            if search is None:
+                raise ValueError(f"Mutation `{mutation}` is not a valid deletion.")
+            first, start, last, end = search.groups()
+            start, end = int(start), int(end) - 1
+            if end < start:
+                raise ValueError(f"Mutation `{mutation}` is not a valid deletion.")
+            return start, end, "", ((start - 1, first), (end, last))
+        search = re.search(r"([A-Z])(\d+)([A-Z])", mutation)
+        if search is not None:
+            old, position, new = search.groups()
+            index = int(position) - 1
+            return index, index + 1, new, ((index, old),)
+        return None
 
 
 class DNASequence(Biosequence):
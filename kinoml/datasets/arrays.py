@@ -0,0 +1,187 @@
+"""
+On-disk ``X``/``y`` arrays that can be memory-mapped.
+
+A dataset is a directory with:
+
+- ``X.npy`` and ``y.npy``, or shards ``X.00000.npy``, ``y.00000.npy``, ...
+  with the same number of rows in each ``X``/``y`` pair
+- optionally, ``idx_train.npy``, ``idx_test.npy`` and ``idx_val.npy``: row
+  indices of each subset, over all shards
+- ``shards.json``: file names and number of rows of each shard, written by
+  ``write_xy`` so readers can plan their work without opening the arrays
+
+Uncompressed ``.npz`` files (as written by ``np.savez``) with the same keys
+are supported too. Their members are memory-mapped in place.
+"""
+import json
+import os
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+
+SPLITS = ("train", "test", "val")
+MANIFEST = "shards.json"
+
+
+def memmap_npz(path: Union[str, Path]) -> dict:
+    """
+    Memory-map every member of an uncompressed ``.npz`` file
+
+    Returns
+    -------
+    dict
+        ``{key: np.memmap}``, with keys as in ``np.load(path)``
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(
+                    f"{path} is compressed and cannot be memory-mapped. "
+                    "Write it with `np.savez` instead of `np.savez_compressed`."
+                )
+            # local file header: 30 bytes + file name + extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+            arrays[info.filename[: -len(".npy")]] = np.memmap(
+                path,
+                dtype=dtype,
+                mode="r",
+                offset=f.tell(),
+                shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    return arrays
+
+
+def open_xy(path: Union[str, Path]):
+    """
+    Memory-map the arrays of a dataset written by ``write_xy`` (or an ``.npz`` file)
+
+    Returns
+    -------
+    X_shards, y_shards : list of np.ndarray
+        Read-only memory maps
+    indices : dict
+        ``{split: np.ndarray}`` for the ``idx_<split>`` arrays that are present
+    """
+    path = Path(path)
+    if path.is_file():
+        arrays = memmap_npz(path)
+        X_shards, y_shards = [arrays["X"]], [arrays["y"]]
+    else:
+        arrays = {p.stem: np.load(p, mmap_mode="r") for p in path.glob("idx_*.npy")}
+        if (path / "X.npy").is_file():
+            X_shards = [np.load(path / "X.npy", mmap_mode="r")]
+            y_shards = [np.load(path / "y.npy", mmap_mode="r")]
+        else:
+            X_shards = [np.load(p, mmap_mode="r") for p in sorted(path.glob("X.*.npy"))]
+            y_shards = [np.load(p, mmap_mode="r") for p in sorted(path.glob("y.*.npy"))]
+        if not X_shards:
+            raise FileNotFoundError(f"No X/y arrays found in {path}")
+    if [len(X) for X in X_shards] != [len(y) for y in y_shards]:
+        raise ValueError(f"X and y shards in {path} do not match in size")
+    indices = {key[4:]: arrays[key] for key in arrays if key[4:] in SPLITS}
+    return X_shards, y_shards, indices
+
+
+def read_manifest(path: Union[str, Path]) -> dict:
+    """
+    Shard list and array properties of a directory written by ``write_xy``
+    """
+    with open(Path(path) / MANIFEST) as f:
+        return json.load(f)
+
+
+def write_xy(
+    path: Union[str, Path],
+    X: Sequence,
+    y: Sequence,
+    indices: dict = None,
+    shard_size: int = None,
+    dtype="float32",
+    overwrite: bool = False,
+) -> Path:
+    """
+    Write ``X`` and ``y`` as ``.npy`` files that ``open_xy`` can memory-map.
+
+    Rows are written in chunks of ``shard_size``, so ``X`` can be a list of
+    per-sample arrays that would not fit in memory once stacked. The
+    directory is written under a temporary name and renamed once complete.
+
+    Parameters
+    ----------
+    path : str or Path
+        Destination directory
+    X : array-like or sequence of array-like
+        One row per sample, all with the same shape
+    y : array-like
+        One value per sample
+    indices : dict, optional
+        ``{split: row indices}`` for any of ``"train"``, ``"test"``, ``"val"``
+    shard_size : int, optional
+        Rows per shard. By default, a single ``X.npy``/``y.npy`` pair is written.
+    dtype : str or np.dtype, optional="float32"
+    overwrite : bool, optional=False
+        Whether to replace an existing directory at ``path``
+
+    Returns
+    -------
+    Path
+        The destination directory
+    """
+    path = Path(path)
+    if path.exists() and not overwrite:
+        raise FileExistsError(f"{path} already exists. Use `overwrite=True` to replace it.")
+    if len(X) != len(y):
+        raise ValueError("X and y must match in size")
+    unknown = set(indices or {}).difference(SPLITS)
+    if unknown:
+        raise ValueError(f"Unknown splits {sorted(unknown)}; choose from {SPLITS}")
+
+    n = len(X)
+    sharded = shard_size is not None
+    shard_size = shard_size or max(n, 1)
+    row_shape = np.shape(X[0]) if n else ()
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    try:
+        shards = []
+        for shard, start in enumerate(range(0, max(n, 1), shard_size)):
+            end = min(start + shard_size, n)
+            suffix = f".{shard:05d}" if sharded else ""
+            shards.append({"X": f"X{suffix}.npy", "y": f"y{suffix}.npy", "rows": end - start})
+            X_out = np.lib.format.open_memmap(
+                tmp / f"X{suffix}.npy", mode="w+", dtype=dtype, shape=(end - start, *row_shape)
+            )
+            if end > start:
+                X_out[:] = _stack(X[start:end])
+            X_out.flush()
+            del X_out
+            np.save(tmp / f"y{suffix}.npy", np.asarray(y[start:end], dtype=dtype))
+        for split, index in (indices or {}).items():
+            np.save(tmp / f"idx_{split}.npy", np.asarray(index, dtype="int64"))
+        manifest = {"n_samples": n, "row_shape": list(row_shape), "dtype": str(np.dtype(dtype))}
+        with open(tmp / MANIFEST, "w") as f:
+            json.dump({**manifest, "shards": shards}, f, indent=2)
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def _stack(rows: Union[np.ndarray, Iterable]) -> np.ndarray:
+    return rows if isinstance(rows, np.ndarray) else np.stack(list(rows))
@@ -1,11 +1,10 @@
 """
 Creates DatasetProvider objects from ChEMBL activity data
 """
-import random
-
+import logging
 
+import numpy as np
 import pandas as pd
-from tqdm.auto import tqdm
 
 from .core import MultiDatasetProvider
 from ..core.conditions import AssayConditions
@@ -14,20 +13,60 @@ from ..core.ligands import SmilesLigand
 from ..core.systems import ProteinLigandComplex
 from ..core.measurements import pIC50Measurement, pKiMeasurement, pKdMeasurement
 
+logger = logging.getLogger(__name__)
+
 
 class ChEMBLDatasetProvider(MultiDatasetProvider):
 
     """
     This provider relies heavily on ``openkinome/kinodata`` data ingestion
     pipelines. It will load ChEMBL activities from its Releases page.
+
+    Attributes
+    ----------
+    rejected : pandas.DataFrame
+        Rows of the source file that could not be ingested, with an
+        extra ``reason`` column. Only available for objects created
+        with ``.from_source()``.
     """
 
+    MEASUREMENT_TYPES = {
+        "pIC50": pIC50Measurement,
+        "pKi": pKiMeasurement,
+        "pKd": pKdMeasurement,
+    }
+    _SAVED_ATTRIBUTES = ("rejected",)
+    _REQUIRED_COLUMNS = (
+        "activities.standard_type",
+        "activities.standard_value",
+        "component_sequences.sequence",
+        "compound_structures.canonical_smiles",
+    )
+    # Only these columns are read from the source. Numeric columns use the parser
+    # defaults; repeated strings are deduplicated while reading (see ``_read_activities``).
+    _STRING_COLUMNS = (
+        "activities.standard_units",
+        "component_sequences.sequence",
+        "compound_structures.canonical_smiles",
+        "UniprotID",
+        "target_dictionary.chembl_id",
+        "docs.chembl_id",
+    )
+    _NUMERIC_COLUMNS = (
+        "assays.confidence_score",
+        "activities.activity_id",
+        "docs.year",
+    )
+
     @classmethod
     def from_source(
         cls,
         path_or_url="https://github.com/openkinome/datascripts/releases/download/v0.2/activities-chembl28_v0.2.zip",
         measurement_types=("pIC50", "pKi", "pKd"),
         sample=None,
+        use_cache=True,
+        chunksize=100_000,
+        random_state=None,
         **kwargs,
     ):
         """
@@ -43,72 +82,244 @@ class ChEMBLDatasetProvider(MultiDatasetProvider):
             three (pIC50, pKi, pKd) will be loaded, but you can choose a subset (
             e.g. ``("pIC50",)``).
         sample : int, optional=None
-            If set to larger than zero, load only N data points from the dataset.
+            If set to larger than zero, load only N data points from the dataset,
+            chosen uniformly at random among the rows of the requested types.
+        use_cache : bool, optional=True
+            Reuse the provider parsed from the same file (and ``measurement_types``)
+            in a previous session, if available. Parsed providers are stored in the
+            user cache as Parquet files, keyed on the hash of the source file.
+            Random samples are never cached.
+        chunksize : int, optional=100_000
+            The source file is streamed in chunks of this many rows, reading only the
+            needed columns. Besides one chunk, only the rows that are kept stay in
+            memory: those of the requested types or, with ``sample``, at most ``sample``
+            rows. Set to None to read the file at once.
+        random_state : int or numpy.random.Generator, optional
+            Seed for ``sample``
 
         Note
         ----
         ChEMBL aggregates data from lots of sources, so conditions are guaranteed
-        to be different across experiments.
+        to be different across experiments. The same kinase-ligand pair is often
+        measured several times; use ``.aggregate_replicates()`` to merge them.
+
+        Rows that cannot be ingested (missing fields, invalid sequences, values out
+        of range) are not printed, but collected in the ``.rejected`` DataFrame.
 
+        Providers read from the cache use a ``MeasurementTable`` backend.
         """
+        unknown = set(measurement_types).difference(cls.MEASUREMENT_TYPES)
+        if unknown:
+            raise ValueError(
+                f"Measurement types {sorted(unknown)} are not supported. "
+                f"Choose from {list(cls.MEASUREMENT_TYPES)}."
+            )
         cached_path = cls._download_to_cache_or_retrieve(path_or_url)
-        df = pd.read_csv(cached_path)
 
-        measurement_type_classes = {
-            "pIC50": pIC50Measurement,
-            "pKi": pKiMeasurement,
-            "pKd": pKdMeasurement,
-        }
-        measurements = []
-        systems = {}
-        kinases = {}
-        ligands = {}
-        chosen_types_labels = df["activities.standard_type"].isin(set(measurement_types))
-        filtered_records = df[chosen_types_labels].to_dict("records")
+        def build():
+            df, rejected = cls._read_activities(
+                cached_path,
+                measurement_types,
+                sample=sample,
+                chunksize=chunksize,
+                random_state=random_state,
+            )
+            return cls._from_dataframe(df, rejected=rejected, **kwargs)
+
+        return cls._from_cache_or_build(
+            cached_path,
+            build,
+            use_cache=use_cache and sample is None and not kwargs,
+            measurement_types=sorted(measurement_types),
+        )
+
+    @classmethod
+    def _read_activities(
+        cls, path, measurement_types, sample=None, chunksize=100_000, random_state=None
+    ):
+        """
+        Stream the activities in ``path``, keeping only the rows of the requested
+        measurement types and, if ``sample`` is set, a uniform random sample of them.
+
+        Sampling assigns a random key to each row and keeps the ``sample`` rows with
+        the smallest keys seen so far (reservoir sampling), so only one chunk and the
+        current sample are in memory at any time.
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            Selected rows, with numeric ``activities.standard_value``
+        rejected : list of pandas.DataFrame
+            Selected rows whose value is not numeric, with a ``reason`` column.
+            They are part of the sample, like any other row.
+        """
+        columns = (
+            "activities.standard_type",
+            "activities.standard_value",
+            *cls._STRING_COLUMNS,
+            *cls._NUMERIC_COLUMNS,
+        )
+        reader = pd.read_csv(
+            path,
+            usecols=columns,
+            # values are parsed per chunk, so non-numeric ones can be reported
+            dtype={column: str for column in columns[:2] + cls._STRING_COLUMNS},
+            chunksize=chunksize,
+        )
+        if chunksize is None:
+            reader = [reader]
+        types = pd.CategoricalDtype(list(cls.MEASUREMENT_TYPES))
+        rng = np.random.default_rng(random_state)
+        strings = {}  # one shared object per distinct string, across chunks
+        kept, keys = [], np.empty(0)
+        for chunk in reader:
+            chunk = chunk[chunk["activities.standard_type"].isin(set(measurement_types))]
+            raw_values = chunk["activities.standard_value"]
+            values = pd.to_numeric(raw_values, errors="coerce")
+            chunk = chunk.assign(
+                **{
+                    "activities.standard_type": chunk["activities.standard_type"].astype(types),
+                    "activities.standard_value": values,
+                    # only keep the original text of values that could not be parsed
+                    "non_numeric": raw_values.where(values.isna() & raw_values.notna()),
+                }
+            )
+            for column in cls._STRING_COLUMNS:
+                chunk[column] = _deduplicate_strings(chunk[column], strings)
+            kept.append(chunk)
+            if sample is not None:
+                keys = np.concatenate([keys, rng.random(len(chunk))])
+                kept = [pd.concat(kept)] if len(kept) > 1 else kept
+                if len(keys) > sample:
+                    selected = np.argpartition(keys, sample - 1)[:sample]
+                    keys, kept = keys[selected], [kept[0].iloc[selected]]
         if sample is not None:
-            filtered_records = random.sample(filtered_records, sample)
-        for row in tqdm(filtered_records):
+            kept = [kept[0].iloc[np.argsort(keys)]] if kept else kept
+        df = pd.concat(kept) if kept else pd.DataFrame(columns=[*columns, "non_numeric"])
+
+        non_numeric = df["non_numeric"].notna().to_numpy()
+        rejected = []
+        if non_numeric.any():
+            rejected.append(
+                df[non_numeric]
+                .assign(**{"activities.standard_value": df["non_numeric"][non_numeric]})
+                .drop(columns="non_numeric")
+                .assign(reason="non-numeric value")
+            )
+        df = df[~non_numeric].drop(columns="non_numeric")
+        return df, rejected
+
+    @classmethod
+    def _from_dataframe(cls, df: pd.DataFrame, rejected=None, **kwargs):
+        """
+        Build the provider from an already filtered activities DataFrame.
+
+        Kinases, ligands and systems are deduplicated by factorizing their keys,
+        so each object is created only once, and measurements are built from
+        column arrays. Invalid rows are collected into ``.rejected``, after
+        those passed in ``rejected`` (a list of DataFrames).
+        """
+        df = df.reset_index(drop=True)
+        rejected = list(rejected or [])
+
+        def reject(mask, reason):
+            nonlocal df
+            if mask.any():
+                rejected.append(df[mask].assign(reason=reason))
+                df = df[~mask].reset_index(drop=True)
+
+        reject(df[list(cls._REQUIRED_COLUMNS)].isna().any(axis=1).to_numpy(), "missing values")
+        values = pd.to_numeric(df["activities.standard_value"], errors="coerce").to_numpy()
+        reject(np.isnan(values), "non-numeric value")
+
+        # Check values against the accepted range of each measurement type
+        types = df["activities.standard_type"].to_numpy()
+        values = df["activities.standard_value"].to_numpy(dtype="float64")
+        lower = np.array([cls.MEASUREMENT_TYPES[t].RANGE[0] for t in types], dtype="float64")
+        upper = np.array([cls.MEASUREMENT_TYPES[t].RANGE[1] for t in types], dtype="float64")
+        reject((values < lower) | (values > upper), "value out of range")
+
+        # Kinases: one object per unique sequence, metadata taken from its first row
+        kinase_codes, kinase_keys = pd.factorize(df["component_sequences.sequence"])
+        _, first_rows = np.unique(kinase_codes, return_index=True)
+        uniprot_ids = df["UniprotID"].to_numpy()[first_rows]
+        chembl_targets = df["target_dictionary.chembl_id"].to_numpy()[first_rows]
+        kinases = []
+        for sequence, uniprot_id, chembl_target in zip(kinase_keys, uniprot_ids, chembl_targets):
             try:
-                measurement_type_key = row["activities.standard_type"]
-                kinase_key = row["component_sequences.sequence"]
-                ligand_key = row["compound_structures.canonical_smiles"]
-                system_key = (kinase_key, ligand_key)
-                if kinase_key not in kinases:
-                    metadata = {
-                        "uniprot": row["UniprotID"],
-                        "chembl_target": row["target_dictionary.chembl_id"],
-                    }
-                    kinase = AminoAcidSequence(
-                        kinase_key, name=row["UniprotID"], metadata=metadata
-                    )
-                    kinases[kinase_key] = kinase
-                if ligand_key not in ligands:
-                    metadata = {"chembl_compound": None}  # TODO
-                    ligands[ligand_key] = SmilesLigand(ligand_key, name=ligand_key)
-                if system_key not in systems:
-                    systems[system_key] = ProteinLigandComplex(
-                        [kinases[kinase_key], ligands[ligand_key]]
-                    )
-
-                MeasurementType = measurement_type_classes[measurement_type_key]
-                conditions = AssayConditions(pH=7)
-                system = systems[system_key]
-                metadata = {
-                    "unit": f"-log10({row['activities.standard_units']}E-9)",
-                    "confidence": row["assays.confidence_score"],
-                    "chembl_activity": row["activities.activity_id"],
-                    "chembl_document": row["docs.chembl_id"],
-                    "year": row["docs.year"],
-                }
-                measurement = MeasurementType(
-                    values=row["activities.standard_value"],
-                    system=system,
-                    conditions=conditions,
-                    metadata=metadata,
+                kinase = AminoAcidSequence(
+                    sequence,
+                    name=uniprot_id,
+                    metadata={"uniprot": uniprot_id, "chembl_target": chembl_target},
                 )
-                measurements.append(measurement)
-            except Exception as exc:
-                print("Couldn't process record", row)
-                print("Exception:", exc)
+            except ValueError:
+                kinase = None
+            kinases.append(kinase)
+        valid_kinases = np.array([kinase is not None for kinase in kinases], dtype=bool)
+        reject(~valid_kinases[kinase_codes], "invalid sequence")
+        kinase_codes = kinase_codes[valid_kinases[kinase_codes]]
 
-        return cls(measurements)
+        # Ligands: one object per unique SMILES
+        ligand_codes, ligand_keys = pd.factorize(df["compound_structures.canonical_smiles"])
+        ligands = [SmilesLigand.from_smiles(smiles, name=smiles) for smiles in ligand_keys]
+
+        # Systems: one object per unique (kinase, ligand) pair
+        system_codes, system_keys = pd.factorize(kinase_codes * len(ligands) + ligand_codes)
+        systems = [
+            ProteinLigandComplex([kinases[key // len(ligands)], ligands[key % len(ligands)]])
+            for key in system_keys
+        ]
+
+        # Measurements, built from column arrays. Values have been checked already.
+        conditions = AssayConditions(pH=7)
+        units = ("-log10(" + df["activities.standard_units"].astype(str) + "E-9)").tolist()
+        columns = zip(
+            df["activities.standard_type"].tolist(),
+            df["activities.standard_value"].tolist(),
+            system_codes.tolist(),
+            units,
+            df["assays.confidence_score"].tolist(),
+            df["activities.activity_id"].tolist(),
+            df["docs.chembl_id"].tolist(),
+            df["docs.year"].tolist(),
+        )
+        measurements = []
+        for row in columns:
+            measurement_type, value, system_code, unit, confidence, activity, document, year = row
+            measurement = cls.MEASUREMENT_TYPES[measurement_type](
+                values=value,
+                system=systems[system_code],
+                conditions=conditions,
+                strict=False,
+                metadata={
+                    "unit": unit,
+                    "confidence": confidence,
+                    "chembl_activity": activity,
+                    "chembl_document": document,
+                    "year": year,
+                },
+            )
+            measurements.append(measurement)
+
+        provider = cls(measurements, **kwargs)
+        if rejected:
+            provider.rejected = pd.concat(rejected, ignore_index=True)
+            logger.warning(
+                "%d records could not be processed. Check `.rejected` for more info.",
+                len(provider.rejected),
+            )
+        else:
+            provider.rejected = pd.DataFrame(columns=[*df.columns, "reason"])
+        return provider
+
+
+def _deduplicate_strings(series: pd.Series, strings: dict) -> np.ndarray:
+    """
+    Replace each string in ``series`` by the first equal string in ``strings``,
+    so repeated values (e.g. sequences) share memory across chunks.
+    """
+    codes, uniques = pd.factorize(series)
+    table = np.empty(len(uniques) + 1, dtype=object)
+    table[:-1] = [strings.setdefault(value, value) for value in uniques]
+    table[-1] = np.nan  # missing values have code -1
+    return table[codes]
@@ -3,13 +3,10 @@ Base classes for ``DatasetProvider``-like objects
 """
 
 import logging
-from typing import Iterable
+from typing import Iterable, Union
 from collections import defaultdict
 import multiprocessing
-from urllib.request import urlopen
-import shutil
 from pathlib import Path
-import os
 
 import numpy as np
 import pandas as pd
@@ -17,6 +14,9 @@ from tqdm.auto import tqdm
 
 from ..core.measurements import BaseMeasurement
 from ..features.core import BaseFeaturizer
+from .registry import SystemRegistry
+from .tables import ConcatenatedSequence, MeasurementTable
+from .views import DatasetView, MeasurementIndex
 from ..utils import APPDIR
 
 logger = logging.getLogger(__name__)
@@ -84,9 +84,12 @@ class DatasetProvider(BaseDatasetProvider):
 
     Parameters
     ----------
-    measurements: list of BaseMeasurement
+    measurements: list of BaseMeasurement or MeasurementTable
         A DatasetProvider holds a list of ``kinoml.core.measurements.BaseMeasurement``
         objects (or any of its subclasses). They must be of the same type!
+        Alternatively, a ``kinoml.datasets.tables.MeasurementTable`` can be passed
+        to use a columnar backend, where measurement objects are only created
+        upon item access.
 
     Note
     ----
@@ -95,14 +98,21 @@ class DatasetProvider(BaseDatasetProvider):
     """
 
     _raw_data = None
+    _SAVED_ATTRIBUTES = ()  # DataFrame attributes kept by ``.save()``
+    # Bump whenever ``from_source()`` builds different providers from the same
+    # file (e.g. parser changes), so copies cached before are not served again
+    PARSER_VERSION = 1
 
     def __init__(
         self,
-        measurements: Iterable[BaseMeasurement],
+        measurements: Union[Iterable[BaseMeasurement], MeasurementTable],
         *args,
         **kwargs,
     ):
-        types = {type(measurement) for measurement in measurements}
+        if isinstance(measurements, MeasurementTable):
+            types = {measurements.measurement_types[c] for c in np.unique(measurements.type_codes)}
+        else:
+            types = {type(measurement) for measurement in measurements}
         assert (
             len(types) == 1
         ), f"Dataset providers can only allow one type of measurement! You provided: {types}"
@@ -118,17 +128,110 @@ class DatasetProvider(BaseDatasetProvider):
             return self.measurements[subscript]
 
     def __repr__(self) -> str:
-        components = defaultdict(set)
-        for s in self.systems:
-            for c in s.components:
-                components[type(c).__name__].add(c.name)
-        components_str = ", ".join([f"{k}={len(v)}" for k, v in components.items()])
+        registry = self.registry
+        if registry.is_lazy:
+            # counting components would create every system
+            n_systems = len(registry.system_ids)
+            components_str = f"{registry.systems.n_materialized} created"
+        else:
+            summary = registry.summary()
+            n_systems = summary["systems"]
+            components_str = ", ".join([f"{k}={v}" for k, v in summary["components"].items()])
         return (
             f"<{self.__class__.__name__} with "
             f"{len(self.measurements)} {self.measurement_type.__name__} measurements "
-            f"and {len(self.systems)} systems ({components_str})>"
+            f"and {n_systems} systems ({components_str})>"
         )
 
+    @property
+    def measurement_index(self) -> MeasurementIndex:
+        """
+        Secondary indexes used by ``.query()``, rebuilt when the registry changes
+        """
+        registry = self.registry
+        # holding the registry in the key keeps its id from being reused
+        key = (registry, len(registry))
+        if getattr(self, "_measurement_index_key", None) != key:
+            self._measurement_index = MeasurementIndex(self)
+            self._measurement_index_key = key
+        return self._measurement_index
+
+    def query(self, **filters) -> DatasetView:
+        """
+        Select the measurements matching all ``filters``, without copying them.
+
+        Parameters
+        ----------
+        filters : optional
+            Field names mapped to conditions. Fields are ``protein`` and ``ligand``
+            (component names), ``measurement_type`` (class or class name), ``value``,
+            or any metadata key (e.g. ``year`` or ``confidence`` for ChEMBL).
+            Conditions can be a single value (equality), a list or set of values
+            (membership) or a ``(low, high)`` tuple (inclusive range on numeric
+            fields; use None for an open end).
+
+        Returns
+        -------
+        DatasetView
+            Lightweight selection that can be queried again, iterated, or turned
+            into a provider with ``.to_provider()``.
+
+        Examples
+        --------
+        >>> recent = provider.query(year=(2015, None), confidence=[8, 9])
+        >>> recent.query(measurement_type="pIC50", value=(6, None)).to_provider()
+
+        Note
+        ----
+        Each field is indexed the first time it is queried, and indexes are kept
+        until the registry changes (e.g. measurements are appended).
+        """
+        return DatasetView(self).query(**filters)
+
+    def view(self, indices=None) -> DatasetView:
+        """
+        ``DatasetView`` of the measurements at ``indices`` (default: all)
+        """
+        return DatasetView(self, indices)
+
+    @property
+    def registry(self) -> SystemRegistry:
+        """
+        Stable integer IDs for the systems and components in this provider,
+        plus the measurement -> system and system -> component indices.
+
+        The registry is built on first access. Measurements appended to
+        ``.measurements`` afterwards are registered incrementally; replacing
+        ``.measurements``, or any of its elements with one about a different
+        system, builds a new registry.
+        """
+        registry = getattr(self, "_registry", None)
+        if self.is_columnar:
+            # tables are immutable, so their identity is enough
+            if registry is None or getattr(self, "_registered", None) is not self.measurements:
+                registry = SystemRegistry.from_table(self.measurements)
+                self._registry, self._registered = registry, self.measurements
+            return registry
+        # the registry holds the systems it indexed, so their ids cannot be reused
+        system_ids = np.fromiter(
+            (id(ms.system) for ms in self.measurements),
+            dtype="uintp",
+            count=len(self.measurements),
+        )
+        registered = getattr(self, "_registered_system_ids", None)
+        if (
+            registry is None
+            or registered is None
+            or len(system_ids) < len(registered)
+            or not np.array_equal(system_ids[: len(registered)], registered)
+        ):
+            registry = SystemRegistry.from_measurements(self.measurements)
+            self._registry = registry
+        elif len(system_ids) > len(registered):
+            registry.add_measurements(self.measurements[len(registered) :])
+        self._registered_system_ids = system_ids
+        return registry
+
     @classmethod
     def from_source(cls, filename=None, **kwargs):
         """
@@ -205,7 +308,38 @@ class DatasetProvider(BaseDatasetProvider):
         """
         Return the ``key`` featurized objects from all systems.
         """
-        return [ms.system.featurizations[key] for ms in self.measurements]
+        return [system.featurizations[key] for system in self.registry.systems_for()]
+
+    @property
+    def is_columnar(self) -> bool:
+        """
+        Whether this provider uses a ``MeasurementTable`` backend
+        """
+        return isinstance(self.measurements, MeasurementTable)
+
+    def subset(self, indices):
+        """
+        New provider of the same class with the measurements at ``indices``.
+        Measurement objects (or the systems of a table) are shared, not copied.
+
+        Parameters
+        ----------
+        indices : array-like of int or bool
+            Positions in ``.measurements``, or a boolean mask
+        """
+        if self.is_columnar:
+            return self.__class__(self.measurements.subset(np.asarray(indices)))
+        indices = np.arange(len(self))[np.asarray(indices)]
+        return self.__class__([self.measurements[i] for i in indices])
+
+    def to_columnar(self):
+        """
+        Return a copy of this provider backed by a ``MeasurementTable``.
+        Systems are shared with this provider, not copied.
+        """
+        if self.is_columnar:
+            return self.__class__(self.measurements.subset(slice(None)))
+        return self.__class__(MeasurementTable.from_measurements(self.measurements))
 
     def _to_dataset(self, style="pytorch"):
         """
@@ -240,6 +374,11 @@ class DatasetProvider(BaseDatasetProvider):
         """
         if not self.systems:
             return pd.DataFrame()
+        if self.is_columnar:
+            df = self.measurements.to_dataframe()
+            return df.drop(columns="MeasurementType").rename(
+                columns={"Measurement": self.measurement_type.__name__}
+            )
         columns = ["Systems", "n_components", self.measurements[0].__class__.__name__]
         records = [
             (
@@ -252,27 +391,94 @@ class DatasetProvider(BaseDatasetProvider):
 
         return pd.DataFrame.from_records(records, columns=columns)
 
-    def to_pytorch(self, featurizer=None, **kwargs):
+    def to_pytorch(
+        self, featurizer=None, stacked=False, pin_memory=False, featurization_key="last", **kwargs
+    ):
         """
         Export dataset to a PyTorch-compatible object, via adapters
         found in ``kinoml.torch_datasets``.
+
+        Parameters
+        ----------
+        featurizer : callable, optional
+            Featurize systems on the fly, with ``TorchDataset``. With
+            ``stacked=True``, all systems are featurized right away instead.
+        stacked : bool, optional=False
+            Stack the featurized systems into a single array and return a
+            ``StackedTorchDataset``, which serves whole batches at once
+        pin_memory : bool, optional=False
+            Only for ``stacked=True``. Check ``StackedTorchDataset``.
+        featurization_key : str, optional="last"
+            Which featurization to export, for prefeaturized systems
         """
-        from .torch_datasets import TorchDataset, PrefeaturizedTorchDataset
+        from .torch_datasets import TorchDataset, PrefeaturizedTorchDataset, StackedTorchDataset
 
+        if stacked:
+            return StackedTorchDataset(
+                self._stacked_features(featurizer, featurization_key),
+                self.measurements_as_array(**kwargs),
+                observation_model=self.observation_model(backend="pytorch"),
+                pin_memory=pin_memory,
+            )
         if featurizer is not None:
             return TorchDataset(
-                [ms.system for ms in self.measurements],
+                self.registry.systems_for(),
                 self.measurements_as_array(**kwargs),
                 featurizer=featurizer,
                 observation_model=self.observation_model(backend="pytorch"),
             )
         # else
         return PrefeaturizedTorchDataset(
-            self.featurized_systems(),
+            self.featurized_systems(key=featurization_key),
             self.measurements_as_array(**kwargs),
             observation_model=self.observation_model(backend="pytorch"),
         )
 
+    def _stacked_features(self, featurizer=None, featurization_key="last") -> np.ndarray:
+        """
+        Featurized systems as a single array, featurizing them first
+        with ``featurizer`` if given (like ``TorchDataset`` does lazily)
+        """
+        if featurizer is None:
+            return np.stack(self.featurized_systems(key=featurization_key))
+        return np.stack(
+            [
+                featurizer(system).featurizations[featurizer.name]
+                for system in self.registry.systems_for()
+            ]
+        )
+
+    def to_npy(self, path, indices=None, shard_size=None, featurization_key="last", **kwargs):
+        """
+        Write the featurized systems and the measurement values to ``.npy``
+        files that ``kinoml.datasets.torch_datasets.MmapXyTorchDataset`` can
+        memory-map. Check ``kinoml.datasets.arrays.write_xy`` for the layout.
+
+        Parameters
+        ----------
+        path : str or Path
+            Destination directory
+        indices : dict, optional
+            ``{split: indices}`` for ``"train"``, ``"test"`` and/or ``"val"``
+        shard_size : int, optional
+            Write shards of this many rows instead of a single pair of files
+        featurization_key : str, optional="last"
+            Which featurization to export
+        kwargs : optional
+            Forwarded to ``measurements_as_array`` and ``write_xy``
+        """
+        from .arrays import write_xy
+
+        write_kwargs = {key: kwargs.pop(key) for key in ("dtype", "overwrite") if key in kwargs}
+        return write_xy(
+            path,
+            self.featurized_systems(key=featurization_key),
+            self.measurements_as_array(**kwargs),
+            indices=indices,
+            shard_size=shard_size,
+            **write_kwargs,
+        )
+
     def to_xgboost(self, **kwargs):
         """
         Export dataset to a ``DMatrix`` object, native to the XGBoost framework
@@ -330,13 +536,21 @@ class DatasetProvider(BaseDatasetProvider):
 
     @property
     def systems(self):
-        return list({ms.system for ms in self.measurements})
+        """
+        Unique systems in this provider, sorted by their registry ID.
+        Lazy systems (see ``LazySequence``) are only created when accessed.
+        """
+        return self.registry.used_systems()
 
     @property
     def measurement_type(self):
+        if self.is_columnar:
+            return self.measurements.measurement_types[self.measurements.type_codes[0]]
         return type(self.measurements[0])
 
     def measurements_as_array(self, reduce=np.mean, dtype="float32"):
+        if self.is_columnar:  # single replicates only, nothing to reduce
+            return self.measurements.values.astype(dtype)
         result = np.empty(len(self.measurements), dtype=dtype)
         for i, measurement in enumerate(self.measurements):
             if measurement.values.shape[0] > 1:
@@ -345,6 +559,95 @@ class DatasetProvider(BaseDatasetProvider):
                 result[i] = measurement.values[0]
         return result
 
+    def aggregate_replicates(self, by_conditions=False, metadata_reducers=None):
+        """
+        Merge the measurements taken on the same system into single
+        multi-replicate measurements, whose ``values`` and ``errors`` arrays
+        hold all the replicates in their original order.
+
+        Use ``measurements_as_array(reduce=...)`` to choose how replicates are
+        combined when exporting the dataset.
+
+        Parameters
+        ----------
+        by_conditions : bool, optional=False
+            Only merge measurements taken under the same conditions.
+            Otherwise, the conditions of the first replicate are kept.
+        metadata_reducers : dict of str -> callable, optional
+            Function applied to the values of each metadata key across the
+            replicates (e.g. ``{"year": min}``). Keys not listed here keep
+            a tuple with all the values. The number of merged measurements
+            is stored under the ``replicates`` key.
+
+        Returns
+        -------
+        DatasetProvider
+            New provider of the same class, backed by a list of measurements.
+            Groups are taken from the first replicate.
+        """
+        n = len(self)
+        if not n:
+            return self.__class__([])
+        measurement_type = self.measurement_type
+        if self.is_columnar:
+            table = self.measurements
+            lengths = np.ones(n, dtype="int64")
+            values, errors, groups = table.values, table.errors, table.groups
+            conditions, conditions_index = table.conditions, table.conditions_index
+            metadata = pd.DataFrame(table.metadata, index=pd.RangeIndex(n))
+        else:
+            measurements = self.measurements
+            lengths = np.fromiter((len(ms.values) for ms in measurements), "int64", n)
+            values = np.concatenate([ms.values for ms in measurements])
+            errors = np.concatenate([ms.errors for ms in measurements])
+            groups = np.empty(n, dtype=object)
+            groups[:] = [ms.group for ms in measurements]
+            # not pd.factorize: it would turn None conditions into -1 (or NaN)
+            ids = {}
+            conditions_index = np.fromiter(
+                (ids.setdefault(ms.conditions, len(ids)) for ms in measurements), "int64", n
+            )
+            conditions = list(ids)
+            metadata = pd.DataFrame.from_records([ms.metadata for ms in measurements])
+
+        system_ids = self.registry.measurement_systems
+        if by_conditions:
+            keys = pd.MultiIndex.from_arrays([system_ids, conditions_index])
+        else:
+            keys = system_ids
+        codes, uniques = pd.factorize(keys)  # groups in order of first appearance
+        firsts = np.unique(codes, return_index=True)[1]
+
+        # replicates of the n-th group are sorted[offsets[n]:offsets[n + 1]]
+        owners = np.repeat(codes, lengths)
+        order = np.argsort(owners, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(owners, minlength=len(uniques)))])
+        sorted_values, sorted_errors = values[order], errors[order]
+
+        metadata_reducers = metadata_reducers or {}
+        reduced = {
+            key: metadata[key].groupby(codes).agg(metadata_reducers.get(key, tuple)).tolist()
+            for key in metadata.columns
+        }
+        reduced["replicates"] = np.bincount(codes).tolist()
+
+        systems = self.registry.systems
+        aggregated = []
+        for code, first in enumerate(firsts):
+            start, end = offsets[code], offsets[code + 1]
+            aggregated.append(
+                measurement_type(
+                    values=sorted_values[start:end],
+                    errors=sorted_errors[start:end],
+                    conditions=conditions[conditions_index[first]],
+                    system=systems[system_ids[first]],
+                    group=groups[first],
+                    metadata={key: column[code] for key, column in reduced.items()},
+                    strict=False,
+                )
+            )
+        return self.__class__(aggregated)
+
     def split_by_groups(self) -> dict:
         """
         If a ``kinoml.datasets.groups`` class has been applied to this instance,
@@ -355,6 +658,18 @@ class DatasetProvider(BaseDatasetProvider):
         dict
             Maps group key to sub-datasets
         """
+        if self.is_columnar:
+            codes, keys = pd.factorize(self.measurements.groups)
+            keys = list(keys)
+            if (codes < 0).any():  # measurements without group
+                codes[codes < 0] = len(keys)
+                keys.append(None)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.cumsum(np.bincount(codes, minlength=len(keys)))[:-1]
+            return {
+                key: type(self)(self.measurements.subset(indices))
+                for key, indices in zip(keys, np.split(order, bounds))
+            }
         groups = defaultdict(list)
         for measurement in self.measurements:
             groups[measurement.group].append(measurement)
@@ -366,10 +681,131 @@ class DatasetProvider(BaseDatasetProvider):
 
     @property
     def conditions(self) -> set:
+        if self.is_columnar:
+            table = self.measurements
+            return {table.conditions[i] for i in np.unique(table.conditions_index)}
         return {ms.conditions for ms in self.measurements}
 
+    def condition_parameters(self, names: Iterable[str], dtype="float32") -> np.ndarray:
+        """
+        Per-measurement values of the given ``conditions`` attributes, e.g.
+        the observation model parameters listed by
+        ``kinoml.core.measurements.observation_model_parameters()``.
+
+        Returns
+        -------
+        np.ndarray
+            ``(n_measurements, len(names))`` array, with NaN where the
+            conditions of a measurement do not define that attribute
+        """
+        names = list(names)
+        if self.is_columnar:
+            unique, index = self.measurements.conditions, self.measurements.conditions_index
+        else:
+            ids = {}
+            unique = []
+            index = np.empty(len(self), dtype="int64")
+            for i, ms in enumerate(self.measurements):
+                index[i] = ids.setdefault(id(ms.conditions), len(unique))
+                if index[i] == len(unique):
+                    unique.append(ms.conditions)
+        values = np.array(
+            [[getattr(c, name, None) for name in names] for c in unique], dtype="float64"
+        ).reshape(len(unique), len(names))
+        return values[index].astype(dtype)
+
+    def save(self, path, overwrite=False):
+        """
+        Write this provider to a directory of Parquet files, which
+        can be read back with ``DatasetProvider.load()``.
+
+        Parameters
+        ----------
+        path : str or Path
+            Destination directory
+        overwrite : bool, optional=False
+            Whether to replace an existing directory at ``path``
+
+        Returns
+        -------
+        Path
+            The destination directory
+
+        Note
+        ----
+        Featurizations are not saved. Check ``kinoml.datasets.storage``
+        for details on the format.
+        """
+        from .storage import save_provider
+
+        return save_provider(self, path, overwrite=overwrite)
+
     @classmethod
-    def _download_to_cache_or_retrieve(cls, path_or_url) -> str:
+    def load(cls, path, **kwargs):
+        """
+        Read a provider written by ``.save()``. The returned object
+        uses a ``MeasurementTable`` backend.
+
+        Parameters
+        ----------
+        path : str or Path
+            Directory written by ``.save()``
+        kwargs : optional
+            Forwarded to ``__init__``
+
+        Returns
+        -------
+        DatasetProvider
+            An instance of the saved class, which must be ``cls`` or a subclass.
+        """
+        from .storage import load_provider
+
+        return load_provider(path, provider_class=cls, **kwargs)
+
+    @classmethod
+    def _from_cache_or_build(cls, source_path, build, use_cache=True, **parameters):
+        """
+        Return the provider built from ``source_path`` by ``build()``, using
+        a copy saved in the user cache if available.
+
+        Parameters
+        ----------
+        source_path : str or Path
+            Local file the provider is built from. Its contents are hashed
+            to key the cache, together with ``parameters`` and ``PARSER_VERSION``.
+        build : callable
+            Function that takes no arguments and returns the provider
+        use_cache : bool, optional=True
+            Whether to read and write the cache at all
+        parameters : optional
+            JSON serializable values that affect the result of ``build()``
+
+        Returns
+        -------
+        DatasetProvider
+            Backed by a ``MeasurementTable``, both on cold and warm calls.
+        """
+        if not use_cache:
+            return build()
+        from .storage import cache_key, MANIFEST
+
+        key = cache_key(
+            source_path,
+            parser_version=cls.PARSER_VERSION,
+            provider=f"{cls.__module__}.{cls.__qualname__}",
+            **parameters,
+        )
+        cached_path = Path(APPDIR.user_cache_dir) / cls.__name__ / "providers" / key
+        if (cached_path / MANIFEST).is_file():
+            try:
+                return cls.load(cached_path)
+            except Exception as exc:  # corrupted or outdated cache; rebuild
+                logger.warning("Could not load cached provider at %s: %s", cached_path, exc)
+        build().save(cached_path, overwrite=True)
+        return cls.load(cached_path)
+
+    @classmethod
+    def _download_to_cache_or_retrieve(cls, path_or_url, sha256=None) -> str:
         """
         Helper function to either download files to the usercache, or
         retrieve an already cached copy.
@@ -378,23 +814,40 @@ class DatasetProvider(BaseDatasetProvider):
         ----------
         path_or_url : str or Path-like
             File path or URL pointing to the required file
+        sha256 : str, optional
+            Expected digest of the file
 
         Returns
         -------
         str
             The path of the (downloaded) file in cache
+
+        Note
+        ----
+        Check ``kinoml.datasets.downloads.download`` for details on how
+        cached files are validated, resumed and shared across processes.
+        """
+        from .downloads import download
+
+        directory = Path(APPDIR.user_cache_dir) / cls.__name__
+        return str(download(path_or_url, directory, sha256=sha256))
+
+    @classmethod
+    def prefetch(cls, *paths_or_urls, max_workers=4, **kwargs) -> list:
         """
-        filename = os.path.basename(path_or_url)
-        cached_path = Path(APPDIR.user_cache_dir) / cls.__name__ / filename
-        if not cached_path.is_file():  # file is not available on user cache
-            if os.path.isfile(path_or_url):  # local file
-                open_handle = lambda path: open(path, "rb")
-            else:  # online url
-                open_handle = urlopen
-            cached_path.parent.mkdir(parents=True, exist_ok=True)
-            with open_handle(path_or_url) as f, open(cached_path, "wb") as dest:
-                shutil.copyfileobj(f, dest)
-        return str(cached_path)
+        Download several source files concurrently into the cache used by
+        ``_download_to_cache_or_retrieve``, so ``from_source`` finds them later.
+
+        Returns
+        -------
+        list of str
+            The paths of the files in cache
+        """
+        from .downloads import prefetch
+
+        directory = Path(APPDIR.user_cache_dir) / cls.__name__
+        paths = prefetch(paths_or_urls, directory, max_workers=max_workers, **kwargs)
+        return [str(paths[path_or_url]) for path_or_url in paths_or_urls]
 
 
 class MultiDatasetProvider(DatasetProvider):
@@ -419,15 +872,25 @@ class MultiDatasetProvider(DatasetProvider):
         will be grouped together in different sub-datasets.
     """
 
-    def __init__(self, measurements: Iterable[BaseMeasurement], *args, **kwargs):
-        by_type = defaultdict(list)
-        for measurement in measurements:
-            by_type[type(measurement)].append(measurement)
-
+    def __init__(
+        self,
+        measurements: Union[Iterable[BaseMeasurement], MeasurementTable],
+        *args,
+        **kwargs,
+    ):
         providers = []
-        for typed_measurements in by_type.values():
-            if typed_measurements:
-                providers.append(DatasetProvider(typed_measurements))
+        if isinstance(measurements, MeasurementTable):
+            for code in np.unique(measurements.type_codes):
+                mask = measurements.type_codes == code
+                providers.append(DatasetProvider(measurements.subset(mask)))
+        else:
+            by_type = defaultdict(list)
+            for measurement in measurements:
+                by_type[type(measurement)].append(measurement)
+
+            for typed_measurements in by_type.values():
+                if typed_measurements:
+                    providers.append(DatasetProvider(typed_measurements))
 
         self.providers = providers
 
@@ -452,14 +915,120 @@ class MultiDatasetProvider(DatasetProvider):
         raise NotImplementedError(f"{type(self)} must use `.loss_adapters()` (plural)")
 
     @property
-    def measurements(self):
+    def registry(self) -> SystemRegistry:
+        """
+        Registry for all providers, with measurements in the same order
+        as ``.measurements``. Rebuilt when any provider registry changes.
         """
-        Flattened list of all measurements present across all providers.
+        registries = [p.registry for p in self.providers]
+        key = [(registry, len(registry)) for registry in registries]
+        if getattr(self, "_registry_key", None) != key:
+            self._registry = SystemRegistry.concatenate(registries)
+            self._registry_key = key
+        return self._registry
+
+    @classmethod
+    def from_providers(cls, providers: Iterable[DatasetProvider]):
+        """
+        Create a MultiDatasetProvider out of existing single-type providers,
+        without copying their measurements.
+        """
+        provider = cls.__new__(cls)
+        provider.providers = list(providers)
+        return provider
+
+    @property
+    def measurements(self) -> ConcatenatedSequence:
+        """
+        Read-only sequence of all measurements present across all providers,
+        in provider order. Nothing is copied; item access is a binary search
+        over the provider offsets.
 
         Use ``.indices_by_provider()`` to obtain the corresponding slices
         to each provider.
         """
-        return [ms for prov in self.providers for ms in prov.measurements]
+        return ConcatenatedSequence([p.measurements for p in self.providers])
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """
+        Position of the first measurement of each provider in ``.measurements``,
+        followed by the total number of measurements
+        """
+        return np.cumsum([0] + [len(p) for p in self.providers])
+
+    @property
+    def measurement_type_codes(self) -> np.ndarray:
+        """
+        Position in ``.providers`` of the provider (i.e. measurement type)
+        of each measurement
+        """
+        lengths = np.diff(self.offsets)
+        return np.repeat(np.arange(len(self.providers)), lengths)
+
+    def __len__(self):
+        return sum(len(p) for p in self.providers)
+
+    def __getitem__(self, subscript):
+        if isinstance(subscript, (int, np.integer)):
+            return self.measurements[subscript]
+        return self.subset(np.arange(len(self))[subscript])
+
+    def subset(self, indices):
+        """
+        New provider of the same class with the measurements at ``indices``
+        (positions in ``.measurements``), grouped by provider. Check
+        ``DatasetProvider.subset()`` for details.
+        """
+        indices = np.asarray(indices, dtype="int64")
+        offsets = self.offsets
+        providers = []
+        for provider, start, end in zip(self.providers, offsets[:-1], offsets[1:]):
+            local = indices[(indices >= start) & (indices < end)] - start
+            if len(local):
+                providers.append(provider.subset(local))
+        return self.from_providers(providers)
+
+    def select_types(self, *measurement_types):
+        """
+        New provider of the same class with the providers of the given
+        measurement types only. Measurements are not copied.
+        """
+        return self.from_providers(
+            p for p in self.providers if p.measurement_type in measurement_types
+        )
+
+    def to_columnar(self):
+        return self.from_providers(p.to_columnar() for p in self.providers)
+
+    def measurements_as_array(self, reduce=np.mean, dtype="float32"):
+        arrays = [p.measurements_as_array(reduce=reduce, dtype=dtype) for p in self.providers]
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+    def aggregate_replicates(self, **kwargs):
+        """
+        Same as ``DatasetProvider.aggregate_replicates()``, for each provider
+        """
+        return self.from_providers(p.aggregate_replicates(**kwargs) for p in self.providers)
+
+    def split_by_groups(self) -> dict:
+        """
+        Same as ``DatasetProvider.split_by_groups()``, splitting each provider
+        """
+        splits = defaultdict(list)
+        for provider in self.providers:
+            for key, dataset in provider.split_by_groups().items():
+                splits[key].append(dataset)
+        return {key: self.from_providers(providers) for key, providers in splits.items()}
+
+    @property
+    def conditions(self) -> set:
+        return set().union(*(p.conditions for p in self.providers))
+
+    def condition_parameters(self, names: Iterable[str], dtype="float32") -> np.ndarray:
+        names = list(names)
+        arrays = [p.condition_parameters(names, dtype=dtype) for p in self.providers]
+        return np.concatenate(arrays) if arrays else np.empty((0, len(names)), dtype=dtype)
 
     def indices_by_provider(self) -> dict:
         """
@@ -476,12 +1045,11 @@ class MultiDatasetProvider(DatasetProvider):
         ``slice`` objects can be passed directly to item access syntax, like
         ``list[slice(a, b)]``.
         """
-        indices = {}
-        offset = 0
-        for p in self.providers:
-            indices[p.measurement_type] = slice(offset, offset + len(p.measurements))
-            offset += len(p.measurements)
-        return indices
+        offsets = self.offsets.tolist()
+        return {
+            p.measurement_type: slice(start, end)
+            for p, start, end in zip(self.providers, offsets[:-1], offsets[1:])
+        }
 
     def to_dataframe(self, *args, **kwargs):
         """
@@ -490,34 +1058,78 @@ class MultiDatasetProvider(DatasetProvider):
         Check ``DatasetProvider.to_dataframe()`` for more details.
         """
         columns = ["Systems", "n_components", "Measurement", "MeasurementType"]
-        records = []
+        dataframes = []
         for provider in self.providers:
-            measurement_type = provider.measurement_type.__name__
-            for measurement in provider.measurements:
-                records.append(
-                    (
-                        measurement.system.name,
-                        len(measurement.system.components),
-                        measurement.values.mean(),
-                        measurement_type,
-                    )
-                )
-
-        return pd.DataFrame.from_records(records, columns=columns)
-
-    def to_numpy(self, **kwargs):
+            name = provider.measurement_type.__name__
+            df = provider.to_dataframe(*args, **kwargs)
+            if not df.empty:
+                df = df.rename(columns={name: "Measurement"}).assign(MeasurementType=name)
+                dataframes.append(df)
+        if not dataframes:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(dataframes, ignore_index=True)
+
+    def to_numpy(self, stacked=False, featurization_key="last", **kwargs):
         """
         List of Numpy-native arrays, as generated by each ``provider.to_numpy(...)``
         method. Check ``DatasetProvider.to_numpy`` docstring for more details.
+
+        Parameters
+        ----------
+        stacked : bool, optional=False
+            If True, return three arrays for all the providers instead:
+            ``X`` and ``y`` as in ``DatasetProvider.to_numpy()``, plus the
+            measurement type code of each row (see ``.measurement_type_codes``).
+            All featurizations must have the same shape.
         """
-        return [p.to_numpy(**kwargs) for p in self.providers]
+        if stacked:
+            return (
+                np.asarray(self.featurized_systems(key=featurization_key)),
+                self.measurements_as_array(**kwargs),
+                self.measurement_type_codes,
+            )
+        return [p.to_numpy(featurization_key=featurization_key, **kwargs) for p in self.providers]
 
-    def to_pytorch(self, **kwargs):
+    def to_pytorch(self, stacked=False, featurizer=None, featurization_key="last", **kwargs):
         """
         List of Numpy-native arrays, as generated by each ``provider.to_pytorch(...)``
         method. Check ``DatasetProvider.to_pytorch`` docstring for more details.
+
+        Parameters
+        ----------
+        featurizer : callable, optional
+            As in ``DatasetProvider.to_pytorch``. With ``stacked=True``, all
+            systems are featurized right away.
+        featurization_key : str, optional="last"
+            Which featurization to export, for prefeaturized systems
+        stacked : bool, optional=False
+            If True, return a single ``MultiTypeTorchDataset`` with the
+            prefeaturized systems of all providers, whose items also carry
+            the measurement type code and the observation model parameters
+            found in the conditions of each measurement. Its
+            ``observation_model`` handles mixed batches in one pass (see
+            ``kinoml.core.measurements.mixed_observation_model``).
         """
-        return [p.to_pytorch(**kwargs) for p in self.providers]
+        if stacked:
+            from .torch_datasets import MultiTypeTorchDataset
+            from ..core.measurements import mixed_observation_model, observation_model_parameters
+
+            measurement_types = [p.measurement_type for p in self.providers]
+            parameters = sorted(
+                {name for t in measurement_types for name in observation_model_parameters(t)}
+            )
+            return MultiTypeTorchDataset(
+                self._stacked_features(featurizer, featurization_key),
+                self.measurements_as_array(**kwargs),
+                self.measurement_type_codes,
+                observation_models=self.observation_models(backend="pytorch"),
+                conditions=self.condition_parameters(parameters),
+                observation_model=mixed_observation_model(measurement_types, parameters),
+            )
+        return [
+            p.to_pytorch(featurizer=featurizer, featurization_key=featurization_key, **kwargs)
+            for p in self.providers
+        ]
 
     def to_xgboost(self, **kwargs):
         """
@@ -530,15 +1142,12 @@ class MultiDatasetProvider(DatasetProvider):
         measurements = []
         for p in self.providers:
             measurements.append(f"{p.measurement_type.__name__}={len(p)}")
-        components = defaultdict(set)
-        for s in self.systems:
-            for c in s.components:
-                components[type(c).__name__].add(c.name)
-        components_str = ", ".join([f"{k}={len(v)}" for k, v in components.items()])
+        summary = self.registry.summary()
+        components_str = ", ".join([f"{k}={v}" for k, v in summary["components"].items()])
         return (
             f"<{self.__class__.__name__} with "
             f"{len(self)} measurements ({', '.join(measurements)}), "
-            f"and {len(self.systems)} systems ({components_str})>"
+            f"and {summary['systems']} systems ({components_str})>"
         )
 
 
@@ -0,0 +1,328 @@
+"""
+Download cache for dataset sources.
+
+Files are downloaded to ``<name>.part`` and renamed once complete, so an
+interrupted download never leaves a truncated file under the final name.
+Partial downloads are resumed with HTTP range requests, conditional on the
+``ETag`` (or ``Last-Modified``) recorded in ``<name>.part.validator``, so bytes
+from different versions of a remote file are never mixed. The size, modification
+time and SHA256 digest of every cached file are recorded in a manifest next to
+it. Cached files are reused as long as their size and modification time match
+the manifest; they are only hashed again when those change or when a digest is
+explicitly requested. A lock file per destination makes concurrent processes
+(or threads) share a single download.
+"""
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Mapping, Union
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from .storage import file_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "checksums.json"
+
+
+class FileLock:
+
+    """
+    Exclusive lock on ``path``, shared by processes and threads. The lock is
+    held on an open file, so the OS releases it if the holder crashes.
+
+    Parameters
+    ----------
+    path : str or Path
+        Lock file. It is created if needed and left in place.
+    timeout : float, optional
+        Seconds to wait for the lock before raising ``TimeoutError``.
+        By default, wait forever.
+    poll : float, optional=0.1
+        Seconds between attempts
+    """
+
+    def __init__(self, path: Union[str, Path], timeout: float = None, poll: float = 0.1):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll = poll
+        self._handle = None
+
+    def _try_lock(self) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(self._handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = open(self.path, "a+")
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock():
+            if deadline is not None and time.monotonic() > deadline:
+                self._handle.close()
+                raise TimeoutError(f"Could not acquire {self.path} in {self.timeout}s")
+            time.sleep(self.poll)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+        else:
+            self._handle.seek(0)
+            msvcrt.locking(self._handle.fileno(), msvcrt.LK_UNLCK, 1)
+        self._handle.close()
+        self._handle = None
+
+
+def _read_manifest(directory: Path) -> dict:
+    try:
+        with open(directory / MANIFEST) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _update_manifest(directory: Path, filename: str, entry: dict):
+    with FileLock(directory / f"{MANIFEST}.lock"):
+        manifest = _read_manifest(directory)
+        manifest[filename] = entry
+        tmp = directory / f".{MANIFEST}.tmp-{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, directory / MANIFEST)
+
+
+def _is_unchanged(path: Path, entry: dict) -> bool:
+    stat = path.stat()
+    return (
+        bool(entry)
+        and stat.st_size == entry.get("size")
+        and stat.st_mtime_ns == entry.get("mtime_ns")
+    )
+
+
+def _is_valid(path: Path, entry: dict, sha256: str = None) -> bool:
+    """
+    Whether the cached ``path`` can be reused. Only hashes the file if
+    ``sha256`` is given or the file changed since ``entry`` was recorded.
+    """
+    if sha256 is None and _is_unchanged(path, entry):
+        return True
+    if entry and path.stat().st_size != entry.get("size"):
+        return False
+    expected = sha256 or (entry or {}).get("sha256")
+    return expected is None or file_hash(path) == expected
+
+
+def _entry(path_or_url, path: Path, sha256: str = None) -> dict:
+    stat = path.stat()
+    return {
+        "source": str(path_or_url),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256 or file_hash(path),
+    }
+
+
+def cached_sha256(path: Union[str, Path]) -> Union[str, None]:
+    """
+    SHA256 digest of a file in a download cache, as recorded in the
+    manifest next to it, or None if it is not recorded or the file
+    changed since. Saves reading the whole file again.
+    """
+    path = Path(path)
+    entry = _read_manifest(path.parent).get(path.name)
+    if path.is_file() and _is_unchanged(path, entry):
+        return entry.get("sha256")
+    return None
+
+
+def _validator_path(part: Path) -> Path:
+    return part.with_name(f"{part.name}.validator")
+
+
+def _read_validator(part: Path, url: str) -> dict:
+    """
+    ``ETag`` / ``Last-Modified`` headers of the response that started
+    ``part``, or an empty dict if unknown or recorded for another URL
+    """
+    try:
+        with open(_validator_path(part)) as f:
+            validator = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return validator if validator.pop("url", None) == url else {}
+
+
+def _response_validator(response) -> dict:
+    validator = {}
+    etag = response.headers.get("ETag")
+    # weak tags cannot be used in If-Range
+    if etag and not etag.startswith("W/"):
+        validator["etag"] = etag
+    if response.headers.get("Last-Modified"):
+        validator["last_modified"] = response.headers["Last-Modified"]
+    return validator
+
+
+def _discard_part(part: Path):
+    for path in (part, _validator_path(part)):
+        if path.is_file():
+            path.unlink()
+
+
+def _fetch(url: str, part: Path, chunksize: int, timeout: float):
+    """
+    Stream ``url`` into ``part``, resuming after its current size if the
+    server accepts range requests and confirms (with ``If-Range``) that the
+    remote file did not change since ``part`` was started. Otherwise, the
+    download starts again from the first byte.
+    """
+    offset = part.stat().st_size if part.is_file() else 0
+    validator = _read_validator(part, url) if offset else {}
+    if offset and not validator:
+        logger.debug("Cannot tell whether %s changed since %s was started", url, part)
+        _discard_part(part)
+        offset = 0
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator.get("etag") or validator["last_modified"]
+    try:
+        response = urlopen(Request(url, headers=headers), timeout=timeout)
+    except HTTPError as error:
+        if error.code != 416 or not offset:  # 416: range not satisfiable
+            raise
+        _discard_part(part)
+        return _fetch(url, part, chunksize, timeout)
+    with response:
+        resumed = bool(offset) and response.status == 206
+        if resumed and _response_validator(response) != validator:
+            # the server ignored If-Range; these bytes belong to another version
+            response.close()
+            _discard_part(part)
+            return _fetch(url, part, chunksize, timeout)
+        if offset:
+            logger.debug("Resuming %s at byte %d: %s", url, offset, resumed)
+        if not resumed:
+            with open(_validator_path(part), "w") as f:
+                json.dump({"url": url, **_response_validator(response)}, f)
+        with open(part, "ab" if resumed else "wb") as f:
+            shutil.copyfileobj(response, f, chunksize)
+
+
+def download(
+    path_or_url: Union[str, Path],
+    directory: Union[str, Path],
+    filename: str = None,
+    sha256: str = None,
+    chunksize: int = 2 ** 20,
+    timeout: float = 60,
+    lock_timeout: float = None,
+) -> Path:
+    """
+    Retrieve a file into ``directory``, unless a valid copy is already there.
+
+    Parameters
+    ----------
+    path_or_url : str or Path
+        URL, or path to a local file, to copy into the cache
+    directory : str or Path
+        Cache directory
+    filename : str, optional
+        Name of the cached file. Defaults to the last component of ``path_or_url``.
+    sha256 : str, optional
+        Expected digest. If not given, the digest recorded in the manifest the
+        first time the file was downloaded is used to validate cached copies.
+    chunksize : int, optional
+        Bytes read and written at a time
+    timeout : float, optional=60
+        Seconds to wait for the server
+    lock_timeout : float, optional
+        Seconds to wait for another process downloading the same file
+
+    Returns
+    -------
+    Path
+        The cached file
+    """
+    directory = Path(directory)
+    filename = filename or os.path.basename(str(path_or_url))
+    path = directory / filename
+    directory.mkdir(parents=True, exist_ok=True)
+    with FileLock(directory / f".{filename}.lock", timeout=lock_timeout):
+        entry = _read_manifest(directory).get(filename)
+        if path.is_file():
+            if _is_valid(path, entry, sha256):
+                if not _is_unchanged(path, entry):
+                    # the contents were just checked against this digest, if any
+                    digest = sha256 or (entry or {}).get("sha256")
+                    _update_manifest(directory, filename, _entry(path_or_url, path, digest))
+                return path
+            logger.warning("Cached %s is corrupt or outdated; downloading it again", path)
+            path.unlink()
+
+        part = directory / f"{filename}.part"
+        if os.path.isfile(path_or_url):
+            shutil.copyfile(path_or_url, part)
+        else:
+            _fetch(str(path_or_url), part, chunksize, timeout)
+        digest = file_hash(part)
+        if sha256 is not None and digest != sha256:
+            _discard_part(part)
+            raise ValueError(f"Checksum mismatch for {path_or_url}: expected sha256 {sha256}")
+        os.replace(part, path)
+        _discard_part(part)
+        _update_manifest(directory, filename, _entry(path_or_url, path, digest))
+    return path
+
+
+def prefetch(
+    sources: Union[Iterable[str], Mapping[str, str]],
+    directory: Union[str, Path],
+    max_workers: int = 4,
+    **kwargs,
+) -> dict:
+    """
+    Download several sources concurrently with ``download()``.
+
+    Parameters
+    ----------
+    sources : list of str, or dict
+        URLs (or local paths), or a ``{url: sha256}`` mapping
+    directory : str or Path
+        Cache directory
+    max_workers : int, optional=4
+        Concurrent downloads
+    kwargs : optional
+        Forwarded to ``download()``
+
+    Returns
+    -------
+    dict
+        ``{url: cached path}``
+    """
+    if not isinstance(sources, Mapping):
+        sources = dict.fromkeys(sources)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            url: executor.submit(download, url, directory, sha256=sha256, **kwargs)
+            for url, sha256 in sources.items()
+        }
+        return {url: future.result() for url, future in futures.items()}
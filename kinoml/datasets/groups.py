@@ -1,11 +1,14 @@
 """
 Splitting strategies for datasets
 """
-import random
 from collections import defaultdict
 
+import numpy as np
+import pandas as pd
 from tqdm.auto import tqdm
 
+from .views import measurement_column
+
 
 class BaseGrouper:
     """
@@ -32,21 +35,53 @@ class BaseGrouper:
         dataset : DatasetProvider
             The same dataset passed in the input, with
             measurements modified in place.
+
+        Note
+        ----
+        For providers backed by a ``MeasurementTable``, groups are written
+        to the ``groups`` array of the table, without creating any
+        measurement object.
         """
         groups = self.indices(dataset, **kwargs)
-        measurements = dataset.measurements
-        for key, indices in groups.items():
-            for index in indices:
-                ms = measurements[index]
-                if not overwrite and ms.group is not None:
-                    raise ValueError(
-                        f"Cannot assign group to `{ms}` because a group is "
-                        f"already assigned: {ms.group}. Choose `overwrite=True` "
-                        f"to ignore existing groups."
-                    )
-                ms.group = key
+        offset = 0
+        for provider in getattr(dataset, "providers", [dataset]):
+            size = len(provider)
+            for key, indices in groups.items():
+                indices = np.asarray(indices, dtype="int64")
+                indices = indices[(indices >= offset) & (indices < offset + size)] - offset
+                if provider.is_columnar:
+                    self._assign_array(provider.measurements.groups, indices, key, overwrite)
+                else:
+                    self._assign_objects(provider.measurements, indices, key, overwrite)
+            offset += size
         return dataset
 
+    @staticmethod
+    def _assign_array(groups, indices, key, overwrite):
+        if not overwrite:
+            assigned = indices[groups[indices] != None]  # noqa: E711, elementwise
+            if len(assigned):
+                raise ValueError(
+                    f"Cannot assign group to measurement #{assigned[0]} because a group is "
+                    f"already assigned: {groups[assigned[0]]}. Choose `overwrite=True` "
+                    f"to ignore existing groups."
+                )
+        value = np.empty(1, dtype=object)
+        value[0] = key  # avoid broadcasting tuple keys
+        groups[indices] = value
+
+    @staticmethod
+    def _assign_objects(measurements, indices, key, overwrite):
+        for index in indices:
+            ms = measurements[index]
+            if not overwrite and ms.group is not None:
+                raise ValueError(
+                    f"Cannot assign group to `{ms}` because a group is "
+                    f"already assigned: {ms.group}. Choose `overwrite=True` "
+                    f"to ignore existing groups."
+                )
+            ms.group = key
+
     def indices(self, dataset, **kwargs):
         """
         Given a dataset, create a dictionary that maps keys or labels
@@ -60,11 +95,29 @@ class BaseGrouper:
         Returns
         -------
         dict
-            Maps ``int` or ``str`` to a list of ``int``
+            Maps ``int` or ``str`` to an array of ``int``
         """
         raise NotImplementedError("Implement in your subclass")
 
 
+def _normalize_ratios(ratios) -> dict:
+    if isinstance(ratios, (list, tuple)):
+        ratios = {i: ratio for i, ratio in enumerate(ratios)}
+    assert np.isclose(sum(ratios.values()), 1), f"`ratios` must sum 1, but you provided {ratios}"
+    return ratios
+
+
+def _split_by_rank(ranks, sizes, ratios) -> np.ndarray:
+    """
+    Group position (in ``ratios`` order) of items ranked ``ranks`` within
+    blocks of ``sizes`` items, so each block is split following ``ratios``.
+    Boundaries are rounded like ``round(cumulative_ratio * size)``.
+    """
+    cumulative = np.cumsum(list(ratios.values()))
+    bounds = np.round(np.outer(sizes, cumulative))  # shape (n_items, n_groups)
+    return (ranks[:, None] >= bounds).sum(axis=1)
+
+
 class RandomGrouper(BaseGrouper):
 
     """
@@ -76,28 +129,115 @@ class RandomGrouper(BaseGrouper):
         1-based ratios for the different groups. They must sum 1.0. If a
         dict is provided, the keys are used to label the resulting groups.
         Otherwise, the groups are 0-enumerated.
+    random_state : int or numpy.random.Generator, optional
+        Seed for the shuffle
 
     """
 
-    def __init__(self, ratios):
-        if isinstance(ratios, (list, tuple)):
-            ratios = {i: ratio for i, ratio in enumerate(ratios)}
-        assert sum(ratios.values()) == 1, f"`ratios` must sum 1, but you provided {ratios}"
-        self.ratios = ratios
+    def __init__(self, ratios, random_state=None):
+        self.ratios = _normalize_ratios(ratios)
+        self.random_state = random_state
 
     def indices(self, dataset, **kwargs):
         length = len(dataset)
-        indices = list(range(length))
-        random.shuffle(indices)
+        indices = np.random.default_rng(self.random_state).permutation(length)
         groups = {}
         start = 0
         for key, ratio in self.ratios.items():
             end = start + int(round(ratio * length, 0))
-            groups[key] = indices[start:end]
+            groups[key] = np.sort(indices[start:end])
             start = end
         return groups
 
 
+class StratifiedGrouper(BaseGrouper):
+
+    """
+    Randomized groups that keep the same ratios within each stratum, so
+    every group covers the distribution of ``by`` like the whole dataset.
+
+    Parameters
+    ----------
+    ratios : tuple or dict
+        Same as in ``RandomGrouper``
+    by : str, optional="value"
+        What defines the strata. ``"value"`` splits the measurement values in
+        ``n_bins`` quantile bins. Any other field accepted by
+        ``DatasetProvider.query()`` (e.g. ``"measurement_type"``, ``"protein"``
+        or a metadata key) is used as a categorical label.
+    n_bins : int, optional=10
+        Number of quantile bins, when stratifying by value
+    random_state : int or numpy.random.Generator, optional
+        Seed for the shuffle
+    """
+
+    def __init__(self, ratios, by="value", n_bins=10, random_state=None):
+        self.ratios = _normalize_ratios(ratios)
+        self.by = by
+        self.n_bins = n_bins
+        self.random_state = random_state
+
+    def strata(self, dataset) -> np.ndarray:
+        """
+        Stratum code of each measurement
+        """
+        column = measurement_column(dataset, self.by)
+        if self.by == "value":
+            edges = np.nanquantile(column, np.linspace(0, 1, self.n_bins + 1)[1:-1])
+            return np.digitize(column, edges)
+        codes, _ = pd.factorize(column)
+        return codes
+
+    def indices(self, dataset, **kwargs):
+        strata = self.strata(dataset)
+        keys = np.random.default_rng(self.random_state).random(len(strata))
+        order = np.lexsort((keys, strata))  # shuffled within each stratum
+        _, starts, sizes = np.unique(strata[order], return_index=True, return_counts=True)
+        ranks = np.arange(len(order)) - np.repeat(starts, sizes)
+        positions = _split_by_rank(ranks, np.repeat(sizes, sizes), self.ratios)
+        return {key: np.sort(order[positions == i]) for i, key in enumerate(self.ratios)}
+
+
+class TimeSplitGrouper(BaseGrouper):
+
+    """
+    Sort measurements by a time-like metadata field (e.g. ChEMBL ``year``)
+    and assign the oldest ones to the first group, the next ones to the second
+    group, and so on, following ``ratios``. Measurements with the same time
+    always end up in the same group, so ratios are approximate.
+
+    Measurements without a value for ``field`` are not assigned to any group.
+
+    Parameters
+    ----------
+    ratios : tuple or dict
+        Same as in ``RandomGrouper``, in chronological order
+    field : str, optional="year"
+        Metadata key with the time of each measurement
+    """
+
+    def __init__(self, ratios, field="year"):
+        self.ratios = _normalize_ratios(ratios)
+        self.field = field
+
+    def indices(self, dataset, **kwargs):
+        times = np.asarray(measurement_column(dataset, self.field), dtype="float64")
+        valid = np.flatnonzero(~np.isnan(times))
+        order = valid[np.argsort(times[valid], kind="stable")]
+        sorted_times = times[order]
+        cumulative = np.cumsum(list(self.ratios.values()))
+        # move each boundary back to the first measurement with its time, to keep ties together
+        bounds = np.round(cumulative * len(order)).astype("int64")
+        bounds = [
+            len(order) if b >= len(order) else np.searchsorted(sorted_times, sorted_times[b])
+            for b in bounds
+        ]
+        starts = [0, *bounds[:-1]]
+        return {
+            key: np.sort(order[start:end]) for key, start, end in zip(self.ratios, starts, bounds)
+        }
+
+
 class CallableGrouper(BaseGrouper):
     """
     A grouper that applies a user-provided function to each Measurement
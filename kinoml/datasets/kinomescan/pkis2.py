@@ -1,11 +1,14 @@
 from typing import AnyStr, Union
 from pathlib import Path
+from functools import partial
 import math
 
+import numpy as np
 import pandas as pd
 
 from .utils import KINOMEScanMapper
 from .core import KinomeScanDatasetProvider
+from ..tables import LazySequence, MeasurementTable
 from ...core.proteins import AminoAcidSequence
 from ...core.ligands import SmilesLigand
 from ...core.systems import ProteinLigandComplex
@@ -24,8 +27,8 @@ class PKIS2DatasetProvider(KinomeScanDatasetProvider):
 
     It will build a dataframe where the SMILES-representation of ligands are the index
     and the columns are the kinase names. To map between KINOMEscan kinase names and
-    actual sequences, helper object `kinoml.datatasets.kinomescan.utils.KINOMEScanMapper`
-    is instantiated as a class attribute.
+    actual sequences, each provider holds a helper
+    `kinoml.datatasets.kinomescan.utils.KINOMEScanMapper` (see ``.mapper``).
 
     Examples
     --------
@@ -37,12 +40,16 @@ class PKIS2DatasetProvider(KinomeScanDatasetProvider):
 
     """
 
+    _mapper = None
+
     @classmethod
     def from_source(  # pylint: disable=arguments-differ
         cls,
         filename: Union[AnyStr, Path] = datapath("kinomescan/journal.pone.0181585.s004.csv"),
         measurement_type: BaseMeasurement = PercentageDisplacementMeasurement,
         conditions: BaseConditions = AssayConditions(pH=7.0),
+        mapper: KINOMEScanMapper = None,
+        mapper_kwargs: dict = None,
         **kwargs
     ):
         """
@@ -56,55 +63,56 @@ class PKIS2DatasetProvider(KinomeScanDatasetProvider):
             Which type of measurement was taken for each protein-ligand pair
         conditions : BaseConditions
             Experimental conditions of the assay
+        mapper : KINOMEScanMapper, optional
+            Maps kinase names to sequences. By default, a new one is created
+            with ``mapper_kwargs`` (e.g. ``offline=True``) when the first
+            kinase is needed, since that may involve online queries.
+        mapper_kwargs : dict, optional
+            Forwarded to ``KINOMEScanMapper`` if ``mapper`` is not given
 
         Note
         ----
-        TODO:
-
-        - Investigate lazy access and object generation
-        - Review accuracy of item access by indices (correlative order?)
+        The provider is backed by a ``MeasurementTable`` holding the non-NaN
+        cells of the ligand x kinase matrix, in row-major order. Kinases, ligands,
+        systems and measurement objects are only created when accessed, so
+        ``.measurements_as_array()`` does not need any of them. Ligands with
+        the same SMILES string share their systems.
         """
+        if mapper is None:
+            mapper = _LazyMapper(**(mapper_kwargs or {}))
         df = cls._read_dataframe(filename)
         df = df[df.index.notna()]
-
-        # Read in proteins
-        mapper = KINOMEScanMapper()
-        kinases = []
-        for kin_name in df.columns:
-            sequence = mapper.sequence_for_name(kin_name)
-            accession = mapper.accession_for_name(kin_name)
-            mutations = mapper.mutations_for_name(kin_name)
-            if math.isnan(mutations):
-                mutations = None
-            start_stop = mapper.start_stop_for_name(kin_name)
-            metadata = {"accession": accession, "mutations": mutations, "start_stop": start_stop}
-            kinases.append(AminoAcidSequence(sequence, name=kin_name, metadata=metadata))
-
-        # Read in ligands
-        ligands = []
-        for smiles in df.index:
-            # We only read the SMILES for now. Promoting to full-fledged objects
-            # can be done through featurizers (see SmilesToLigandFeaturizer)
-            ligand = SmilesLigand.from_smiles(smiles, name=smiles)
-            ligands.append(ligand)
-
-        lol = list(df.itertuples(index=False, name=None))  # FIXME: This might be dangerous
-
-        # Build ProteinLigandComplex objects
-        systems = {}
-        measurements = []
-        for i, ligand in enumerate(ligands):
-            for j, kinase in enumerate(kinases):
-                value = lol[i][j]
-                if not value and value != 0:
-                    continue  # this is a nan cell
-                key = (ligand.to_smiles(), kinase.sequence)
-                if key not in systems:
-                    systems[key] = ProteinLigandComplex([kinase, ligand])
-                measurement = measurement_type(value, conditions=conditions, system=systems[key])
-                measurements.append(measurement)
-
-        return cls(measurements=measurements, **kwargs)
+        matrix = df.to_numpy(dtype="float64")
+        rows, columns = np.nonzero(~np.isnan(matrix))
+        smiles_codes, smiles = pd.factorize(df.index)
+        kinase_names = df.columns.tolist()
+
+        kinases = LazySequence(
+            len(kinase_names), partial(_kinase, names=kinase_names, mapper=mapper)
+        )
+        ligands = LazySequence(len(smiles), partial(_ligand, smiles=smiles.tolist()))
+        systems = LazySequence(
+            len(ligands) * len(kinases), partial(_system, kinases=kinases, ligands=ligands)
+        )
+        table = MeasurementTable(
+            values=matrix[rows, columns],
+            systems=systems,
+            system_index=smiles_codes[rows] * len(kinases) + columns,
+            measurement_types=[measurement_type],
+            conditions=[conditions],
+        )
+        provider = cls(measurements=table, **kwargs)
+        provider._mapper = mapper
+        return provider
+
+    @property
+    def mapper(self) -> KINOMEScanMapper:
+        """
+        Mapper used to build the kinases of this provider
+        """
+        if isinstance(self._mapper, _LazyMapper):
+            return self._mapper.get()
+        return self._mapper
 
     @staticmethod
     def _read_dataframe(filename: Union[AnyStr, Path]) -> pd.DataFrame:
@@ -119,3 +127,50 @@ class PKIS2DatasetProvider(KinomeScanDatasetProvider):
         """
         # Kinase names are columns 7>413. Smiles appear at column 3.
         return pd.read_csv(filename, usecols=[3] + list(range(7, 413)), index_col=0)
+
+
+class _LazyMapper:
+
+    """
+    Creates a ``KINOMEScanMapper(**kwargs)`` on first use: building it may need
+    online queries. Only ``kwargs`` are pickled, so processes receiving the
+    systems table build their own mapper if they need one.
+    """
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self._mapper = None
+
+    def get(self) -> KINOMEScanMapper:
+        if self._mapper is None:
+            self._mapper = KINOMEScanMapper(**self.kwargs)
+        return self._mapper
+
+    def __getstate__(self):
+        return {"kwargs": self.kwargs, "_mapper": None}
+
+
+def _kinase(index: int, names: list, mapper) -> AminoAcidSequence:
+    name = names[index]
+    if isinstance(mapper, _LazyMapper):
+        mapper = mapper.get()
+    mutations = mapper.mutations_for_name(name)
+    if isinstance(mutations, float) and math.isnan(mutations):
+        mutations = None
+    metadata = {
+        "accession": mapper.accession_for_name(name),
+        "mutations": mutations,
+        "start_stop": mapper.start_stop_for_name(name),
+    }
+    return AminoAcidSequence(mapper.sequence_for_name(name), name=name, metadata=metadata)
+
+
+def _ligand(index: int, smiles: list) -> SmilesLigand:
+    # We only read the SMILES for now. Promoting to full-fledged objects
+    # can be done through featurizers (see SmilesToLigandFeaturizer)
+    return SmilesLigand.from_smiles(smiles[index], name=smiles[index])
+
+
+def _system(index: int, kinases: LazySequence, ligands: LazySequence) -> ProteinLigandComplex:
+    ligand, kinase = divmod(index, len(kinases))
+    return ProteinLigandComplex([kinases[kinase], ligands[ligand]])
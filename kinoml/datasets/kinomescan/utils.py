@@ -3,10 +3,10 @@ import logging
 from pathlib import Path
 import pandas as pd
 from typing import Union, AnyStr, Iterable
-from time import sleep
 
+from ..ncbi import FastaStore, NCBISequenceRetriever
 from ...core.proteins import AminoAcidSequence
-from ...utils import grouper, datapath, APPDIR
+from ...utils import datapath, APPDIR
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +20,19 @@ class KINOMEScanMapper:
     can be ingested in our pipelines.
 
     Since this relies on online queries, it will cache the results to disk
-    by default.
+    by default. Raw NCBI records are also kept in a local FASTA store, so
+    they are only downloaded once, and the mapper can be built without
+    network access from a FASTA file containing all the accessions.
 
     Parameters:
         raw_datasheet: Raw CSV file with the DiscoverX information
         use_cache: Whether to read the data from cache if possible. Set to
             ``False`` to ignore existing caches and rewrite them.
+        sequence_store: FASTA file (or ``FastaStore``) with the raw NCBI records.
+            Defaults to the one in the user cache directory.
+        offline: Only use the records in ``sequence_store``; never query NCBI.
+        kwargs: Forwarded to ``kinoml.datasets.ncbi.NCBISequenceRetriever``
+            (e.g. ``max_workers``, ``rate_limit`` or ``api_key``).
 
     """
 
@@ -38,8 +45,11 @@ class KINOMEScanMapper:
             "kinomescan/DiscoverX_489_Kinase_Assay_Construct_Information.csv"
         ),
         use_cache: bool = True,
+        sequence_store: Union[AnyStr, Path, FastaStore] = None,
+        offline: bool = False,
         **kwargs,
     ):
+        self._retriever = NCBISequenceRetriever(store=sequence_store, offline=offline, **kwargs)
         cached_path = Path(APPDIR.user_cache_dir) / "kinomescan" / f"mapper.{self._version}.csv"
         self.sequence_information = raw_datasheet
         if use_cache and cached_path.is_file():
@@ -127,19 +137,12 @@ class KINOMEScanMapper:
 
         return wt_sequences, kinases, mutations, start_stops
 
-    @staticmethod
-    def _retrieve_sequence(*accessions: Iterable[AnyStr]):
-        """
-        Batch all queries in groups and delegate to
-        `AminoAcidSequence.from_ncbi`.
-        """
-        # 1) Retrieve all raw sequences from NCBI Protein db
-        sequences = []
-        max_requests = AminoAcidSequence.ACCESSION_MAX_RETRIEVAL
-        for accession in grouper(accessions, max_requests, fillvalue=""):
-            sequences.extend(AminoAcidSequence.from_ncbi(*accession))
-            sleep(0.5)
-        return sequences
+    def _retrieve_sequence(self, *accessions: Iterable[AnyStr]):
+        """
+        Retrieve all raw sequences from NCBI Protein db (or the local
+        sequence store) with ``kinoml.datasets.ncbi.NCBISequenceRetriever``.
+        """
+        return self._retriever.sequences(*accessions, cls=AminoAcidSequence)
 
     @staticmethod
     def _apply_mutations(sequence: AminoAcidSequence, mutation_string: AnyStr):
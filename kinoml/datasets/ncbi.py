@@ -0,0 +1,314 @@
+"""
+Retrieval of FASTA records from NCBI, backed by a local sequence store.
+
+``NCBISequenceRetriever`` looks accessions up in a ``FastaStore`` first and
+only queries the missing ones, in batches sent concurrently over a pooled
+HTTP session and spaced to stay within a rate limit. Every retrieved record
+is appended to the store, so later runs (or ``offline=True`` runs, which
+never touch the network) are served from disk.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterable, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..core.proteins import AminoAcidSequence
+from ..utils import APPDIR
+
+logger = logging.getLogger(__name__)
+
+
+def parse_fasta(text: str) -> list:
+    """
+    Parse FASTA-formatted ``text``
+
+    Returns
+    -------
+    list of (str, str)
+        ``(header, sequence)`` pairs. Headers do not include the leading ``>``.
+    """
+    records = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(">"):
+            records.append((line[1:], []))
+        elif records:
+            records[-1][1].append(line)
+    return [(header, "".join(lines)) for header, lines in records]
+
+
+def format_fasta(records: Iterable, width: int = 70) -> str:
+    """
+    Format ``(header, sequence)`` pairs as FASTA text
+    """
+    chunks = []
+    for header, sequence in records:
+        chunks.append(f">{header}\n")
+        for start in range(0, len(sequence), width):
+            chunks.append(f"{sequence[start : start + width]}\n")
+    return "".join(chunks)
+
+
+def _accession_keys(header: str) -> list:
+    """
+    Keys a record can be looked up with: the first word of its header
+    (``NP_005148.2``) and, for versioned accessions, the bare one (``NP_005148``).
+    """
+    accession = header.split(maxsplit=1)[0] if header.strip() else ""
+    keys = [accession]
+    if "." in accession:
+        keys.append(_unversioned(accession))
+    return keys
+
+
+def _unversioned(accession: str) -> str:
+    return accession.rsplit(".", 1)[0]
+
+
+class FastaStore:
+
+    """
+    Local FASTA file indexed by accession. Records are kept in memory and
+    new ones are appended to the file as they are added.
+
+    Records are found by the accession in their header, with or without
+    version, or by the accessions they were added for (see ``add()``).
+    The file keeps NCBI's headers, so the latter are saved as
+    tab-separated ``accession -> header accession`` lines in a small
+    index next to it (``<path>.aliases``).
+
+    Parameters
+    ----------
+    path : str or Path
+        FASTA file. It is created on the first ``add()`` if it does not exist.
+        A bundled FASTA file can be used as a read-only store for offline runs.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.aliases_path = self.path.with_name(f"{self.path.name}.aliases")
+        self._records = {}
+        if self.path.is_file():
+            self._index(parse_fasta(self.path.read_text()))
+        if self.aliases_path.is_file():
+            for line in self.aliases_path.read_text().splitlines():
+                accession, _, key = line.partition("\t")
+                if key in self._records:
+                    self._records.setdefault(accession, self._records[key])
+
+    def _index(self, records: Iterable):
+        for header, sequence in records:
+            for key in _accession_keys(header):
+                self._records.setdefault(key, (header, sequence))
+
+    def __contains__(self, accession: str) -> bool:
+        return self.get(accession) is not None
+
+    def __len__(self):
+        return len({header for header, _ in self._records.values()})
+
+    def get(self, accession: str, default=None):
+        """
+        ``(header, sequence)`` record for ``accession``, or ``default``.
+        A versioned accession also matches a record with another version.
+        """
+        accession = accession.strip()
+        record = self._records.get(accession)
+        if record is None:
+            record = self._records.get(_unversioned(accession))
+        return default if record is None else record
+
+    def add(self, records: Iterable, accessions: Iterable[str] = None):
+        """
+        Append ``(header, sequence)`` records to the file, skipping known accessions
+
+        Parameters
+        ----------
+        records : list of (str, str)
+        accessions : list of str, optional
+            The accession each record was requested with, in the same order,
+            in case it does not match the header
+        """
+        records = list(records)
+        new = [r for r in records if _accession_keys(r[0])[0] not in self._records]
+        if new:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # a single write per batch, so an interrupted run leaves whole records behind
+            with open(self.path, "a") as f:
+                f.write(format_fasta(new))
+            self._index(new)
+        aliases = {}
+        for accession, record in zip(accessions or (), records):
+            accession = accession.strip()
+            if accession not in self._records and self.get(accession) != record:
+                self._records[accession] = record
+                aliases[accession] = _accession_keys(record[0])[0]
+        if aliases:
+            with open(self.aliases_path, "a") as f:
+                f.write("".join(f"{alias}\t{key}\n" for alias, key in aliases.items()))
+
+
+class _RateLimiter:
+
+    """
+    Thread-safe limiter spacing calls at least ``1 / rate`` seconds apart
+    """
+
+    def __init__(self, rate: float = None):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class NCBISequenceRetriever:
+
+    """
+    Retrieve FASTA records for NCBI accessions, with a local store.
+
+    Parameters
+    ----------
+    store : FastaStore, str or Path, optional
+        Where retrieved records are persisted. Defaults to a FASTA file
+        in the user cache directory.
+    offline : bool, optional=False
+        Only use the records in ``store``. Missing accessions raise ``LookupError``.
+    url : str, optional
+        URL template with a ``{}`` placeholder for comma-separated accessions.
+        Defaults to the NCBI Protein E-utilities endpoint.
+    batch_size : int, optional=50
+        Accessions per request
+    max_workers : int, optional=4
+        Concurrent requests. This is also the size of the connection pool.
+    rate_limit : float, optional=3
+        Maximum requests per second. NCBI allows 3 without an API key and 10
+        with one. Set to None to disable.
+    api_key : str, optional
+        NCBI API key, added to each request
+    timeout : float, optional=30
+        Seconds to wait for each response
+    retries : int, optional=3
+        Retries for failed connections and 429/5xx responses, with exponential backoff
+    """
+
+    URL = AminoAcidSequence._ACCESSION_URL
+
+    def __init__(
+        self,
+        store: Union[FastaStore, str, Path] = None,
+        offline: bool = False,
+        url: str = None,
+        batch_size: int = AminoAcidSequence.ACCESSION_MAX_RETRIEVAL,
+        max_workers: int = 4,
+        rate_limit: float = 3,
+        api_key: str = None,
+        timeout: float = 30,
+        retries: int = 3,
+    ):
+        if store is None:
+            store = Path(APPDIR.user_cache_dir) / "sequences" / "ncbi.fasta"
+        if not isinstance(store, FastaStore):
+            store = FastaStore(store)
+        self.store = store
+        self.offline = offline
+        self.url = url or self.URL
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.api_key = api_key
+        self.timeout = timeout
+        self._limiter = _RateLimiter(rate_limit)
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _fetch_batch(self, accessions: list) -> tuple:
+        """
+        Records for ``accessions``, and the accession each one answers.
+        NCBI returns records in the requested order, so they are paired by
+        position; if some are missing, by accession without version.
+        """
+        url = self.url.format(",".join(accessions))
+        params = {"api_key": self.api_key} if self.api_key else None
+        self._limiter.wait()
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        records = parse_fasta(response.text)
+        if len(records) == len(accessions):
+            return records, accessions
+        by_accession = {_accession_keys(header)[-1]: (header, seq) for header, seq in records}
+        pairs = [
+            (by_accession[_unversioned(accession)], accession)
+            for accession in accessions
+            if _unversioned(accession) in by_accession
+        ]
+        return [record for record, _ in pairs], [accession for _, accession in pairs]
+
+    def fetch(self, *accessions: str) -> dict:
+        """
+        FASTA records for ``accessions``, from the store or, for the
+        missing ones, from NCBI.
+
+        Returns
+        -------
+        dict
+            ``{accession: (header, sequence)}``, with surrounding whitespace
+            stripped from the accessions
+        """
+        accessions = list(dict.fromkeys(accession.strip() for accession in accessions))
+        missing = [accession for accession in accessions if accession not in self.store]
+        if missing and not self.offline:
+            batches = [
+                missing[i : i + self.batch_size] for i in range(0, len(missing), self.batch_size)
+            ]
+            logger.debug("Retrieving %d accessions in %d requests", len(missing), len(batches))
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._fetch_batch, batch) for batch in batches]
+                for future in as_completed(futures):
+                    # stored as each batch completes, so finished work survives errors
+                    records, requested = future.result()
+                    self.store.add(records, accessions=requested)
+            missing = [accession for accession in missing if accession not in self.store]
+        if missing:
+            mode = "in offline mode" if self.offline else "from NCBI"
+            raise LookupError(
+                f"Could not retrieve {len(missing)} accessions {mode} "
+                f"(store: {self.store.path}): {', '.join(missing[:10])}"
+            )
+        return {accession: self.store.get(accession) for accession in accessions}
+
+    def sequences(self, *accessions: str, cls=AminoAcidSequence) -> list:
+        """
+        One ``cls`` object per accession (in the same order), named after
+        the FASTA header, like ``Biosequence.from_ncbi()`` does.
+        """
+        records = self.fetch(*accessions)
+        sequences = []
+        for accession in accessions:
+            accession = accession.strip()
+            header, sequence = records[accession]
+            sequences.append(cls(sequence, name=header, metadata={"accession": accession}))
+        return sequences
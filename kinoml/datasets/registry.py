@@ -0,0 +1,198 @@
+"""
+Integer indices over the systems and components of a ``DatasetProvider``
+"""
+from collections import defaultdict
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from ..core.measurements import BaseMeasurement
+from .tables import IndexedSequence, MeasurementTable
+
+
+class SystemRegistry:
+
+    """
+    Assigns stable integer IDs to the systems and components referenced
+    by a collection of measurements, and keeps the index arrays that
+    relate them:
+
+    - ``measurement_systems``: system ID of each measurement
+    - ``component_index()``: component IDs of each system, in CSR layout
+
+    Systems get their IDs in order of first appearance and keep them
+    when more measurements are registered with ``add_measurements()``.
+    Components are indexed on demand, so table-backed registries with lazy
+    systems (see ``MeasurementTable``) do not create them until needed.
+
+    Parameters
+    ----------
+    systems : sequence of System, optional
+        Shared system table. System IDs are positions in this sequence.
+    measurement_systems : array-like of int, optional
+        System ID of each measurement, for an existing ``systems`` table.
+    """
+
+    def __init__(self, systems: Sequence = None, measurement_systems: Iterable[int] = None):
+        self.systems = [] if systems is None else systems
+        if measurement_systems is None:
+            measurement_systems = np.empty(0, dtype="int64")
+        self.measurement_systems = np.asarray(measurement_systems, dtype="int64")
+        self._system_ids = None  # id(system) -> system ID, only needed to add systems
+        self.components = []
+        self._component_ids = {}
+        self._component_offsets = [0]
+        self._component_codes = []
+        self._indexed_ids = np.empty(0, dtype="int64")
+        self._cache = {}
+
+    @classmethod
+    def from_measurements(cls, measurements: Iterable[BaseMeasurement]) -> "SystemRegistry":
+        registry = cls()
+        registry.add_measurements(measurements)
+        return registry
+
+    @classmethod
+    def from_table(cls, table: MeasurementTable) -> "SystemRegistry":
+        """
+        Registry sharing the system table and system index of ``table``.
+        System IDs are the positions in ``table.systems``.
+        """
+        return cls(systems=table.systems, measurement_systems=table.system_index)
+
+    @classmethod
+    def concatenate(cls, registries: Iterable["SystemRegistry"]) -> "SystemRegistry":
+        """
+        Registry for the measurements of several registries, one after the other.
+        Systems present in more than one registry are registered once.
+        """
+        registry = cls()
+        measurement_systems = []
+        for other in registries:
+            mapping = np.full(len(other.systems), -1, dtype="int64")
+            for system_id in other.system_ids:
+                mapping[system_id] = registry.add_system(other.systems[system_id])
+            measurement_systems.append(mapping[other.measurement_systems])
+        if measurement_systems:
+            registry.measurement_systems = np.concatenate(measurement_systems)
+        return registry
+
+    def __len__(self):
+        return len(self.measurement_systems)
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} with {len(self)} measurements "
+            f"and {len(self.system_ids)} systems>"
+        )
+
+    def add_system(self, system) -> int:
+        """
+        Return the ID of ``system``, registering it if needed
+        """
+        if self._system_ids is None:
+            if not isinstance(self.systems, list):
+                # shared (possibly lazy) table: copy it before appending
+                self.systems = list(self.systems)
+            self._system_ids = {id(s): i for i, s in enumerate(self.systems)}
+        system_id = self._system_ids.setdefault(id(system), len(self.systems))
+        if system_id == len(self.systems):
+            self.systems.append(system)
+        return system_id
+
+    def add_measurements(self, measurements: Iterable[BaseMeasurement]) -> np.ndarray:
+        """
+        Register the systems of ``measurements``, appended after the
+        ones already registered.
+
+        Returns
+        -------
+        np.ndarray
+            System ID of each new measurement
+        """
+        ids = np.fromiter(
+            (self.add_system(measurement.system) for measurement in measurements), dtype="int64"
+        )
+        self.measurement_systems = np.concatenate([self.measurement_systems, ids])
+        self._cache.clear()
+        return ids
+
+    @property
+    def system_ids(self) -> np.ndarray:
+        """
+        Sorted IDs of the systems referenced by at least one measurement
+        """
+        if "system_ids" not in self._cache:
+            self._cache["system_ids"] = np.unique(self.measurement_systems)
+        return self._cache["system_ids"]
+
+    @property
+    def is_lazy(self) -> bool:
+        """
+        Whether some systems of a lazy table (see ``LazySequence``) were not created yet
+        """
+        return getattr(self.systems, "n_materialized", len(self.systems)) < len(self.systems)
+
+    def used_systems(self) -> Sequence:
+        """
+        Systems referenced by at least one measurement, sorted by ID.
+        For lazy tables, an ``IndexedSequence`` that creates them on access.
+        """
+        if self.is_lazy:
+            return IndexedSequence(self.systems, self.system_ids)
+        return [self.systems[i] for i in self.system_ids]
+
+    def systems_for(self, measurement_indices=slice(None)) -> list:
+        """
+        System of each of the selected measurements
+        """
+        return [self.systems[i] for i in self.measurement_systems[measurement_indices]]
+
+    def component_index(self):
+        """
+        Component IDs of every system in ``system_ids``, in CSR layout: the components
+        of the ``n``-th system are ``codes[offsets[n]:offsets[n + 1]]``, and
+        ``self.components[code]`` returns the component object.
+
+        Only systems that were not indexed before are visited.
+
+        Returns
+        -------
+        offsets, codes : np.ndarray
+        """
+        system_ids = self.system_ids
+        indexed = len(self._component_offsets) - 1
+        if not np.array_equal(system_ids[:indexed], self._indexed_ids[:indexed]):
+            # a system with a lower ID was added; index everything again
+            self._component_offsets, self._component_codes = [0], []
+            indexed = 0
+        self._indexed_ids = system_ids
+        for system_id in system_ids[indexed:]:
+            for component in self.systems[system_id].components:
+                code = self._component_ids.setdefault(id(component), len(self.components))
+                if code == len(self.components):
+                    self.components.append(component)
+                self._component_codes.append(code)
+            self._component_offsets.append(len(self._component_codes))
+        return (
+            np.asarray(self._component_offsets, dtype="int64"),
+            np.asarray(self._component_codes, dtype="int64"),
+        )
+
+    def summary(self) -> dict:
+        """
+        Number of measurements, systems and distinct component names per
+        component type. Cached until new measurements are registered.
+        """
+        if "summary" not in self._cache:
+            _, codes = self.component_index()
+            names = defaultdict(set)
+            for code in np.unique(codes):
+                component = self.components[code]
+                names[type(component).__name__].add(component.name)
+            self._cache["summary"] = {
+                "measurements": len(self),
+                "systems": len(self.system_ids),
+                "components": {key: len(value) for key, value in names.items()},
+            }
+        return self._cache["summary"]
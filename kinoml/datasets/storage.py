@@ -0,0 +1,309 @@
+"""
+On-disk format for ``DatasetProvider`` objects, based on Parquet files.
+
+A saved provider is a directory with:
+
+- ``manifest.json``: format version, provider class, measurement and system types,
+  and the experimental conditions.
+- ``measurements.parquet``: one row per measurement (value, error, group, codes
+  pointing to the tables below and one ``metadata.<key>`` column per metadata key).
+- ``components.parquet``: one row per unique molecular component (class, payload,
+  name and metadata). The payload is the sequence or SMILES string the component
+  is built from.
+- ``systems.parquet``: the system -> component index, as ``(system, component)``
+  pairs in the original component order.
+- ``<attribute>.parquet``: DataFrame attributes listed in the provider
+  ``_SAVED_ATTRIBUTES``, like ``ChEMBLDatasetProvider.rejected``.
+
+Loaded providers use a ``MeasurementTable`` backend.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from .tables import MeasurementTable
+from ..core.ligands import SmilesLigand
+from ..core.sequences import Biosequence
+from ..utils import import_object
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+def _import_path(obj) -> str:
+    return f"{obj.__module__}.{obj.__qualname__}"
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, default=_json_default)
+
+
+def _loads(text: str):
+    obj = json.loads(text)
+    # groups must stay hashable
+    return tuple(obj) if isinstance(obj, list) else obj
+
+
+def _component_payload(component) -> str:
+    """
+    Text representation a component can be rebuilt from, with ``cls(payload, name, metadata)``.
+    """
+    if isinstance(component, Biosequence):
+        return str(component)
+    if isinstance(component, SmilesLigand):
+        return component._molecule
+    raise TypeError(
+        f"Components of type {type(component).__name__} cannot be saved yet. "
+        "Only sequences and SMILES-based ligands are supported."
+    )
+
+
+def _build_component(cls, payload: str, name: str, metadata: dict):
+    if issubclass(cls, Biosequence):
+        # sequences were validated before saving
+        return cls._from_validated(payload, name=name, metadata=metadata)
+    return cls(payload, name=name, metadata=metadata)
+
+
+def save_provider(provider, path: Union[str, Path], overwrite: bool = False) -> Path:
+    """
+    Write ``provider`` to a directory at ``path``.
+
+    The directory is written under a temporary name and renamed once complete,
+    so readers never see partial results.
+
+    Parameters
+    ----------
+    provider : DatasetProvider
+    path : str or Path
+        Destination directory
+    overwrite : bool, optional=False
+        Whether to replace an existing directory at ``path``
+
+    Returns
+    -------
+    Path
+        The destination directory
+    """
+    path = Path(path)
+    if path.exists() and not overwrite:
+        raise FileExistsError(f"{path} already exists. Use `overwrite=True` to replace it.")
+
+    if hasattr(provider, "providers"):  # MultiDatasetProvider
+        tables = [p.to_columnar().measurements for p in provider.providers]
+        table = MeasurementTable.concatenate(tables)
+    else:
+        table = provider.to_columnar().measurements
+
+    # Components, deduplicated by identity and shared across systems
+    used = table.used_system_index
+    system_codes = np.full(len(table.systems), -1, dtype="int64")
+    system_codes[used] = np.arange(len(used))
+    component_ids, components, pairs, system_classes = {}, [], [], []
+    for i in used:
+        system = table.systems[i]
+        system_class = _import_path(type(system))
+        if system_class not in system_classes:
+            system_classes.append(system_class)
+        for component in system.components:
+            code = component_ids.setdefault(id(component), len(components))
+            if code == len(components):
+                components.append(component)
+            pairs.append((system_codes[i], system_classes.index(system_class), code))
+
+    measurements = pd.DataFrame(
+        {
+            "value": table.values,
+            "error": table.errors,
+            "group": [_dumps(group) for group in table.groups],
+            "type": table.type_codes,
+            "system": system_codes[table.system_index],
+            "conditions": table.conditions_index,
+        }
+    )
+    for key, column in table.metadata.items():
+        measurements[f"metadata.{key}"] = column
+    component_classes = sorted({_import_path(type(c)) for c in components})
+    components_df = pd.DataFrame(
+        {
+            "class": pd.Categorical(
+                [_import_path(type(c)) for c in components], categories=component_classes
+            ),
+            "payload": [_component_payload(c) for c in components],
+            "name": [str(c.name) for c in components],
+            "metadata": [_dumps(c.metadata) for c in components],
+        }
+    )
+    systems_df = pd.DataFrame(pairs, columns=["system", "class", "component"])
+    manifest = {
+        "format": "kinoml-provider",
+        "version": FORMAT_VERSION,
+        "provider": _import_path(type(provider)),
+        "measurement_types": [_import_path(t) for t in table.measurement_types],
+        "system_classes": system_classes,
+        "conditions": [
+            None
+            if c is None
+            else {"class": _import_path(type(c)), "properties": c._properties(classname=False)}
+            for c in table.conditions
+        ],
+        "metadata_keys": list(table.metadata),
+        "attributes": [],
+        "n_measurements": len(table),
+    }
+
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    try:
+        measurements.to_parquet(tmp / "measurements.parquet", index=False)
+        components_df.to_parquet(tmp / "components.parquet", index=False)
+        systems_df.to_parquet(tmp / "systems.parquet", index=False)
+        for attribute in getattr(provider, "_SAVED_ATTRIBUTES", ()):
+            value = getattr(provider, attribute, None)
+            if isinstance(value, pd.DataFrame):
+                # mixed-type object columns cannot be stored in Parquet
+                objects = {c: str for c in value.columns if value[c].dtype == object}
+                value.astype(objects).to_parquet(tmp / f"{attribute}.parquet", index=False)
+                manifest["attributes"].append(attribute)
+        with open(tmp / MANIFEST, "w") as f:
+            json.dump(manifest, f, default=_json_default, indent=2)
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def load_provider(path: Union[str, Path], provider_class=None, **kwargs):
+    """
+    Read a provider written by ``save_provider``.
+
+    Parameters
+    ----------
+    path : str or Path
+        Directory written by ``save_provider``
+    provider_class : type, optional
+        Expected class of the provider. The class recorded in the manifest
+        must be this one or a subclass of it.
+    kwargs : optional
+        Forwarded to the provider ``__init__``
+
+    Returns
+    -------
+    DatasetProvider
+        Backed by a ``MeasurementTable``
+    """
+    path = Path(path)
+    with open(path / MANIFEST) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != "kinoml-provider" or manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(
+            f"{path} was written with an unsupported format "
+            f"({manifest.get('format')} v{manifest.get('version')}); "
+            f"expected kinoml-provider v{FORMAT_VERSION}."
+        )
+    cls = import_object(manifest["provider"])
+    if provider_class is not None and not issubclass(cls, provider_class):
+        raise TypeError(f"{path} contains a {cls.__name__}, not a {provider_class.__name__}")
+
+    components_df = pd.read_parquet(path / "components.parquet")
+    component_classes = {name: import_object(name) for name in components_df["class"].unique()}
+    components = [
+        _build_component(component_classes[klass], payload, name, json.loads(metadata))
+        for klass, payload, name, metadata in zip(
+            components_df["class"].tolist(),
+            components_df["payload"].tolist(),
+            components_df["name"].tolist(),
+            components_df["metadata"].tolist(),
+        )
+    ]
+
+    systems_df = pd.read_parquet(path / "systems.parquet")
+    system_classes = [import_object(name) for name in manifest["system_classes"]]
+    boundaries = np.flatnonzero(np.diff(systems_df["system"].to_numpy())) + 1
+    component_codes = np.split(systems_df["component"].to_numpy(), boundaries)
+    class_codes = systems_df["class"].to_numpy()[np.r_[0, boundaries]] if len(systems_df) else []
+    # components were checked when the provider was first built
+    systems = [
+        system_classes[klass]([components[c] for c in codes], strict=False)
+        for klass, codes in zip(class_codes, component_codes)
+    ]
+
+    conditions = []
+    for entry in manifest["conditions"]:
+        if entry is None:
+            conditions.append(None)
+        else:
+            conditions.append(import_object(entry["class"])(**entry["properties"]))
+
+    measurements = pd.read_parquet(path / "measurements.parquet")
+    groups = np.empty(len(measurements), dtype=object)
+    groups[:] = [_loads(group) for group in measurements["group"].tolist()]
+    table = MeasurementTable(
+        values=measurements["value"].to_numpy(),
+        systems=systems,
+        system_index=measurements["system"].to_numpy(),
+        measurement_types=[import_object(name) for name in manifest["measurement_types"]],
+        type_codes=measurements["type"].to_numpy(),
+        conditions=conditions,
+        conditions_index=measurements["conditions"].to_numpy(),
+        errors=measurements["error"].to_numpy(),
+        groups=groups,
+        metadata={
+            key: measurements[f"metadata.{key}"].to_numpy() for key in manifest["metadata_keys"]
+        },
+    )
+    provider = cls(table, **kwargs)
+    for attribute in manifest["attributes"]:
+        setattr(provider, attribute, pd.read_parquet(path / f"{attribute}.parquet"))
+    return provider
+
+
+def file_hash(path: Union[str, Path], algorithm: str = "sha256", blocksize: int = 2 ** 20) -> str:
+    """
+    Hex digest of the contents of the file at ``path``
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(source_path: Union[str, Path], parser_version: int = None, **parameters) -> str:
+    """
+    Key identifying a provider built from ``source_path`` with ``parameters``.
+    It changes whenever the file contents, the parameters, the version of the
+    code parsing the file (``parser_version``) or the on-disk format do.
+    Files in a download cache are not read again: their recorded digest is used.
+    """
+    from .downloads import cached_sha256
+
+    payload = _dumps(
+        {
+            "source": cached_sha256(source_path) or file_hash(source_path),
+            "version": FORMAT_VERSION,
+            "parser_version": parser_version,
+            "parameters": parameters,
+        }
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
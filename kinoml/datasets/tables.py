@@ -0,0 +1,425 @@
+"""
+Columnar (struct-of-arrays) storage for measurements, used as an
+optional backend for ``DatasetProvider`` objects.
+"""
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from ..core.conditions import BaseConditions
+from ..core.measurements import BaseMeasurement
+from ..core.systems import System
+
+
+class LazySequence(Sequence):
+
+    """
+    Read-only sequence whose items are created on first access by
+    calling ``factory(index)``, and kept for later accesses.
+
+    Use it as the ``systems`` table of a ``MeasurementTable`` to create
+    ``System`` objects only for the measurements that are actually used.
+    ``factory`` must be picklable (e.g. a ``functools.partial`` over a
+    module-level function) if the table is sent to other processes.
+
+    Parameters
+    ----------
+    length : int
+        Number of items
+    factory : callable
+        Takes a position in ``[0, length)`` and returns the item
+    """
+
+    def __init__(self, length: int, factory):
+        self._length = length
+        self.factory = factory
+        self._items = {}
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        index = int(index)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(f"{self.__class__.__name__} index out of range")
+        try:
+            return self._items[index]
+        except KeyError:
+            item = self._items[index] = self.factory(index)
+            return item
+
+    @property
+    def n_materialized(self) -> int:
+        """
+        Number of items created so far
+        """
+        return len(self._items)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} with {self.n_materialized}/{len(self)} items created>"
+
+
+class ConcatenatedSequence(Sequence):
+
+    """
+    Read-only concatenation of several sequences, without copying them.
+    Items are located with a binary search over the cumulative ``offsets``.
+
+    Parameters
+    ----------
+    sequences : list of sequences
+    """
+
+    def __init__(self, sequences: Iterable[Sequence]):
+        self.sequences = list(sequences)
+        self.offsets = np.cumsum([0] + [len(sequence) for sequence in self.sequences])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def locate(self, index: int):
+        """
+        Return ``(i, local_index)`` so that item ``index`` is ``sequences[i][local_index]``
+        """
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"{self.__class__.__name__} index out of range")
+        i = int(np.searchsorted(self.offsets, index, side="right")) - 1
+        return i, index - int(self.offsets[i])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        i, local_index = self.locate(index)
+        return self.sequences[i][local_index]
+
+    def __iter__(self):
+        for sequence in self.sequences:
+            yield from sequence
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} of {len(self.sequences)} sequences, {len(self)} items>"
+
+
+class IndexedSequence(Sequence):
+
+    """
+    Read-only view of the items of ``sequence`` at ``indices``, without
+    accessing them up front (so the items of a ``LazySequence`` are only
+    created when the view is indexed or iterated).
+
+    Parameters
+    ----------
+    sequence : sequence
+    indices : array-like of int
+    """
+
+    def __init__(self, sequence: Sequence, indices: Iterable[int]):
+        self.sequence = sequence
+        self.indices = np.asarray(indices, dtype="int64")
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.sequence[i] for i in self.indices[index]]
+        return self.sequence[self.indices[index]]
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} of {len(self)} items from {self.sequence!r}>"
+
+
+class MeasurementTable:
+
+    """
+    Stores a collection of single-replicate measurements as NumPy arrays
+    instead of individual ``BaseMeasurement`` objects. Systems, measurement
+    types and conditions are kept in shared tables and referenced by
+    integer codes.
+
+    ``BaseMeasurement`` objects are only created when a single item is
+    accessed, and they are independent copies: modifying them does not
+    modify the table. Use the arrays (e.g. ``.groups``) to edit the
+    table in place.
+
+    Integer item access returns a measurement object, while slices,
+    boolean masks and integer arrays return a new ``MeasurementTable``
+    holding the selected rows (sharing systems and conditions).
+
+    Parameters
+    ----------
+    values : array-like of float
+        One value per measurement.
+    systems : list of System or LazySequence
+        Shared table of systems.
+    system_index : array-like of int
+        Position in ``systems`` of the system of each measurement.
+    measurement_types : list of BaseMeasurement subclasses
+        Shared table of measurement types.
+    type_codes : array-like of int, optional
+        Position in ``measurement_types`` of the type of each measurement.
+        Defaults to all zeros.
+    conditions : list of BaseConditions, optional
+        Shared table of conditions.
+    conditions_index : array-like of int, optional
+        Position in ``conditions`` of the conditions of each measurement.
+        Defaults to all zeros.
+    errors : array-like of float, optional
+        One error per measurement. Defaults to NaN.
+    groups : array-like, optional
+        Group label of each measurement. Defaults to None.
+    metadata : dict of str -> array-like, optional
+        Provenance data, one column per metadata key.
+    """
+
+    def __init__(
+        self,
+        values: Iterable[float],
+        systems: Sequence[System],
+        system_index: Iterable[int],
+        measurement_types: Sequence[type],
+        type_codes: Iterable[int] = None,
+        conditions: Sequence[BaseConditions] = (None,),
+        conditions_index: Iterable[int] = None,
+        errors: Iterable[float] = None,
+        groups: Iterable = None,
+        metadata: dict = None,
+    ):
+        self.values = np.asarray(values, dtype="float64")
+        n = len(self.values)
+        self.systems = systems
+        self.system_index = np.asarray(system_index, dtype="int64")
+        self.measurement_types = list(measurement_types)
+        self.type_codes = self._column(type_codes, n, 0, "int8")
+        self.conditions = list(conditions)
+        self.conditions_index = self._column(conditions_index, n, 0, "int64")
+        self.errors = self._column(errors, n, np.nan, "float64")
+        self.groups = self._column(groups, n, None, object)
+        self.metadata = {key: np.asarray(column) for key, column in (metadata or {}).items()}
+
+        for name in ("system_index", "type_codes", "conditions_index", "errors", "groups"):
+            assert len(getattr(self, name)) == n, f"`{name}` must have the same length as `values`"
+        for key, column in self.metadata.items():
+            assert len(column) == n, f"Metadata `{key}` must have the same length as `values`"
+
+    @staticmethod
+    def _column(array, length, fill_value, dtype) -> np.ndarray:
+        if array is None:
+            return np.full(length, fill_value, dtype=dtype)
+        return np.asarray(array, dtype=dtype)
+
+    @classmethod
+    def from_measurements(cls, measurements: Iterable[BaseMeasurement]) -> "MeasurementTable":
+        """
+        Build a table out of a list of measurement objects.
+
+        Parameters
+        ----------
+        measurements : list of BaseMeasurement
+            Single-replicate measurements.
+
+        Returns
+        -------
+        MeasurementTable
+        """
+        measurements = list(measurements)
+        systems, system_ids = [], {}
+        types, type_ids = [], {}
+        conditions, conditions_ids = [], {}
+        system_index = np.empty(len(measurements), dtype="int64")
+        type_codes = np.empty(len(measurements), dtype="int8")
+        conditions_index = np.empty(len(measurements), dtype="int64")
+        values = np.empty(len(measurements), dtype="float64")
+        errors = np.empty(len(measurements), dtype="float64")
+        groups = np.empty(len(measurements), dtype=object)
+        for i, measurement in enumerate(measurements):
+            if measurement.values.shape != (1,):
+                raise ValueError(
+                    f"Only single-replicate measurements can be stored in a {cls.__name__}, "
+                    f"but `{measurement}` has {measurement.values.shape[0]} values"
+                )
+            system_index[i] = system_ids.setdefault(id(measurement.system), len(systems))
+            if system_index[i] == len(systems):
+                systems.append(measurement.system)
+            type_codes[i] = type_ids.setdefault(type(measurement), len(types))
+            if type_codes[i] == len(types):
+                types.append(type(measurement))
+            # conditions are hashable and compared by value, so equal conditions are shared
+            conditions_index[i] = conditions_ids.setdefault(
+                measurement.conditions, len(conditions)
+            )
+            if conditions_index[i] == len(conditions):
+                conditions.append(measurement.conditions)
+            values[i] = measurement.values[0]
+            errors[i] = measurement.errors[0]
+            groups[i] = measurement.group
+
+        metadata = pd.DataFrame.from_records([ms.metadata for ms in measurements])
+        return cls(
+            values=values,
+            systems=systems,
+            system_index=system_index,
+            measurement_types=types,
+            type_codes=type_codes,
+            conditions=conditions or [None],
+            conditions_index=conditions_index,
+            errors=errors,
+            groups=groups,
+            metadata={key: metadata[key].to_numpy() for key in metadata.columns},
+        )
+
+    @classmethod
+    def concatenate(cls, tables: Iterable["MeasurementTable"]) -> "MeasurementTable":
+        """
+        Stack several tables row-wise. Shared tables are merged, so systems
+        (by identity), measurement types and conditions (by value) appear once.
+
+        Parameters
+        ----------
+        tables : list of MeasurementTable
+
+        Returns
+        -------
+        MeasurementTable
+        """
+        tables = list(tables)
+        systems, system_ids = [], {}
+        types, conditions = [], {}
+        system_index, type_codes, conditions_index = [], [], []
+        for table in tables:
+            mapping = np.empty(len(table.systems), dtype="int64")
+            for i in table.used_system_index:
+                system = table.systems[i]
+                mapping[i] = system_ids.setdefault(id(system), len(systems))
+                if mapping[i] == len(systems):
+                    systems.append(system)
+            system_index.append(mapping[table.system_index])
+
+            mapping = np.empty(len(table.measurement_types), dtype="int64")
+            for i, measurement_type in enumerate(table.measurement_types):
+                if measurement_type not in types:
+                    types.append(measurement_type)
+                mapping[i] = types.index(measurement_type)
+            type_codes.append(mapping[table.type_codes])
+
+            mapping = np.array(
+                [conditions.setdefault(c, len(conditions)) for c in table.conditions],
+                dtype="int64",
+            )
+            conditions_index.append(mapping[table.conditions_index])
+
+        keys = {key for table in tables for key in table.metadata}
+        metadata = {}
+        for key in keys:
+            columns = []
+            for table in tables:
+                column = table.metadata.get(key)
+                if column is None:
+                    column = np.full(len(table), None, dtype=object)
+                columns.append(column)
+            metadata[key] = np.concatenate(columns)
+
+        return cls(
+            values=np.concatenate([table.values for table in tables]),
+            systems=systems,
+            system_index=np.concatenate(system_index),
+            measurement_types=types,
+            type_codes=np.concatenate(type_codes),
+            conditions=list(conditions) or [None],
+            conditions_index=np.concatenate(conditions_index),
+            errors=np.concatenate([table.errors for table in tables]),
+            groups=np.concatenate([table.groups for table in tables]),
+            metadata=metadata,
+        )
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index) -> Union[BaseMeasurement, "MeasurementTable"]:
+        if isinstance(index, (int, np.integer)):
+            return self.measurement(index)
+        return self.subset(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.measurement(i)
+
+    def __repr__(self) -> str:
+        types = ", ".join(t.__name__ for t in self.measurement_types)
+        return f"<{self.__class__.__name__} with {len(self)} measurements ({types})>"
+
+    def measurement(self, index: int) -> BaseMeasurement:
+        """
+        Create the measurement object for row ``index``.
+        """
+        if index < 0:
+            index += len(self)
+        MeasurementType = self.measurement_types[self.type_codes[index]]
+        return MeasurementType(
+            values=self.values[index],
+            errors=self.errors[index],
+            conditions=self.conditions[self.conditions_index[index]],
+            system=self.systems[self.system_index[index]],
+            group=self.groups[index],
+            metadata={key: column[index] for key, column in self.metadata.items()},
+            strict=False,
+        )
+
+    def subset(self, index) -> "MeasurementTable":
+        """
+        New table with the rows selected by ``index`` (a slice, a boolean
+        mask or an array of integer positions). Shared tables are not copied.
+        """
+        return self.__class__(
+            values=self.values[index],
+            systems=self.systems,
+            system_index=self.system_index[index],
+            measurement_types=self.measurement_types,
+            type_codes=self.type_codes[index],
+            conditions=self.conditions,
+            conditions_index=self.conditions_index[index],
+            errors=self.errors[index],
+            groups=self.groups[index],
+            metadata={key: column[index] for key, column in self.metadata.items()},
+        )
+
+    @property
+    def used_system_index(self) -> np.ndarray:
+        """
+        Sorted positions of the systems referenced by at least one measurement
+        """
+        return np.unique(self.system_index)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Columnar export of the table, without creating measurement objects.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per measurement, with the system name, the number of components,
+            the value and the name of the measurement type.
+        """
+        used = self.used_system_index
+        names = np.empty(len(self.systems), dtype=object)
+        n_components = np.zeros(len(self.systems), dtype="int64")
+        for i in used:
+            names[i] = self.systems[i].name
+            n_components[i] = len(self.systems[i].components)
+        type_names = np.array([t.__name__ for t in self.measurement_types], dtype=object)
+        return pd.DataFrame(
+            {
+                "Systems": names[self.system_index],
+                "n_components": n_components[self.system_index],
+                "Measurement": self.values,
+                "MeasurementType": type_names[self.type_codes],
+            }
+        )
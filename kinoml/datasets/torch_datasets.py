@@ -3,10 +3,14 @@ Helper classes to convert between DatasetProvider objects and
 Dataset-like objects native to the PyTorch ecosystem
 """
 from functools import lru_cache
+from pathlib import Path
+import queue
+import threading
 
 import numpy as np
 import torch
 from torch.utils.data import Dataset as _NativeTorchDataset, DataLoader as _DataLoader
+from torch.utils.data import IterableDataset as _NativeIterableDataset, Sampler as _NativeSampler
 
 from ..core.measurements import null_observation_model as _null_observation_model
 
@@ -123,6 +127,203 @@ class TorchDataset(PrefeaturizedTorchDataset):
         return X, y
 
 
+class MultiTypeTorchDataset(PrefeaturizedTorchDataset):
+    """
+    Same as ``PrefeaturizedTorchDataset``, but for measurements of different
+    types stacked in the same arrays, as exported by
+    ``MultiDatasetProvider.to_pytorch(stacked=True)``. Items are
+    ``(X, y, measurement_type, conditions)`` tuples, so batches can mix
+    measurement types and still be passed through the right observation
+    model, in one go, with ``observation_model(prediction, measurement_type, conditions)``.
+
+    Parameters
+    ----------
+    systems : array-like
+        X vectors, as exported from featurized systems in DatasetProvider
+    measurements : array-like
+        y vectors
+    measurement_types : array-like of int
+        Type code of each measurement: the position of its observation
+        model in ``observation_models``
+    observation_models : list of callable, optional
+        One observation model per measurement type
+    conditions : array-like, optional
+        ``(n_samples, n_parameters)`` observation model parameters of each
+        measurement (see ``DatasetProvider.condition_parameters()``)
+    observation_model : callable, optional
+        Observation model for mixed batches, as returned by
+        ``kinoml.core.measurements.mixed_observation_model()``
+    """
+
+    def __init__(
+        self,
+        systems,
+        measurements,
+        measurement_types,
+        observation_models=(),
+        conditions=None,
+        observation_model: callable = _null_observation_model,
+    ):
+        super().__init__(systems, measurements, observation_model=observation_model)
+        assert len(measurement_types) == len(measurements), "One type per measurement expected!"
+        self.measurement_types = np.asarray(measurement_types, dtype="int64")
+        self.observation_models = list(observation_models)
+        if conditions is None:
+            conditions = np.empty((len(measurements), 0), dtype="float32")
+        assert len(conditions) == len(measurements), "One set of conditions per measurement!"
+        self.conditions = np.asarray(conditions, dtype="float32")
+
+    def __getitem__(self, index):
+        X, y = super().__getitem__(index)
+        measurement_type = torch.as_tensor(self.measurement_types[index], device=self.device)
+        conditions = torch.as_tensor(self.conditions[index], device=self.device)
+        return X, y, measurement_type, conditions
+
+
+class BatchIndexSampler(_NativeSampler):
+    """
+    Yields the indices of a whole batch at a time, for datasets that can
+    gather a batch in one indexing operation (see ``StackedTorchDataset``).
+    Without shuffling, batches are ``slice`` objects, so they become views
+    of the underlying arrays instead of copies.
+
+    Parameters
+    ----------
+    n_samples : int
+    batch_size : int
+    shuffle : bool, optional=False
+        Draw a new random permutation every epoch
+    drop_last : bool, optional=False
+        Skip the last batch if it is smaller than ``batch_size``
+    generator : torch.Generator, optional
+        Source of randomness for ``shuffle``
+    """
+
+    def __init__(self, n_samples, batch_size, shuffle=False, drop_last=False, generator=None):
+        self.n_samples = n_samples
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    def __iter__(self):
+        end = len(self) * self.batch_size if self.drop_last else self.n_samples
+        if self.shuffle:
+            permutation = torch.randperm(self.n_samples, generator=self.generator)
+            yield from permutation[:end].split(self.batch_size)
+        else:
+            for start in range(0, end, self.batch_size):
+                yield slice(start, min(start + self.batch_size, end))
+
+    def __len__(self):
+        if self.drop_last:
+            return self.n_samples // self.batch_size
+        return -(-self.n_samples // self.batch_size)
+
+
+class StackedTorchDataset(_NativeTorchDataset):
+    """
+    Prefeaturized ``X`` and ``y`` arrays exposed as tensors that share memory
+    with them (``torch.from_numpy``), so nothing is copied upon creation and
+    memory-mapped arrays stay on disk until accessed.
+
+    Items can be single samples or whole batches: indexing with a slice,
+    a list or a tensor of indices gathers the batch in one operation.
+    Use ``.as_dataloader()`` to iterate over batches this way, instead of
+    collating them sample by sample.
+
+    Parameters
+    ----------
+    systems : array-like
+        X vectors, stacked along the first axis. Arrays that are already
+        C-contiguous and of type ``dtype`` are not copied.
+    measurements : array-like
+        y vectors
+    dtype : str or np.dtype, optional="float32"
+    observation_model : callable, optional
+        Check ``PrefeaturizedTorchDataset``.
+    pin_memory : bool, optional=False
+        Gather batches into page-locked staging buffers and copy them to
+        ``device`` asynchronously. Only used when CUDA is available.
+    device : str or torch.device, optional
+        Where batches are sent. Defaults to CUDA if available.
+    """
+
+    def __init__(
+        self,
+        systems,
+        measurements,
+        dtype="float32",
+        observation_model: callable = _null_observation_model,
+        pin_memory: bool = False,
+        device=None,
+    ):
+        assert len(systems) == len(measurements), "Systems and Measurements must match in size!"
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.systems = torch.from_numpy(np.ascontiguousarray(systems, dtype=dtype))
+        self.measurements = torch.from_numpy(np.ascontiguousarray(measurements, dtype=dtype))
+        self.observation_model = observation_model
+        self.pin_memory = pin_memory and torch.cuda.is_available() and self.device.type == "cuda"
+        self._buffers = []  # two sets of pinned buffers, used alternately
+        self._events = []
+        self._next_buffer = 0
+
+    def __len__(self):
+        return self.systems.shape[0]
+
+    def estimate_input_size(self):
+        return tuple(self.systems.shape[1:])
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer, slice)):
+            X, y = self.systems[index], self.measurements[index]
+        else:
+            index = torch.as_tensor(index, dtype=torch.long)
+            if self.pin_memory:
+                return self._gather_pinned(index)
+            X = self.systems.index_select(0, index)
+            y = self.measurements.index_select(0, index)
+        if self.device.type == "cpu":
+            return X, y
+        return X.to(self.device), y.to(self.device)
+
+    def _gather_pinned(self, index):
+        if len(self._buffers) < 2 or self._buffers[0][0].shape[0] < len(index):
+            self._buffers = [
+                tuple(
+                    torch.empty((len(index), *t.shape[1:]), dtype=t.dtype, pin_memory=True)
+                    for t in (self.systems, self.measurements)
+                )
+                for _ in range(2)
+            ]
+            self._events = [None, None]
+        i, self._next_buffer = self._next_buffer, 1 - self._next_buffer
+        if self._events[i] is not None:  # the previous copy from this buffer must be done
+            self._events[i].synchronize()
+        batch = []
+        for source, buffer in zip((self.systems, self.measurements), self._buffers[i]):
+            staged = buffer[: len(index)]
+            torch.index_select(source, 0, index, out=staged)
+            batch.append(staged.to(self.device, non_blocking=True))
+        self._events[i] = torch.cuda.Event()
+        self._events[i].record()
+        return tuple(batch)
+
+    def as_dataloader(self, batch_size=1, shuffle=False, drop_last=False, **kwargs):
+        """
+        Build a PyTorch DataLoader that requests whole batches from this
+        Dataset (see ``BatchIndexSampler``), with automatic batching disabled
+        """
+        sampler = BatchIndexSampler(
+            len(self),
+            batch_size,
+            shuffle=shuffle,
+            drop_last=drop_last,
+            generator=kwargs.pop("generator", None),
+        )
+        return _DataLoader(dataset=self, batch_size=None, sampler=sampler, **kwargs)
+
+
 class XyNpzTorchDataset(_NativeTorchDataset):
     """
     Load ``X`` and ``y`` arrays from a NPZ file present in disk.
@@ -156,3 +357,200 @@ class XyNpzTorchDataset(_NativeTorchDataset):
 
     def input_size(self):
         return self.data_X.shape[1]
+
+
+class MmapXyTorchDataset(_NativeTorchDataset):
+    """
+    Same as ``XyNpzTorchDataset``, but the arrays are memory-mapped instead of
+    loaded, so they can be larger than the available memory. Reads go through
+    the OS page cache, which is shared by all the DataLoader workers.
+
+    Parameters
+    ----------
+    path : str or Path
+        Directory written by ``kinoml.datasets.arrays.write_xy`` (or
+        ``DatasetProvider.to_npy``), possibly sharded, or an uncompressed NPZ
+        file with the keys described in ``XyNpzTorchDataset``.
+
+    Note
+    ----
+    The memory maps are not pickled: each worker process opens its own
+    (see ``__getstate__``).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._open()
+        if not self.indices:
+            self.indices = {"train": True}
+
+    def _open(self):
+        from .arrays import open_xy
+
+        self._X, self._y, self.indices = open_xy(self.path)
+        self._offsets = np.cumsum([0] + [len(X) for X in self._X])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_X"], state["_y"]
+        return state
+
+    def __setstate__(self, state):
+        indices = state["indices"]
+        self.__dict__.update(state)
+        self._open()
+        self.indices = indices
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def input_size(self):
+        return self._X[0].shape[1]
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            shard = int(np.searchsorted(self._offsets, index, side="right")) - 1
+            local = index - self._offsets[shard]
+            X, y = self._X[shard][local], self._y[shard][local]
+        else:
+            index = np.arange(len(self))[index]
+            shards = np.searchsorted(self._offsets, index, side="right") - 1
+            X = np.empty((len(index), *self._X[0].shape[1:]), dtype=self._X[0].dtype)
+            y = np.empty((len(index), *self._y[0].shape[1:]), dtype=self._y[0].dtype)
+            for shard in np.unique(shards):
+                mask = shards == shard
+                local = index[mask] - self._offsets[shard]
+                X[mask], y[mask] = self._X[shard][local], self._y[shard][local]
+        # copy out of the read-only memory maps
+        return torch.from_numpy(np.array(X)), torch.from_numpy(np.array(y))
+
+
+class ShardedIterableTorchDataset(_NativeIterableDataset):
+    """
+    Streams the shards written by ``DatasetProvider.to_npy(..., shard_size=...)``.
+
+    Each DataLoader worker reads a disjoint subset of the shards, whole and in
+    order, so disk access stays sequential. Shards are loaded by a background
+    thread ahead of time, and samples go through a bounded shuffle buffer.
+
+    Parameters
+    ----------
+    path : str or Path
+        Directory written by ``kinoml.datasets.arrays.write_xy``
+    shuffle_buffer : int, optional=0
+        Samples kept in the shuffle buffer. Each sample is yielded after being
+        swapped out of a random position of the buffer. ``0`` disables shuffling;
+        otherwise, shard order is shuffled too.
+    prefetch : int, optional=2
+        Shards loaded ahead of the one being consumed, per worker
+    split : str, optional
+        Only yield the rows in ``idx_<split>.npy`` (e.g. ``"train"``)
+    seed : int, optional=0
+        Base seed for shuffling. Combined with the epoch (see ``set_epoch``)
+        and the worker ID, so every epoch and worker get different orders.
+    """
+
+    def __init__(self, path, shuffle_buffer=0, prefetch=2, split=None, seed=0):
+        from .arrays import read_manifest
+
+        self.path = Path(path)
+        self.manifest = read_manifest(self.path)
+        self.shuffle_buffer = shuffle_buffer
+        self.prefetch = prefetch
+        self.seed = seed
+        self.epoch = 0
+        self.split = split
+        self.rows = None
+        if split is not None:
+            self.rows = np.sort(np.load(self.path / f"idx_{split}.npy"))
+        self.offsets = np.cumsum([0] + [shard["rows"] for shard in self.manifest["shards"]])
+
+    def __len__(self):
+        return self.manifest["n_samples"] if self.rows is None else len(self.rows)
+
+    def set_epoch(self, epoch: int):
+        """
+        Change the shuffling order for the next iteration
+        """
+        self.epoch = epoch
+
+    def _load_shard(self, shard: int):
+        entry = self.manifest["shards"][shard]
+        X = np.load(self.path / entry["X"])
+        y = np.load(self.path / entry["y"])
+        if self.rows is not None:
+            start, end = self.offsets[shard], self.offsets[shard + 1]
+            first, last = np.searchsorted(self.rows, [start, end])
+            selected = self.rows[first:last] - start
+            X, y = X[selected], y[selected]
+        return X, y
+
+    def __iter__(self):
+        worker_info = torch.utils.data.get_worker_info()
+        worker_id, n_workers = 0, 1
+        if worker_info is not None:
+            worker_id, n_workers = worker_info.id, worker_info.num_workers
+        shards = np.arange(len(self.manifest["shards"]))
+        if self.shuffle_buffer:
+            # same shard permutation in all workers, so they take disjoint subsets of it
+            shards = np.random.default_rng([self.seed, self.epoch]).permutation(shards)
+        shards = shards[worker_id::n_workers]
+        rng = np.random.default_rng([self.seed, self.epoch, worker_id])
+
+        buffer = []
+        for X, y in _prefetch(self._load_shard, shards, self.prefetch):
+            for i in range(len(X)):
+                sample = (torch.from_numpy(X[i]), torch.as_tensor(y[i]))
+                if not self.shuffle_buffer:
+                    yield sample
+                elif len(buffer) < self.shuffle_buffer:
+                    buffer.append(sample)
+                else:
+                    j = rng.integers(len(buffer))
+                    yield buffer[j]
+                    buffer[j] = sample
+        for j in rng.permutation(len(buffer)):
+            yield buffer[j]
+
+
+def _prefetch(load, items, size):
+    """
+    Yield ``load(item)`` for each item, computed up to ``size`` items ahead
+    by a background thread
+    """
+    results = queue.Queue(maxsize=max(size, 1))
+    stop = threading.Event()
+    done = object()
+
+    def put(result) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(result, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(load(item)):
+                    return
+        except Exception as error:  # re-raised in the consumer
+            put(error)
+        put(done)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            result = results.get()
+            if result is done:
+                return
+            if isinstance(result, Exception):
+                raise result
+            yield result
+    finally:
+        stop.set()
@@ -0,0 +1,226 @@
+"""
+Indexed queries over the measurements of a ``DatasetProvider``.
+
+``provider.query(...)`` returns a ``DatasetView``: a provider plus an
+array of measurement positions. Views do not copy measurements, can be
+queried again to narrow them down, and can be turned into a regular
+provider with ``.to_provider()``.
+"""
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+from ..core.components import BaseLigand, BaseProtein
+
+
+def measurement_column(provider, field: str) -> np.ndarray:
+    """
+    One key per measurement of ``provider`` for a query ``field``,
+    in the order of ``provider.measurements``.
+    """
+    if hasattr(provider, "providers"):  # MultiDatasetProvider
+        columns = [measurement_column(p, field) for p in provider.providers]
+        return np.concatenate(columns) if columns else np.empty(0, dtype=object)
+    if field == "value":
+        return provider.measurements_as_array(dtype="float64")
+    if field == "measurement_type":
+        return np.full(len(provider), provider.measurement_type.__name__, dtype=object)
+    if field in ("protein", "ligand"):
+        component_type = BaseProtein if field == "protein" else BaseLigand
+        registry = provider.registry
+        names = np.full(len(registry.systems), None, dtype=object)
+        for system_id in registry.system_ids:
+            for component in registry.systems[system_id].components:
+                if isinstance(component, component_type):
+                    names[system_id] = component.name
+                    break
+        return names[registry.measurement_systems]
+    if provider.is_columnar:
+        metadata = provider.measurements.metadata
+        if field in metadata:
+            return metadata[field]
+        return np.full(len(provider), None, dtype=object)
+    column = np.empty(len(provider), dtype=object)
+    column[:] = [measurement.metadata.get(field) for measurement in provider.measurements]
+    return column
+
+
+class _FieldIndex:
+
+    """
+    Secondary index over one column: measurement positions sorted by key,
+    so equality, membership and range lookups are binary searches.
+    """
+
+    def __init__(self, column: np.ndarray):
+        self.column = column
+        self.numeric = column.dtype.kind in "biuf" or (
+            column.dtype == object
+            and len(column) > 0
+            and pd.api.types.is_numeric_dtype(pd.Series(column).infer_objects())
+        )
+        if self.numeric:
+            keys = np.asarray(column, dtype="float64")
+            self.order = np.argsort(keys, kind="stable")
+            self.sorted_keys = keys[self.order]
+            self.n_valid = int(np.count_nonzero(~np.isnan(keys)))
+        else:
+            codes, uniques = pd.factorize(column)
+            self.codes = {key: code for code, key in enumerate(uniques)}
+            self.order = np.argsort(codes, kind="stable")
+            n_missing = int(np.count_nonzero(codes < 0))
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            self.offsets = n_missing + np.concatenate([[0], np.cumsum(counts)])
+
+    def equal(self, key) -> np.ndarray:
+        if self.numeric:
+            return self.between(key, key)
+        code = self.codes.get(key)
+        if code is None:
+            return np.empty(0, dtype="int64")
+        return self.order[self.offsets[code] : self.offsets[code + 1]]
+
+    def between(self, low=None, high=None) -> np.ndarray:
+        if not self.numeric:
+            raise TypeError("Range queries are only supported on numeric fields")
+        start = 0 if low is None else np.searchsorted(self.sorted_keys, low, side="left")
+        end = (
+            self.n_valid
+            if high is None
+            else min(np.searchsorted(self.sorted_keys, high, side="right"), self.n_valid)
+        )
+        return np.sort(self.order[start:end])
+
+    def isin(self, keys: Iterable) -> np.ndarray:
+        matches = [self.equal(key) for key in keys]
+        return np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype="int64")
+
+
+class MeasurementIndex:
+
+    """
+    Lazily built secondary indexes over the measurements of a provider.
+    Each field is indexed the first time it is queried.
+
+    Use ``DatasetProvider.query()`` instead of instantiating this class.
+
+    Parameters
+    ----------
+    provider : DatasetProvider
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._fields = {}
+
+    def field(self, name: str) -> _FieldIndex:
+        if name not in self._fields:
+            self._fields[name] = _FieldIndex(measurement_column(self.provider, name))
+        return self._fields[name]
+
+    def lookup(self, name: str, condition) -> np.ndarray:
+        """
+        Sorted positions of the measurements whose ``name`` field matches ``condition``:
+
+        - a 2-tuple ``(low, high)``: inclusive range; either end can be None
+        - a list or set: any of the values
+        - a measurement class (``measurement_type`` only) or any other value: equality
+        """
+        if name == "measurement_type":
+            if isinstance(condition, (list, set, frozenset)):
+                condition = [getattr(c, "__name__", c) for c in condition]
+            else:
+                condition = getattr(condition, "__name__", condition)
+        index = self.field(name)
+        if isinstance(condition, tuple):
+            if len(condition) != 2:
+                raise ValueError(f"Ranges must be (low, high) tuples, but got {condition}")
+            return index.between(*condition)
+        if isinstance(condition, (list, set, frozenset)):
+            return index.isin(condition)
+        return index.equal(condition)
+
+    def query(self, **filters) -> np.ndarray:
+        """
+        Sorted positions of the measurements matching all ``filters``
+        """
+        result = None
+        for name, condition in filters.items():
+            matches = self.lookup(name, condition)
+            result = (
+                matches if result is None else np.intersect1d(result, matches, assume_unique=True)
+            )
+        if result is None:
+            return np.arange(len(self.provider), dtype="int64")
+        return result.astype("int64", copy=False)
+
+
+class DatasetView:
+
+    """
+    Subset of the measurements of a provider, defined by their positions.
+
+    Parameters
+    ----------
+    provider : DatasetProvider
+        The provider holding the measurements
+    indices : array-like of int, optional
+        Positions of the selected measurements in ``provider.measurements``.
+        Defaults to all of them.
+    """
+
+    def __init__(self, provider, indices: Iterable[int] = None):
+        self.provider = provider
+        if indices is None:
+            indices = np.arange(len(provider), dtype="int64")
+        self.indices = np.asarray(indices, dtype="int64")
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} with {len(self)} measurements of {self.provider!r}>"
+
+    def __getitem__(self, subscript) -> Union["DatasetView", object]:
+        if isinstance(subscript, (int, np.integer)):
+            return self._measurement(self.indices[subscript])
+        return self.__class__(self.provider, self.indices[subscript])
+
+    def __iter__(self):
+        for index in self.indices:
+            yield self._measurement(index)
+
+    def _measurement(self, index: int):
+        return self.provider.measurements[index]
+
+    def query(self, **filters) -> "DatasetView":
+        """
+        Narrow down this view to the measurements matching all ``filters``.
+        Check ``DatasetProvider.query()`` for the syntax.
+        """
+        matches = self.provider.measurement_index.query(**filters)
+        return self.__class__(self.provider, self.indices[np.isin(self.indices, matches)])
+
+    @property
+    def measurements(self) -> list:
+        return list(self)
+
+    @property
+    def systems(self) -> list:
+        """
+        Unique systems in this view, sorted by their registry ID
+        """
+        registry = self.provider.registry
+        return [registry.systems[i] for i in np.unique(registry.measurement_systems[self.indices])]
+
+    def measurements_as_array(self, dtype="float32") -> np.ndarray:
+        values = self.provider.measurement_index.field("value").column
+        return values[self.indices].astype(dtype)
+
+    def to_provider(self):
+        """
+        New provider of the same class with the measurements in this view.
+        Check ``DatasetProvider.subset()`` for details.
+        """
+        return self.provider.subset(self.indices)
@@ -53,6 +53,45 @@ class BaseFeaturizer:
         system.featurizations[self.name] = features
         return system
 
+    def featurize_many(self, systems: Iterable[System], inplace: bool = True) -> object:
+        """
+        Featurize a collection of systems at once and stack the results.
+
+        Subclasses can speed this up (e.g. by computing each unique component
+        only once) reimplementing ``._featurize_many()``, and change how the
+        rows are combined reimplementing ``._stack()``.
+
+        Parameters
+        ----------
+        systems : list of System
+        inplace : bool, optional=True
+            Whether to also store each row under ``system.featurizations[self.name]``.
+
+        Returns
+        -------
+        array-like
+            One row per system, as combined by ``._stack()``
+        """
+        systems = list(systems)
+        self.supports(*systems)
+        rows = self._featurize_many(systems)
+        if inplace:
+            for system, row in zip(systems, rows):
+                system.featurizations[self.name] = row
+        return self._stack(rows)
+
+    def _featurize_many(self, systems: list) -> list:
+        """
+        Featurized object of each system, for ``.featurize_many()``
+        """
+        return [self._featurize(system) for system in systems]
+
+    def _stack(self, rows: list) -> object:
+        """
+        Combine the rows returned by ``._featurize_many()``
+        """
+        return np.stack(rows)
+
     def __call__(self, *args, **kwargs):
         """
         You can also call the instance directly. This forwards to
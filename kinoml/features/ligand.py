@@ -4,10 +4,17 @@ Featurizers that mostly concern ligand-based models
 
 from __future__ import annotations
 from functools import lru_cache
-from typing import Union
+from pathlib import Path
+from typing import Iterable, Union
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
 
 import numpy as np
 import rdkit
+from tqdm.auto import tqdm
 
 from .core import BaseFeaturizer, BaseOneHotEncodingFeaturizer
 from ..core.systems import System
@@ -19,6 +26,8 @@ from ..core.ligands import (
     OpenForceFieldLigand,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class SingleLigandFeaturizer(BaseFeaturizer):
     """
@@ -413,3 +422,402 @@ class GraphLigandFeaturizer(SingleLigandFeaturizer):
             col += [end, start]
 
         return np.array([row, col])
+
+
+class RDKitConformerFeaturizer(SingleLigandFeaturizer):
+
+    """
+    Generate a 3D conformer ensemble for a `Ligand`-like component with
+    RDKit's ETKDG method, optionally minimizing each conformer with a
+    force field afterwards.
+
+    Embedding and minimization use RDKit's internal multithreading, so a
+    single call can saturate a node without spawning extra processes.
+    Ensembles are cached on disk as SDF files keyed by the canonical
+    isomeric SMILES and the generation parameters; other 3D featurizers
+    and docking helpers can read them with ``.cache_path()`` (e.g. via
+    ``kinoml.modeling.OEModeling.read_conformations``) instead of
+    generating them again.
+
+    Parameters
+    ----------
+    n_conformers : int, optional=10
+        Number of conformers to embed per ligand.
+    random_seed : int, optional=42
+        Seed for the ETKDG embedding. Use ``-1`` for non-deterministic runs.
+    num_threads : int, optional=0
+        Threads used by RDKit for embedding and minimization. ``0`` means
+        all available cores.
+    minimize : str, optional=None
+        Force field used to minimize the embedded conformers, either
+        ``MMFF`` or ``UFF``. If ``None``, conformers are not minimized.
+    max_iterations : int, optional=200
+        Maximum number of minimization steps per conformer.
+    prune_rms_threshold : float, optional=0.5
+        Conformers closer than this heavy-atom RMSD (in Å) are discarded.
+        Use ``-1`` to keep all of them.
+    use_cache : bool, optional=True
+        Whether to read and write conformer ensembles from/to disk.
+    cache_directory : str or Path, optional
+        Where to store the SDF files. Defaults to ``LocalFileStorage.DIRECTORY``.
+    """
+
+    _COMPATIBLE_LIGAND_TYPES = (OpenForceFieldLigand, OpenForceFieldLikeLigand)
+    _SUPPORTED_FORCE_FIELDS = ("MMFF", "UFF")
+
+    def __init__(
+        self,
+        n_conformers: int = 10,
+        random_seed: int = 42,
+        num_threads: int = 0,
+        minimize: str = None,
+        max_iterations: int = 200,
+        prune_rms_threshold: float = 0.5,
+        use_cache: bool = True,
+        cache_directory: Union[str, Path] = None,
+        *args,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        if minimize is not None and minimize not in self._SUPPORTED_FORCE_FIELDS:
+            raise ValueError(
+                f"`minimize` must be one of {self._SUPPORTED_FORCE_FIELDS} or None, "
+                f"but you provided `{minimize}`"
+            )
+        self.n_conformers = n_conformers
+        self.random_seed = random_seed
+        self.num_threads = num_threads
+        self.minimize = minimize
+        self.max_iterations = max_iterations
+        self.prune_rms_threshold = prune_rms_threshold
+        self.use_cache = use_cache
+        if cache_directory is None:
+            from ..utils import LocalFileStorage
+
+            cache_directory = LocalFileStorage.DIRECTORY
+        self.cache_directory = Path(cache_directory)
+
+    def _featurize(self, system: System) -> RDKitLigand:
+        """
+        Returns
+        -------
+        RDKitLigand
+            Ligand wrapping an RDKit molecule (with explicit hydrogens) that holds
+            the conformer ensemble. If the conformers were minimized, their energies
+            are stored under ``metadata["conformer_energies"]``.
+        """
+        ligand = self._find_ligand(system)
+        molecule = self.generate_conformers(ligand.to_rdkit())
+        metadata = {"smiles": ligand.metadata.get("smiles", self._canonical_smiles(molecule))}
+        if molecule.HasProp("_ConformerEnergies"):
+            metadata["conformer_energies"] = json.loads(molecule.GetProp("_ConformerEnergies"))
+        return RDKitLigand(molecule, name=ligand.name, metadata=metadata)
+
+    def generate_conformers(self, molecule: rdkit.Chem.Mol) -> rdkit.Chem.Mol:
+        """
+        Embed (and optionally minimize) conformers for ``molecule``, or read
+        them from the on-disk cache if they were generated before with the same
+        parameters.
+
+        Parameters
+        ----------
+        molecule : rdkit.Chem.Mol
+            Input molecule. It will not be modified.
+
+        Returns
+        -------
+        rdkit.Chem.Mol
+            A copy of ``molecule`` with explicit hydrogens and one conformer
+            per embedded geometry.
+        """
+        path = self.cache_path(molecule)
+        if self.use_cache and path.is_file():
+            logger.debug("Reading conformers from %s", path)
+            return self._read_conformers(path)
+
+        conformers = self._embed(molecule)
+        if self.use_cache:
+            self._write_conformers(conformers, path)
+        return conformers
+
+    def cache_path(self, molecule: rdkit.Chem.Mol) -> Path:
+        """
+        Path to the SDF file holding the cached conformers for ``molecule``.
+        Existence is not checked or guaranteed.
+        """
+        key = json.dumps(
+            {"smiles": self._canonical_smiles(molecule), **self._parameters()}, sort_keys=True
+        )
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.cache_directory / f"kinoml_{self.name}_{digest}.sdf"
+
+    def _parameters(self) -> dict:
+        """
+        Parameters that affect the generated geometries, used to build the cache key.
+        Threads are left out on purpose: they do not change the result.
+        """
+        return {
+            "n_conformers": self.n_conformers,
+            "random_seed": self.random_seed,
+            "minimize": self.minimize,
+            "max_iterations": self.max_iterations,
+            "prune_rms_threshold": self.prune_rms_threshold,
+        }
+
+    @staticmethod
+    def _canonical_smiles(molecule: rdkit.Chem.Mol) -> str:
+        from rdkit.Chem import MolToSmiles, RemoveHs
+
+        return MolToSmiles(RemoveHs(molecule), isomericSmiles=True, canonical=True)
+
+    def _embed(self, molecule: rdkit.Chem.Mol) -> rdkit.Chem.Mol:
+        from rdkit.Chem import AddHs, AllChem
+
+        molecule = AddHs(molecule)
+        parameters = AllChem.ETKDGv3()
+        parameters.randomSeed = self.random_seed
+        parameters.numThreads = self.num_threads
+        parameters.pruneRmsThresh = self.prune_rms_threshold
+        conformer_ids = AllChem.EmbedMultipleConfs(
+            molecule, numConfs=self.n_conformers, params=parameters
+        )
+        if not len(conformer_ids):
+            smiles = self._canonical_smiles(molecule)
+            raise ValueError(f"Could not embed any conformer for `{smiles}`")
+
+        if self.minimize == "MMFF":
+            results = AllChem.MMFFOptimizeMoleculeConfs(
+                molecule, numThreads=self.num_threads, maxIters=self.max_iterations
+            )
+        elif self.minimize == "UFF":
+            results = AllChem.UFFOptimizeMoleculeConfs(
+                molecule, numThreads=self.num_threads, maxIters=self.max_iterations
+            )
+        else:
+            results = None
+
+        if results is not None:
+            # results is a list of (not_converged, energy) tuples, one per conformer
+            energies = [energy for _, energy in results]
+            molecule.SetProp("_ConformerEnergies", json.dumps(energies))
+        return molecule
+
+    @staticmethod
+    def _write_conformers(molecule: rdkit.Chem.Mol, path: Path):
+        """
+        Write all conformers of ``molecule`` to an SDF file. We write to a temporary
+        file first and rename it, so concurrent readers never see partial files.
+        """
+        from rdkit.Chem import SDWriter
+
+        energies = None
+        if molecule.HasProp("_ConformerEnergies"):
+            energies = json.loads(molecule.GetProp("_ConformerEnergies"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        writer = SDWriter(str(tmp_path))
+        for i, conformer in enumerate(molecule.GetConformers()):
+            if energies is not None:
+                molecule.SetDoubleProp("energy", energies[i])
+            writer.write(molecule, confId=conformer.GetId())
+        writer.close()
+        if molecule.HasProp("energy"):
+            molecule.ClearProp("energy")
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_conformers(path: Path) -> rdkit.Chem.Mol:
+        """
+        Merge all the records of a conformer SDF file into a single multi-conformer molecule.
+        """
+        from rdkit.Chem import Mol, SDMolSupplier
+
+        molecule, energies = None, []
+        for record in SDMolSupplier(str(path), removeHs=False):
+            if molecule is None:
+                molecule = Mol(record)
+                molecule.RemoveAllConformers()
+            molecule.AddConformer(record.GetConformer(), assignId=True)
+            if record.HasProp("energy"):
+                energies.append(record.GetDoubleProp("energy"))
+        if molecule is None:
+            raise ValueError(f"No conformers could be read from {path}")
+        if molecule.HasProp("energy"):
+            molecule.ClearProp("energy")
+        if energies:
+            molecule.SetProp("_ConformerEnergies", json.dumps(energies))
+        return molecule
+
+
+class RDKitDescriptorFeaturizer(SingleLigandFeaturizer):
+
+    """
+    Compute a selection of RDKit 2D descriptors for a `Ligand`-like component.
+
+    Descriptors are computed once per unique ligand SMILES and memoized, so
+    systems sharing a ligand do not trigger new calculations. Use
+    ``.featurize_many()`` to process a whole collection of systems in parallel
+    chunks and obtain a single ``float32`` matrix, and ``.masks_for()`` to get
+    the matching mask.
+
+    Values that are not finite (or do not fit in ``float32``) are not raised
+    as errors: they are replaced by ``fill_value`` and flagged in a boolean
+    mask of the same shape (``True`` means the value is not valid).
+
+    Parameters
+    ----------
+    descriptors : list of str, optional
+        Names of the descriptors to compute, as listed in
+        ``rdkit.Chem.Descriptors._descList``. The output columns follow
+        this order. If not given, all RDKit descriptors are computed, in
+        the order RDKit lists them. ``PHYSCHEM_DESCRIPTORS`` provides a
+        small selection (MW, logP, TPSA, HBD, HBA).
+    fill_value : float, optional=0.0
+        Value used for the masked (non-finite) entries.
+    """
+
+    _COMPATIBLE_LIGAND_TYPES = (OpenForceFieldLigand, OpenForceFieldLikeLigand)
+    PHYSCHEM_DESCRIPTORS = ("MolWt", "MolLogP", "TPSA", "NumHDonors", "NumHAcceptors")
+
+    def __init__(
+        self, descriptors: Iterable[str] = None, fill_value: float = 0.0, *args, **kwargs
+    ):
+        from rdkit.Chem import Descriptors
+
+        super().__init__(*args, **kwargs)
+        available = [name for name, _ in Descriptors._descList]
+        if descriptors is None:
+            descriptors = available
+        unknown = set(descriptors).difference(available)
+        if unknown:
+            raise ValueError(f"These descriptors are not available in RDKit: {sorted(unknown)}")
+        self.descriptors = tuple(descriptors)
+        self.fill_value = fill_value
+        self._cache = {}
+
+    def _featurize(self, system: System) -> np.ndarray:
+        """
+        Returns
+        -------
+        array
+            ``float32`` vector with shape ``(len(self.descriptors),)``.
+            Check ``.mask_for(system)`` to know which values are not valid.
+        """
+        key = self._ligand_key(self._find_ligand(system))
+        if key not in self._cache:
+            self._update_cache([key])
+        return self._cache[key][0]
+
+    def mask_for(self, system: System) -> np.ndarray:
+        """
+        Boolean vector flagging the non-finite descriptors of the ligand in ``system``.
+        ``True`` means the corresponding value was replaced by ``fill_value``.
+        """
+        key = self._ligand_key(self._find_ligand(system))
+        if key not in self._cache:
+            self._update_cache([key])
+        return self._cache[key][1]
+
+    def masks_for(self, systems: Iterable[System]) -> np.ndarray:
+        """
+        Stacked ``.mask_for()`` of all ``systems``, matching the rows
+        returned by ``.featurize_many()``.
+        """
+        systems = list(systems)
+        keys = [self._ligand_key(self._find_ligand(system)) for system in systems]
+        self._update_cache(keys)
+        return np.stack([self._cache[key][1] for key in keys])
+
+    def featurize_many(
+        self,
+        systems: Iterable[System],
+        inplace: bool = True,
+        *,
+        processes: int = 1,
+        chunksize: int = 256,
+    ) -> np.ndarray:
+        """
+        Same as ``BaseFeaturizer.featurize_many()``, but the unique ligands are
+        computed first, in chunks of ``chunksize`` SMILES processed by a pool of
+        ``processes`` workers (no pool is created with ``1``).
+
+        Check ``.masks_for(systems)`` to know which values are not valid.
+        """
+        systems = list(systems)
+        self.supports(*systems)
+        keys = [self._ligand_key(self._find_ligand(system)) for system in systems]
+        self._update_cache(keys, processes=processes, chunksize=chunksize)
+        return super().featurize_many(systems, inplace=inplace)
+
+    @staticmethod
+    def _ligand_key(ligand) -> str:
+        """
+        The SMILES stored in the metadata is preferred over ``.to_smiles()``,
+        which would parse the molecule for every system just to build the key.
+        """
+        smiles = ligand.metadata.get("smiles")
+        if smiles is None:
+            smiles = ligand.to_smiles()
+        return smiles
+
+    def _update_cache(self, keys: Iterable[str], processes: int = 1, chunksize: int = 256):
+        """
+        Compute and memoize the descriptors for those ``keys`` not seen before.
+        """
+        missing = list(dict.fromkeys(key for key in keys if key not in self._cache))
+        if not missing:
+            return
+        chunks = [missing[i : i + chunksize] for i in range(0, len(missing), chunksize)]
+        tasks = ((chunk, self.descriptors) for chunk in chunks)
+        if processes == 1 or len(chunks) == 1:
+            results = [self._compute_descriptors(task) for task in tasks]
+        else:
+            with multiprocessing.Pool(processes=processes) as pool:
+                results = list(
+                    tqdm(pool.imap(self._compute_descriptors, tasks), total=len(chunks))
+                )
+        raw = np.concatenate(results)
+
+        with np.errstate(over="ignore", invalid="ignore"):
+            values = raw.astype("float32")
+        mask = ~np.isfinite(values)
+        values[mask] = self.fill_value
+        for key, row, mask_row in zip(missing, values, mask):
+            self._cache[key] = row, mask_row
+
+    @staticmethod
+    def _compute_descriptors(smiles_and_names) -> np.ndarray:
+        """
+        Worker function: compute the requested descriptors for a chunk of SMILES.
+        Failures (unparsable SMILES, descriptor errors) are reported as NaN.
+
+        Parameters
+        ----------
+        smiles_and_names : 2-tuple
+            List of SMILES strings and tuple of descriptor names
+
+        Returns
+        -------
+        array
+            ``float64`` matrix with shape ``(len(smiles), len(names))``
+        """
+        from rdkit import RDLogger
+        from rdkit.Chem import Descriptors, MolFromSmiles
+
+        smiles_list, names = smiles_and_names
+        functions = dict(Descriptors._descList)
+        result = np.full((len(smiles_list), len(names)), np.nan, dtype="float64")
+        RDLogger.DisableLog("rdApp.*")
+        try:
+            for i, smiles in enumerate(smiles_list):
+                molecule = MolFromSmiles(smiles)
+                if molecule is None:
+                    continue
+                for j, name in enumerate(names):
+                    try:
+                        result[i, j] = functions[name](molecule)
+                    except Exception:  # pylint: disable=broad-except
+                        pass
+        finally:
+            RDLogger.EnableLog("rdApp.*")
+        return result
@@ -2,25 +2,65 @@
 Featurizers that mostly concern protein-based models
 """
 from __future__ import annotations
+from functools import lru_cache
+from typing import Iterable
+
 import numpy as np
-from collections import Counter
 
 from .core import BaseFeaturizer, BaseOneHotEncodingFeaturizer
 from ..core.systems import System
 from ..core.proteins import AminoAcidSequence
 
 
+@lru_cache(maxsize=None)
+def _lookup_table(alphabet: str) -> np.ndarray:
+    """
+    Map every byte value to the position of the corresponding character
+    in ``alphabet``. Characters not in ``alphabet`` map to ``len(alphabet)``.
+    """
+    table = np.full(256, len(alphabet), dtype="uint8")
+    table[np.frombuffer(alphabet.encode("ascii"), dtype="uint8")] = np.arange(
+        len(alphabet), dtype="uint8"
+    )
+    return table
+
+
+def _encode(sequence: str, alphabet: str) -> np.ndarray:
+    """
+    Translate ``sequence`` into an array of ``uint8`` alphabet indices, without
+    Python-level loops. Unknown characters are encoded as ``len(alphabet)``.
+    """
+    return _lookup_table(alphabet)[np.frombuffer(sequence.encode("ascii"), dtype="uint8")]
+
+
 class AminoAcidCompositionFeaturizer(BaseFeaturizer):
 
     """
     Featurizes the protein using the composition of the residues
     in the binding site.
+
+    Counts are obtained with a vectorized kernel (lookup table plus
+    ``np.bincount``) and memoized per unique sequence, so systems
+    sharing the same protein are only computed once. Use
+    ``.featurize_many()`` to compute all the proteins of a dataset
+    in a single batch.
+
+    Parameters
+    ----------
+    normalize : bool, optional=False
+        Return frequencies instead of counts.
+    dipeptides : bool, optional=False
+        Append the dipeptide composition (20x20 = 400 values, in
+        alphabetical order of the pairs) to the residue composition.
     """
 
-    # Initialize a Counter object with 0 counts
-    _counter = Counter(sorted(AminoAcidSequence.ALPHABET))
-    for k in _counter.keys():
-        _counter[k] = 0
+    ALPHABET = "".join(sorted(AminoAcidSequence.ALPHABET))
+
+    def __init__(self, normalize: bool = False, dipeptides: bool = False, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.normalize = normalize
+        self.dipeptides = dipeptides
+        self._cache = {}
 
     def _featurize(self, system: System) -> np.array:
         """
@@ -35,10 +75,66 @@ class AminoAcidCompositionFeaturizer(BaseFeaturizer):
         array
             The count of amino acid in the binding site.
         """
-        count = self._counter.copy()
-        count.update(system.protein.sequence)
-        sorted_count = sorted(count.items(), key=lambda kv: kv[0])
-        return np.array([number for aminoacid, number in sorted_count])
+        sequence = system.protein.sequence
+        if sequence not in self._cache:
+            self._cache[sequence] = self.composition([sequence])[0]
+        return self._cache[sequence]
+
+    def _featurize_many(self, systems: list) -> list:
+        """
+        Compute the composition of all unique proteins in ``systems`` in one batch.
+        """
+        sequences = [system.protein.sequence for system in systems]
+        missing = list(dict.fromkeys(s for s in sequences if s not in self._cache))
+        if missing:
+            for sequence, row in zip(missing, self.composition(missing)):
+                self._cache[sequence] = row
+        return [self._cache[sequence] for sequence in sequences]
+
+    def composition(self, sequences: Iterable[str]) -> np.ndarray:
+        """
+        Vectorized composition kernel. All sequences are concatenated and
+        counted with a single ``np.bincount`` call, offsetting the residue
+        indices of each sequence by its position in the batch.
+
+        Parameters
+        ----------
+        sequences : list of str
+
+        Returns
+        -------
+        array
+            Matrix with shape ``(len(sequences), 20)`` (or ``(len(sequences), 420)``
+            if ``dipeptides`` is enabled). Integer counts, or ``float64``
+            frequencies if ``normalize`` is enabled.
+        """
+        sequences = list(sequences)
+        n_letters = len(self.ALPHABET)
+        # unknown characters get index n_letters, and are dropped after counting
+        width = n_letters + 1
+        encoded = [_encode(sequence, self.ALPHABET).astype("int64") for sequence in sequences]
+        lengths = np.array([len(codes) for codes in encoded])
+        owner = np.repeat(np.arange(len(sequences)), lengths)
+        codes = np.concatenate(encoded) if encoded else np.empty(0, dtype="int64")
+        counts = np.bincount(owner * width + codes, minlength=len(sequences) * width)
+        features = counts.reshape(len(sequences), width)[:, :n_letters]
+        if self.normalize:
+            features = features / np.maximum(lengths, 1)[:, None]
+
+        if self.dipeptides:
+            # pairs of consecutive residues within the same sequence
+            same_owner = owner[1:] == owner[:-1]
+            valid = same_owner & (codes[1:] < n_letters) & (codes[:-1] < n_letters)
+            pairs = codes[:-1][valid] * n_letters + codes[1:][valid]
+            pair_owner = owner[1:][valid]
+            n_pairs = n_letters * n_letters
+            pair_counts = np.bincount(
+                pair_owner * n_pairs + pairs, minlength=len(sequences) * n_pairs
+            ).reshape(len(sequences), n_pairs)
+            if self.normalize:
+                pair_counts = pair_counts / np.maximum(lengths - 1, 1)[:, None]
+            features = np.concatenate([features, pair_counts], axis=1)
+        return features
 
 
 class OneHotEncodedSequenceFeaturizer(BaseOneHotEncodingFeaturizer):
@@ -54,3 +150,287 @@ class OneHotEncodedSequenceFeaturizer(BaseOneHotEncodingFeaturizer):
         for comp in system.components:
             if isinstance(comp, AminoAcidSequence):
                 return comp.sequence
+
+
+class IndexEncodedSequenceFeaturizer(BaseFeaturizer):
+
+    """
+    Compact alternative to ``OneHotEncodedSequenceFeaturizer``. Each unique
+    ``AminoAcidSequence`` is encoded only once and stored in ``.encodings``,
+    either as ``uint8`` alphabet indices (one byte per residue) or as a
+    bit-packed one-hot matrix. Systems only receive the integer ID of their
+    encoding under ``system.featurizations``.
+
+    Dense one-hot tensors are built on demand with ``.materialize()``, normally
+    at batch collation time (see ``.collate()``).
+
+    Parameters
+    ----------
+    packed : bool, optional=False
+        If True, store bit-packed one-hot matrices (``np.packbits``) instead
+        of alphabet indices.
+
+    Note
+    ----
+    Encodings live in the featurizer instance. Use ``.featurize_many()``, or
+    featurize in a single process, so the IDs refer to this instance's store.
+    """
+
+    ALPHABET = AminoAcidSequence.ALPHABET
+
+    def __init__(self, packed: bool = False, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.packed = packed
+        self.encodings = []
+        self.lengths = []
+        self._ids = {}
+
+    def _featurize(self, system: System) -> int:
+        """
+        Returns
+        -------
+        int
+            Index of the encoded sequence in ``.encodings``
+        """
+        return self._register(self._retrieve_sequence(system))
+
+    def _stack(self, rows: list) -> np.ndarray:
+        """
+        ``int64`` vector with one encoding ID per system
+        """
+        return np.array(rows, dtype="int64")
+
+    def _retrieve_sequence(self, system: System) -> str:
+        for comp in system.components:
+            if isinstance(comp, AminoAcidSequence):
+                return comp.sequence
+        raise ValueError(f"No AminoAcidSequence instances found in system {system}")
+
+    def _register(self, sequence: str) -> int:
+        if sequence not in self._ids:
+            indices = _encode(sequence, self.ALPHABET)
+            if (indices == len(self.ALPHABET)).any():
+                raise ValueError(f"Sequence contains characters not in {self.ALPHABET}")
+            if self.packed:
+                one_hot = np.zeros((len(indices), len(self.ALPHABET)), dtype=bool)
+                one_hot[np.arange(len(indices)), indices] = True
+                encoding = np.packbits(one_hot, axis=1)
+            else:
+                encoding = indices
+            self._ids[sequence] = len(self.encodings)
+            self.encodings.append(encoding)
+            self.lengths.append(len(indices))
+        return self._ids[sequence]
+
+    def indices(self, id_: int) -> np.ndarray:
+        """
+        Alphabet indices (``uint8``) of the sequence stored under ``id_``.
+        """
+        encoding = self.encodings[id_]
+        if self.packed:
+            one_hot = np.unpackbits(encoding, axis=1, count=len(self.ALPHABET))
+            return one_hot.argmax(axis=1).astype("uint8")
+        return encoding
+
+    def materialize(
+        self, ids: Iterable[int], length: int = None, dtype: str = "float32"
+    ) -> np.ndarray:
+        """
+        Build the dense one-hot tensor for a batch of encoding IDs.
+
+        Parameters
+        ----------
+        ids : list of int
+            Encoding IDs, as stored in ``system.featurizations``.
+        length : int, optional
+            Pad (or truncate) all sequences to this length. By default,
+            the longest sequence in the batch is used.
+        dtype : str, optional="float32"
+
+        Returns
+        -------
+        array
+            One-hot tensor with shape ``(len(ids), len(ALPHABET), length)``,
+            zero-padded, matching the layout of ``BaseOneHotEncodingFeaturizer``.
+        """
+        ids = [int(id_) for id_ in ids]
+        if length is None:
+            length = max((self.lengths[id_] for id_ in ids), default=0)
+        n_letters = len(self.ALPHABET)
+        # padding positions point to an extra, discarded, letter
+        batch_indices = np.full((len(ids), length), n_letters, dtype="int64")
+        for row, id_ in enumerate(ids):
+            indices = self.indices(id_)[:length]
+            batch_indices[row, : len(indices)] = indices
+        dense = np.eye(n_letters + 1, dtype=dtype)[batch_indices][..., :n_letters]
+        return np.ascontiguousarray(dense.transpose(0, 2, 1))
+
+    def collate(self, batch):
+        """
+        ``collate_fn`` for PyTorch DataLoaders over datasets whose ``X`` items are
+        encoding IDs (e.g. ``provider.to_pytorch()`` after featurizing with this class).
+        The one-hot tensor is only materialized here, once per batch.
+
+        Parameters
+        ----------
+        batch : list of 2-tuples
+            ``(id, y)`` pairs
+
+        Returns
+        -------
+        2-tuple of torch.Tensor
+            One-hot ``X`` batch, and ``y`` batch.
+        """
+        import torch
+        from torch.utils.data.dataloader import default_collate
+
+        ids, ys = zip(*batch)
+        X = torch.from_numpy(self.materialize(ids))
+        return X, default_collate(ys)
+
+
+class KmerSpectrumFeaturizer(BaseFeaturizer):
+
+    """
+    Alignment-free representation of a protein as the counts of its
+    k-mers (contiguous subsequences of length ``k``) and, optionally, of
+    its gapped dimers (pairs of residues separated by ``g`` positions).
+
+    K-mers are obtained with rolling integer encodings over the alphabet
+    indices of the sequence (``code = sum(index[i + j] * 20 ** (k - 1 - j))``),
+    so no string slicing is involved. Spectra are computed once per unique
+    sequence and returned as ``scipy.sparse`` rows.
+
+    Parameters
+    ----------
+    k : int or tuple of int, optional=(1, 2, 3)
+        Lengths of the contiguous k-mers to count.
+    gaps : tuple of int, optional=()
+        For each ``g``, count the pairs of residues found at positions
+        ``i`` and ``i + g + 1``.
+    n_features : int, optional=None
+        If given, hash the k-mer codes into this fixed number of columns,
+        which must be a power of two. Columns are the top ``log2(n_features)``
+        bits of ``code * 2**64 / golden ratio`` (Fibonacci hashing).
+        Otherwise, each possible k-mer gets its own column (``20**k``
+        columns per ``k``, plus ``400`` per gap), in the order given
+        by ``k`` and ``gaps``.
+    """
+
+    ALPHABET = AminoAcidSequence.ALPHABET
+    _HASH_MULTIPLIER = np.uint64(11400714819323198485)  # 2**64 / golden ratio
+
+    def __init__(
+        self,
+        k: Iterable[int] = (1, 2, 3),
+        gaps: Iterable[int] = (),
+        n_features: int = None,
+        *args,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        if isinstance(k, int):
+            k = (k,)
+        self.k = tuple(k)
+        self.gaps = tuple(gaps)
+        if n_features is not None and (n_features < 2 or n_features & (n_features - 1)):
+            raise ValueError(f"n_features must be a power of two, but got {n_features}")
+        self.n_features = n_features
+        n_letters = len(self.ALPHABET)
+        block_sizes = [n_letters ** k_ for k_ in self.k] + [n_letters ** 2] * len(self.gaps)
+        self._offsets = np.cumsum([0] + block_sizes)
+        self._cache = {}
+
+    @property
+    def size(self) -> int:
+        """
+        Number of columns of the resulting spectra
+        """
+        if self.n_features is not None:
+            return self.n_features
+        return int(self._offsets[-1])
+
+    def _featurize(self, system: System):
+        """
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            K-mer counts with shape ``(1, self.size)``
+        """
+        sequence = system.protein.sequence
+        if sequence not in self._cache:
+            self._cache[sequence] = self.spectrum(sequence)
+        return self._cache[sequence]
+
+    def _stack(self, rows: list):
+        """
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            K-mer counts with shape ``(len(rows), self.size)``
+        """
+        from scipy.sparse import vstack
+
+        return vstack(rows, format="csr")
+
+    def spectrum(self, sequence: str):
+        """
+        Count the k-mers of a single sequence.
+
+        Parameters
+        ----------
+        sequence : str
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            K-mer counts with shape ``(1, self.size)``
+        """
+        from scipy.sparse import csr_matrix
+
+        columns, counts = np.unique(self._kmer_columns(sequence), return_counts=True)
+        if self.n_features is not None:
+            columns, inverse = np.unique(self._hash(columns), return_inverse=True)
+            counts = np.bincount(inverse, weights=counts, minlength=len(columns))
+        return csr_matrix(
+            (counts.astype("float32"), (np.zeros_like(columns), columns)),
+            shape=(1, self.size),
+        )
+
+    def _hash(self, columns: np.ndarray) -> np.ndarray:
+        """
+        Fibonacci hashing of k-mer ``columns`` into ``[0, n_features)``
+        """
+        # the product wraps around 2**64; its high bits depend on all bits of the code
+        shift = np.uint64(64 - (self.n_features.bit_length() - 1))
+        return ((columns.astype("uint64") * self._HASH_MULTIPLIER) >> shift).astype("int64")
+
+    def _kmer_columns(self, sequence: str) -> np.ndarray:
+        """
+        Column index of every k-mer (and gapped dimer) present in ``sequence``,
+        with repetitions. K-mers including unknown characters are skipped.
+        """
+        n_letters = len(self.ALPHABET)
+        indices = _encode(sequence, self.ALPHABET).astype("int64")
+        unknown = indices == n_letters
+        columns = []
+        for block, k in enumerate(self.k):
+            n_windows = len(indices) - k + 1
+            if n_windows <= 0:
+                continue
+            codes = np.zeros(n_windows, dtype="int64")
+            invalid = np.zeros(n_windows, dtype=bool)
+            for j in range(k):
+                codes = codes * n_letters + indices[j : j + n_windows]
+                invalid |= unknown[j : j + n_windows]
+            columns.append(self._offsets[block] + codes[~invalid])
+        for block, gap in enumerate(self.gaps, start=len(self.k)):
+            distance = gap + 1
+            if len(indices) <= distance:
+                continue
+            codes = indices[:-distance] * n_letters + indices[distance:]
+            invalid = unknown[:-distance] | unknown[distance:]
+            columns.append(self._offsets[block] + codes[~invalid])
+        if not columns:
+            return np.empty(0, dtype="int64")
+        return np.concatenate(columns)
@@ -0,0 +1,172 @@
+"""
+K-fold splits with an extra validation subset, and plans to reuse them
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Union
+
+import numpy as np
+from sklearn.model_selection import KFold, train_test_split
+
+logger = logging.getLogger(__name__)
+
+
+class KFold3Way(KFold):
+    """WIP"""
+
+    def split(self, X, y=None, groups=None, with_validation=True, random_state=None):
+        """WIP"""
+        for train, test in super().split(X, y, groups):
+            if with_validation:
+                train, val = train_test_split(
+                    train, test_size=(1 / (self.n_splits - 1)), random_state=random_state
+                )
+            else:
+                val = np.array([], dtype=train.dtype)
+            yield train, val, test
+
+
+class FoldPlan:
+
+    """
+    Train, validation and test indices of each fold of a ``KFold3Way`` split,
+    computed once and saved to disk so other runs can reuse the same folds.
+
+    Parameters
+    ----------
+    folds : list of (train, val, test) tuples of int arrays
+    n_splits, with_validation, shuffle, seed
+        How the folds were computed; checked by ``FoldPlan.load_or_compute()``
+    """
+
+    SPLITS = ("train", "val", "test")
+
+    def __init__(
+        self,
+        folds: Iterable,
+        n_splits: int,
+        with_validation: bool = True,
+        shuffle: bool = False,
+        seed: int = 0,
+    ):
+        self.folds = [
+            tuple(np.asarray(indices, dtype="int64") for indices in fold) for fold in folds
+        ]
+        self.n_splits = n_splits
+        self.with_validation = with_validation
+        self.shuffle = shuffle
+        self.seed = seed
+
+    @classmethod
+    def compute(
+        cls,
+        indices: Union[int, Iterable[int]],
+        n_splits: int = 5,
+        with_validation: bool = True,
+        shuffle: bool = False,
+        seed: int = 0,
+    ) -> "FoldPlan":
+        """
+        Split ``indices`` (or ``range(indices)``, if an int). The same
+        arguments always give the same folds, validation subsets included.
+        """
+        indices = np.arange(indices) if np.ndim(indices) == 0 else np.asarray(indices)
+        # KFold rejects a random_state when not shuffling
+        random_state = seed if shuffle else None
+        kfold = KFold3Way(n_splits=n_splits, shuffle=shuffle, random_state=random_state)
+        folds = [
+            (indices[train], indices[val], indices[test])
+            for train, val, test in kfold.split(
+                indices, with_validation=with_validation, random_state=seed
+            )
+        ]
+        return cls(folds, n_splits, with_validation=with_validation, shuffle=shuffle, seed=seed)
+
+    @property
+    def parameters(self) -> dict:
+        return {
+            "n_splits": self.n_splits,
+            "with_validation": self.with_validation,
+            "shuffle": self.shuffle,
+            "seed": self.seed,
+        }
+
+    @staticmethod
+    def filename(
+        prefix: str = "folds",
+        n_splits: int = 5,
+        with_validation: bool = True,
+        shuffle: bool = False,
+        seed: int = 0,
+    ) -> str:
+        """
+        File name encoding every parameter of a plan, so plans computed
+        with different settings can live side by side
+        """
+        return (
+            f"{prefix}_k{n_splits}_val{int(with_validation)}"
+            f"_shuffle{int(shuffle)}_seed{seed}.npz"
+        )
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """
+        Write the plan to an ``.npz`` file, atomically
+        """
+        path = Path(path)
+        arrays = {
+            f"{split}_{i}": indices
+            for i, fold in enumerate(self.folds)
+            for split, indices in zip(self.SPLITS, fold)
+        }
+        tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}.npz")
+        np.savez(tmp, parameters=json.dumps(self.parameters), **arrays)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "FoldPlan":
+        with np.load(path) as npz:
+            parameters = json.loads(str(npz["parameters"]))
+            folds = [
+                tuple(npz[f"{split}_{i}"] for split in cls.SPLITS)
+                for i in range(parameters["n_splits"])
+            ]
+        return cls(folds, **parameters)
+
+    @classmethod
+    def load_or_compute(
+        cls, path: Union[str, Path], indices: Union[int, Iterable[int]], **kwargs
+    ) -> "FoldPlan":
+        """
+        Load the plan saved at ``path`` if it was computed with the same
+        arguments and over the same indices. Otherwise, compute and save it.
+        """
+        path = Path(path)
+        if path.is_file():
+            plan = cls.load(path)
+            expected = {"n_splits": 5, "with_validation": True, "shuffle": False, "seed": 0}
+            expected.update(kwargs)
+            covered = np.sort(np.concatenate(plan.folds[0])) if plan.folds else []
+            wanted = np.arange(indices) if np.ndim(indices) == 0 else np.sort(indices)
+            if plan.parameters == expected and np.array_equal(covered, wanted):
+                logger.debug("Reusing fold plan %s", path)
+                return plan
+            logger.info("Fold plan %s does not match the requested split; recomputing", path)
+        plan = cls.compute(indices, **kwargs)
+        plan.save(path)
+        return plan
+
+    def __len__(self):
+        return len(self.folds)
+
+    def __getitem__(self, index):
+        return self.folds[index]
+
+    def __iter__(self):
+        return iter(self.folds)
+
+    def __repr__(self):
+        sizes = [len(index) for index in self.folds[0]] if self.folds else []
+        return f"<{self.__class__.__name__} {self.parameters} fold sizes={sizes}>"
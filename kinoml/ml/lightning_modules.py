@@ -4,6 +4,7 @@ Training loops built with pytorch-lightning
 WIP
 """
 
+import logging
 from copy import deepcopy
 from pathlib import Path
 from typing import List
@@ -11,16 +12,18 @@ from collections import defaultdict
 
 import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader, SubsetRandomSampler
+from torch.utils.data import Dataset, DataLoader, Subset
 import pytorch_lightning as pl
 from pytorch_lightning import metrics
 from sklearn.metrics import r2_score
-from sklearn.model_selection import KFold, train_test_split
 from IPython.display import display
 
 from ..core import measurements as measurement_types
 from ..core.measurements import null_observation_model as _null_observation_model
 from ..analysis.plots import predicted_vs_observed
+from .folds import FoldPlan, KFold3Way  # noqa: F401 (KFold3Way used to be defined here)
+
+logger = logging.getLogger(__name__)
 
 
 class RootMeanSquaredError(metrics.MeanSquaredError):
@@ -65,9 +68,19 @@ class ObservationModelModule(pl.LightningModule):
         return prediction
 
     def _standard_step(self, batch, batch_idx, **kwargs):
-        """WIP"""
-        x, y = batch
-        predicted = self.forward(x, observation_model=batch.observation_model)
+        """
+        Batches are ``(x, y)`` pairs of a single measurement type, or
+        ``(x, y, measurement_type, conditions)`` tuples mixing several types
+        (see ``MultiTypeTorchDataset``). The latter need an observation model
+        that takes the type codes and conditions too, as returned by
+        ``kinoml.core.measurements.mixed_observation_model()``.
+        """
+        if len(batch) == 4:
+            x, y, types, conditions = batch
+            predicted = batch.observation_model(self.nn_model(x), types, conditions)
+        else:
+            x, y = batch
+            predicted = self.forward(x, observation_model=batch.observation_model)
         loss = self.loss_function(predicted, y.view_as(predicted))
         return predicted, loss
 
@@ -82,7 +95,7 @@ class ObservationModelModule(pl.LightningModule):
     ):
         """WIP"""
         predicted, loss = self._standard_step(batch, batch_idx, **kwargs)
-        _, y = batch
+        y = batch[1]
         observed = y.view_as(predicted)
         self.log(f"{metric_prefix}_loss", loss, on_step=False, on_epoch=True, logger=True)
         return {
@@ -105,8 +118,10 @@ class ObservationModelModule(pl.LightningModule):
 
         # FIXME: See if `batch` can also host the measurement class
         # or change the API to pass the classes around, not the staticmethods
-        measurement_class = getattr(measurement_types, obsmodel.__qualname__.split(".")[0], None)
-        if measurement_class is not None:
+        # mixed batches have no single measurement class to plot against
+        qualname = getattr(obsmodel, "__qualname__", "")
+        measurement_class = getattr(measurement_types, qualname.split(".")[0], None)
+        if isinstance(measurement_class, type):
             plot = predicted_vs_observed(
                 predicted, observed, measurement_class, with_metrics=False
             )
@@ -141,10 +156,14 @@ class MultiDataModule(pl.LightningDataModule):
         self,
         datasets: List[Dataset],
         observation_models: List[callable] = (_null_observation_model,),
+        fold_directory: str = None,
         **kwargs,
     ):
         super().__init__()
         self.datasets = datasets
+        # where to keep fold plans, for datasets that are not on disk already
+        self.fold_directory = fold_directory
+        self._fold_plans = {}
 
         # If only one observation model is provided, we use the same one for
         # all datasets
@@ -193,10 +212,10 @@ class MultiDataModule(pl.LightningDataModule):
         if indices is None:
             indices = self.datasets[dataset_index].indices
         dl = ObservationModelDataLoader(
-            dataset=self.datasets[dataset_index],
+            dataset=Subset(self.datasets[dataset_index], indices),
             observation_model=self.observation_models[dataset_index],
-            sampler=SubsetRandomSampler(indices),
-            **self.dataloader_options,
+            # RandomSampler refuses empty datasets (e.g. val folds without validation)
+            **{"shuffle": len(indices) > 0, **self.dataloader_options},
         )
         return dl
 
@@ -226,44 +245,110 @@ class MultiDataModule(pl.LightningDataModule):
             dataset_index=dataset_index, indices=self.datasets[dataset_index].indices["test"]
         )
 
-    def get_kfold(self, nfolds=5, with_validation=True, shuffle=False, **kwargs):
-        """WIP"""
-
-        # Start with small datasets first to ensure they are seen before overfitting to larger ones
-        kfold = KFold3Way(n_splits=nfolds, shuffle=shuffle, **kwargs)
-        for dataset_index in self.dataset_indices_by_size(reverse=True):
+    def fold_plan(self, dataset_index, nfolds=5, with_validation=True, shuffle=False, seed=0):
+        """
+        ``FoldPlan`` over all the indices of a dataset. Plans are computed once
+        per datamodule and, if the dataset lives on disk (it has a ``path``)
+        or ``fold_directory`` is set, saved there and reused by later runs.
+        """
+        key = (dataset_index, nfolds, with_validation, shuffle, seed)
+        if key not in self._fold_plans:
             dataset = self.datasets[dataset_index]
-            all_indices = np.concatenate(
+            indices = np.concatenate(
                 [dataset.indices["train"], dataset.indices["val"], dataset.indices["test"]]
+            ).astype("int64")
+            parameters = dict(
+                n_splits=nfolds, with_validation=with_validation, shuffle=shuffle, seed=seed
             )
-            # Check splitting indices is the same as splitting on the dataset
-            for fold_index, (train_index, val_index, test_index) in enumerate(
-                kfold.split(all_indices, with_validation=with_validation)
-            ):
-                print(
-                    f"DS #{dataset_index} {self.measurement_types[dataset_index]}, fold={fold_index}"
+            directory = self.fold_directory or getattr(dataset, "path", None)
+            if directory is None:
+                plan = FoldPlan.compute(indices, **parameters)
+            else:
+                directory = Path(directory)
+                if directory.is_file():
+                    directory = directory.parent
+                prefix = f"folds_{self.measurement_types[dataset_index]}"
+                name = FoldPlan.filename(prefix, **parameters)
+                plan = FoldPlan.load_or_compute(directory / name, indices, **parameters)
+            self._fold_plans[key] = plan
+        return self._fold_plans[key]
+
+    def get_kfold(self, nfolds=5, with_validation=True, shuffle=False, seed=0, **kwargs):
+        """
+        Yield ``(train, val, test)`` loaders for each fold of each dataset.
+        Splits come from ``fold_plan()``, so they are the same across calls
+        (and runs) with the same arguments. ``random_state`` is accepted as
+        an alias of ``seed``.
+        """
+        seed = kwargs.pop("random_state", seed)
+        # Start with small datasets first to ensure they are seen before overfitting to larger ones
+        for dataset_index in self.dataset_indices_by_size(reverse=True):
+            plan = self.fold_plan(dataset_index, nfolds, with_validation, shuffle, seed)
+            for fold_index, fold in enumerate(plan):
+                logger.debug(
+                    "DS #%d %s, fold=%d",
+                    dataset_index,
+                    self.measurement_types[dataset_index],
+                    fold_index,
+                )
+                yield tuple(
+                    self._build_dataloader(dataset_index=dataset_index, indices=indices)
+                    for indices in fold
                 )
-                train_dl = self._build_dataloader(dataset_index=dataset_index, indices=train_index)
-                val_dl = self._build_dataloader(dataset_index=dataset_index, indices=val_index)
-                test_dl = self._build_dataloader(dataset_index=dataset_index, indices=test_index)
-                yield train_dl, val_dl, test_dl
 
 
 class CrossValidateTrainer:
-    """WIP"""
+    """
+    WIP
+
+    Parameters
+    ----------
+    nfolds : int, optional=5
+    with_validation : bool, optional=True
+    shuffle : bool, optional=False
+    n_jobs : int, optional=1
+        Train up to this many folds at the same time, each in its own
+        process (see ``fit()``). Meant for small models on CPU.
+    threads_per_job : int, optional
+        Threads used by each of those processes. Defaults to an even
+        share of the available CPUs.
+    start_method : str, optional
+        Multiprocessing start method for the ``n_jobs`` processes
+    args, kwargs
+        Passed to each ``pl.Trainer``
+    """
 
-    def __init__(self, nfolds=5, with_validation=True, shuffle=False, *args, **kwargs):
+    def __init__(
+        self,
+        nfolds=5,
+        with_validation=True,
+        shuffle=False,
+        *args,
+        n_jobs=1,
+        threads_per_job=None,
+        start_method=None,
+        **kwargs,
+    ):
         self.nfolds = nfolds
         self.with_validation = with_validation
         self.shuffle = shuffle
+        self.n_jobs = n_jobs
+        self.threads_per_job = threads_per_job
+        self.start_method = start_method
         self.trainer_args = args
         self.trainer_kwargs = kwargs
         self._models = []
         self._trainers = []
         self._dataloaders = defaultdict(list)
+        self._shared_directory = None
 
     def fit(self, model, datamodule):
-        """WIP"""
+        """
+        Train one copy of ``model`` per fold. With ``n_jobs > 1``, folds are
+        trained in parallel processes (check ``_fit_parallel()``).
+        """
+        if self.n_jobs > 1:
+            return self._fit_parallel(model, datamodule)
         # .get_kfold() will provide nfolds * len(datamodule.datasets) iterations
         # but we reuse the first nfolds models across the datasets
         for i, (train_loader, val_loader, test_loader) in enumerate(
@@ -295,6 +380,63 @@ class CrossValidateTrainer:
                 val_dataloaders=val_loader,
             )
 
+    def _fit_parallel(self, model, datamodule):
+        """
+        Same as ``fit()``, but each fold is trained in a separate process,
+        on all the datasets of ``datamodule`` in turn.
+
+        The array attributes of the datasets (including lists of featurized
+        systems, which are stacked) are moved to memory-mapped files first,
+        so the processes share them instead of receiving copies. Each
+        process logs and checkpoints under ``<default_root_dir>/fold_<i>``.
+        Trained weights are loaded back into ``self._models``, and
+        ``self._trainers`` get the best checkpoint path and score of each
+        fold, so ``test()`` and ``best_run()`` work as after a serial run.
+        """
+        from tempfile import TemporaryDirectory
+        from .parallel import process_pool, share_arrays
+
+        if self._shared_directory is None:
+            self._shared_directory = TemporaryDirectory(prefix="kinoml-folds-")
+        for dataset in datamodule.datasets:
+            share_arrays(dataset, self._shared_directory.name)
+
+        folds = defaultdict(list)
+        for i, (train_loader, val_loader, test_loader) in enumerate(
+            datamodule.get_kfold(
+                self.nfolds, with_validation=self.with_validation, shuffle=self.shuffle
+            )
+        ):
+            folds[i % self.nfolds].append((train_loader, val_loader))
+            self._dataloaders["train"].append(train_loader)
+            self._dataloaders["test"].append(test_loader)
+            self._dataloaders["val"].append(val_loader)
+
+        root = Path(self.trainer_kwargs.get("default_root_dir") or Path.cwd())
+        with process_pool(self.n_jobs, self.threads_per_job, self.start_method) as pool:
+            futures = {}
+            for fold_index, loaders in folds.items():
+                trainer_kwargs = {
+                    **self.trainer_kwargs,
+                    "default_root_dir": str(root / f"fold_{fold_index}"),
+                }
+                futures[fold_index] = pool.submit(
+                    _fit_fold, model, self.trainer_args, trainer_kwargs, loaders
+                )
+            for fold_index in sorted(futures):
+                result = futures[fold_index].result()
+                fold_model = deepcopy(model)
+                fold_model.load_state_dict(result["state_dict"])
+                fold_trainer = pl.Trainer(
+                    *deepcopy(self.trainer_args), **deepcopy(self.trainer_kwargs)
+                )
+                checkpoint = fold_trainer.checkpoint_callback
+                if checkpoint is not None:
+                    checkpoint.best_model_path = result["best_model_path"]
+                    checkpoint.best_model_score = result["best_model_score"]
+                self._models.append(fold_model)
+                self._trainers.append(fold_trainer)
+
     def _patch_paths_for_kfold(self, fold_trainer, fold):
         """WIP"""
         # Patch filepaths so it contains info about the fold
@@ -321,7 +463,7 @@ class CrossValidateTrainer:
         for fold_index, test_dataloader in enumerate(
             self._dataloaders["test"][dataset_index::n_datasets]
         ):
-            print(f"Test results for DS #{dataset_index} for fold {fold_index}")
+            logger.info("Test results for DS #%d for fold %d", dataset_index, fold_index)
             trainer = self._trainers[fold_index]
             model = self._models[fold_index]
             results.append(
@@ -352,7 +494,28 @@ class CrossValidateTrainer:
         """WIP"""
         self._models[:] = []
         self._trainers[:] = []
-        self._dataloaders[:] = []
+        self._dataloaders.clear()
+        if self._shared_directory is not None:
+            self._shared_directory.cleanup()
+            self._shared_directory = None
+
+
+def _fit_fold(model, trainer_args, trainer_kwargs, loaders):
+    """
+    Train ``model`` on each ``(train_loader, val_loader)`` pair in turn, in
+    a worker process of ``CrossValidateTrainer._fit_parallel()``. Only
+    picklable results are returned: the weights and checkpoint details.
+    """
+    trainer = pl.Trainer(*trainer_args, **trainer_kwargs)
+    for train_loader, val_loader in loaders:
+        trainer.fit(model, train_dataloader=train_loader, val_dataloaders=val_loader)
+    checkpoint = trainer.checkpoint_callback
+    score = None if checkpoint is None else checkpoint.best_model_score
+    return {
+        "state_dict": {k: v.detach().cpu() for k, v in model.state_dict().items()},
+        "best_model_path": None if checkpoint is None else checkpoint.best_model_path,
+        "best_model_score": None if score is None else score.detach().cpu(),
+    }
 
 
 class ObservationModelDataLoader(DataLoader):
@@ -427,16 +590,3 @@ class AttrList(list):
     def __call__(self, **kwargs):
         self.__dict__.update(kwargs)
         return self
-
-
-class KFold3Way(KFold):
-    """WIP"""
-
-    def split(self, X, y=None, groups=None, with_validation=True):
-        """WIP"""
-        for train, test in super().split(X, y, groups):
-            if with_validation:
-                train, val = train_test_split(train, test_size=(1 / (self.n_splits - 1)))
-            else:
-                val = np.array([])
-            yield train, val, test
@@ -0,0 +1,179 @@
+"""
+Helpers to run independent training jobs (e.g. cross-validation folds)
+in separate processes on CPU.
+
+Read-only arrays are shared through memory-mapped ``.npy`` files: once an
+object's arrays have been moved to disk with ``share_arrays()``, they pickle
+as file references (see ``SharedMemmap``), so other processes map the same
+pages instead of receiving a copy of the data. No global pickling state is
+changed.
+"""
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+#: environment variables honoured by the BLAS / OpenMP runtimes used by numpy and torch
+THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+class SharedMemmap(np.memmap):
+
+    """
+    Read-only ``np.memmap`` that pickles as a reference to its file, so
+    other processes (e.g. ``process_pool()`` or ``DataLoader`` workers)
+    map the same pages instead of receiving a copy. Views and slices are
+    pickled as regular (copied) arrays.
+
+    Use ``SharedMemmap.open(path)`` to map an ``.npy`` file.
+    """
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> "SharedMemmap":
+        with open(path, "rb") as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+        shape, fortran_order, dtype = header
+        return cls(
+            path,
+            dtype=dtype,
+            mode="r",
+            offset=offset,
+            shape=shape,
+            order="F" if fortran_order else "C",
+        )
+
+    def __reduce__(self):
+        # only whole maps can be reopened from their file
+        if isinstance(self.base, mmap.mmap) and self.filename is not None:
+            return _open_shared_memmap, (
+                self.filename,
+                self.dtype,
+                self.shape,
+                self.offset,
+                "F" if self.flags.f_contiguous and not self.flags.c_contiguous else "C",
+            )
+        return np.asarray(self).__reduce__()
+
+
+def _open_shared_memmap(filename, dtype, shape, offset, order):
+    return SharedMemmap(filename, dtype=dtype, mode="r", shape=shape, offset=offset, order=order)
+
+
+def _shareable_rows(value):
+    """
+    Shape and dtype of ``value`` as a stacked array, if it is a list or tuple
+    of numeric ``np.ndarray`` rows that all have the same shape and dtype
+    (like ``DatasetProvider.featurized_systems()``). None otherwise.
+    """
+    if not isinstance(value, (list, tuple)) or not value:
+        return None
+    first = value[0]
+    if type(first) is not np.ndarray or first.dtype.hasobject:
+        return None
+    for row in value:
+        if type(row) is not np.ndarray or row.shape != first.shape or row.dtype != first.dtype:
+            return None
+    return (len(value), *first.shape), first.dtype
+
+
+def share_arrays(obj, directory: Union[str, Path], min_bytes: int = 2 ** 16):
+    """
+    Replace the (large) numpy array attributes of ``obj`` with read-only
+    memory maps of ``.npy`` copies written to ``directory``.
+
+    Lists of same-shape arrays (e.g. the featurized systems that
+    ``DatasetProvider.to_pytorch()`` passes to ``PrefeaturizedTorchDataset``)
+    are stacked into a single memory map, whose rows replace the list items.
+
+    Parameters
+    ----------
+    obj : object
+        E.g. a ``PrefeaturizedTorchDataset``. Modified in place.
+    directory : str or Path
+        Must outlive every process using ``obj``
+    min_bytes : int, optional
+        Smaller arrays are left alone; they are cheaper to copy
+
+    Returns
+    -------
+    obj
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, value in list(vars(obj).items()):
+        path = directory / f"{type(obj).__name__}-{id(obj):x}-{name}.npy"
+        if type(value) is np.ndarray:
+            if value.nbytes < min_bytes or value.dtype.hasobject:
+                continue
+            np.save(path, value)
+        else:
+            rows = _shareable_rows(value)
+            if rows is None:
+                continue
+            shape, dtype = rows
+            if np.prod(shape, dtype="int64") * dtype.itemsize < min_bytes:
+                continue
+            # write row by row, so the stacked array is never held in memory
+            stacked = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+            for i, row in enumerate(value):
+                stacked[i] = row
+            stacked.flush()
+            del stacked
+        setattr(obj, name, SharedMemmap.open(path))
+    return obj
+
+
+def limit_threads(n_threads: int):
+    """
+    Cap the threads used by torch and the BLAS / OpenMP runtimes in this process
+    """
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(n_threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(n_threads)
+
+
+def process_pool(
+    n_jobs: int, threads_per_job: int = None, start_method: str = None
+) -> ProcessPoolExecutor:
+    """
+    A ``ProcessPoolExecutor`` whose workers use ``threads_per_job`` threads
+    each. Arrays moved to disk with ``share_arrays()`` reach them as file
+    references, not copies.
+
+    Parameters
+    ----------
+    n_jobs : int
+        Worker processes
+    threads_per_job : int, optional
+        Defaults to an even share of the available CPUs
+    start_method : str, optional
+        ``"fork"``, ``"spawn"`` or ``"forkserver"``. Defaults to the platform's.
+        ``"spawn"`` requires everything submitted to be importable.
+    """
+    if threads_per_job is None:
+        threads_per_job = max(1, (os.cpu_count() or 1) // n_jobs)
+    return ProcessPoolExecutor(
+        max_workers=n_jobs,
+        mp_context=get_context(start_method),
+        initializer=limit_threads,
+        initargs=(threads_per_job,),
+    )
@@ -1,8 +1,15 @@
 """
 WIP
 """
+import logging
+import time
+
+import numpy as np
+import torch
 from tqdm.auto import trange
 
+logger = logging.getLogger(__name__)
+
 
 def multi_measurement_training_loop(
     dataloaders, observation_models, model, optimizer, loss_function, epochs=100
@@ -71,3 +78,138 @@ def multi_measurement_training_loop(
         loss_timeseries.append(cumulative_loss)
 
     return model, loss_timeseries
+
+
+def interleaved_training_loop(
+    dataloaders,
+    observation_models,
+    model,
+    optimizer,
+    loss_function,
+    epochs=100,
+    ratios=None,
+    accumulation_steps=1,
+    log_every=50,
+    random_state=None,
+):
+    """
+    Training loop that interleaves the batches of several dataloaders (one per
+    measurement type), instead of exhausting them one after another.
+
+    Losses are accumulated as tensors and only copied to the host every
+    ``log_every`` optimizer steps and at the end of each epoch.
+
+    Parameters:
+        dataloaders: dict of str -> torch.utils.data.DataLoader
+            key must refer to the measurement type present in the dataloader
+        observation_models: dict of str -> callable
+            keys must be the same as in dataloaders, and point to pytorch-compatible callables
+            that convert delta_over_kt to the corresponding measurement_type
+        model: torch.nn.Model
+            instance of the model to train
+        optimizer: torch.optim.Optimizer
+            instance of the optimization engine
+        loss_function: torch.nn.modules._Loss
+            instance of the loss function to apply (e.g. MSELoss()), averaging over the batch
+        epochs: int
+            number of iterations the loop will run
+        ratios: dict of str -> float, optional
+            relative probability of drawing the next batch from each dataloader.
+            An epoch still has as many batches as all the dataloaders together;
+            dataloaders that run out are restarted. By default, every batch of every
+            dataloader is used once per epoch, in random order.
+        accumulation_steps: int
+            number of batches whose gradients are accumulated (and averaged) before each
+            optimizer step. The last group of an epoch may be smaller.
+        log_every: int
+            optimizer steps between progress reports (which synchronize with the device)
+        random_state: int or numpy.random.Generator, optional
+            seed for the batch order
+
+    Returns:
+        model: torch.nn.Model
+            The trained model (same instance as provided in parameters)
+        history: list of dict
+            One entry per epoch with the mean ``loss`` per sample, ``loss_by_type``,
+            number of ``samples``, ``samples_per_second``, and the seconds spent
+            waiting for data (``data_time``) and training on it (``compute_time``).
+            Asynchronous device work is accounted as compute when it is synchronized.
+    """
+    msg = "Keys in `dataloaders` must be same or a subset of those in `observation_models`"
+    assert set(dataloaders.keys()).issubset(set(observation_models.keys())), msg
+
+    keys = list(dataloaders)
+    lengths = np.array([len(dataloaders[key]) for key in keys])
+    if ratios is not None:
+        unknown = set(ratios).difference(keys)
+        if unknown:
+            raise ValueError(f"`ratios` has keys not in `dataloaders`: {sorted(unknown)}")
+        weights = np.array([ratios.get(key, 0) for key in keys], dtype="float64")
+        if not np.isfinite(weights).all() or (weights < 0).any() or not weights.sum() > 0:
+            raise ValueError(
+                "`ratios` must be finite, non-negative and positive for at least one "
+                f"of the dataloaders {keys}, but got {ratios}"
+            )
+        probabilities = weights / weights.sum()
+    rng = np.random.default_rng(random_state)
+    history = []
+    range_epochs = trange(epochs, desc="Epochs")
+    for epoch in range_epochs:
+        if ratios is None:
+            schedule = rng.permutation(np.repeat(np.arange(len(keys)), lengths))
+        else:
+            schedule = rng.choice(len(keys), size=lengths.sum(), p=probabilities)
+        iterators = {}
+        loss_sums = {key: torch.zeros(()) for key in keys}
+        sample_counts = dict.fromkeys(keys, 0)
+        data_time = compute_time = 0.0
+        steps = 0
+        optimizer.zero_grad()
+        for i, code in enumerate(schedule):
+            key = keys[code]
+            tic = time.perf_counter()
+            try:
+                x, y = next(iterators[key])
+            except (KeyError, StopIteration):
+                iterators[key] = iter(dataloaders[key])
+                x, y = next(iterators[key])
+            toc = time.perf_counter()
+            data_time += toc - tic
+
+            prediction = observation_models[key](model(x))
+            loss = loss_function(prediction, y.reshape(prediction.shape))
+            # average over the batches of this group, which may be cut short by the epoch end
+            group_start = i - i % accumulation_steps
+            (loss / min(accumulation_steps, len(schedule) - group_start)).backward()
+            if loss_sums[key].device != loss.device:
+                loss_sums[key] = loss_sums[key].to(loss.device)
+            loss_sums[key] += loss.detach() * len(y)
+            sample_counts[key] += len(y)
+            if (i + 1) % accumulation_steps == 0 or i + 1 == len(schedule):
+                optimizer.step()
+                optimizer.zero_grad()
+                steps += 1
+                if log_every and steps % log_every == 0:
+                    running = sum(loss_sums.values()).item() / max(sum(sample_counts.values()), 1)
+                    logger.info("Epoch %d, step %d: loss=%.3e", epoch, steps, running)
+            compute_time += time.perf_counter() - toc
+
+        loss_by_type = {
+            key: loss_sums[key].item() / sample_counts[key] for key in keys if sample_counts[key]
+        }
+        samples = sum(sample_counts.values())
+        entry = {
+            "epoch": epoch,
+            "loss": sum(loss_sums[key].item() for key in keys) / max(samples, 1),
+            "loss_by_type": loss_by_type,
+            "samples": samples,
+            "samples_per_second": samples / max(data_time + compute_time, 1e-12),
+            "data_time": data_time,
+            "compute_time": compute_time,
+        }
+        history.append(entry)
+        range_epochs.set_description(
+            f"Epochs (loss={entry['loss']:.2e}, {entry['samples_per_second']:.0f} samples/s)"
+        )
+
+    return model, history
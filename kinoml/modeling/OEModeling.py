@@ -664,6 +664,33 @@ def generate_reasonable_conformations(
     return conformations_ensemble
 
 
+def read_conformations(path: str) -> oechem.OEMol:
+    """
+    Read a conformer ensemble from a multi-record file (e.g. the SDF files cached by
+    ``kinoml.features.ligand.RDKitConformerFeaturizer``) into a single multi-conformer
+    molecule, so it can be used instead of ``generate_conformations``.
+
+    Parameters
+    ----------
+    path: str
+        Path to molecule file, with one record per conformer.
+
+    Returns
+    -------
+    conformations: oechem.OEMol
+        An OpenEye multi-conformer molecule holding the stored conformations.
+    """
+    ifs = oechem.oemolistream()
+    if not ifs.open(str(path)):
+        raise OSError(f"Unable to open {path} for reading")
+    # records with the same graph and title are merged as conformers of the same molecule
+    ifs.SetConfTest(oechem.OEAbsoluteConfTest(False))
+    conformations = oechem.OEMol()
+    oechem.OEReadMolecule(ifs, conformations)
+    ifs.close()
+    return conformations
+
+
 def optimize_poses(
     docking_poses: List[oechem.OEGraphMol],
     protein: Union[oechem.OEMolBase, oechem.OEGraphMol],
@@ -15,3 +15,44 @@ def test_measurements():
     assert isinstance(measurement, BaseMeasurement)
     assert measurement == BaseMeasurement(50, conditions=conditions, system=system)
     assert measurement != BaseMeasurement(10, conditions=conditions, system=system)
+
+
+def test_multireplicate_measurements():
+    import numpy as np
+    import pytest
+    from kinoml.core.measurements import pIC50Measurement
+    from kinoml.core.conditions import AssayConditions
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.systems import System
+
+    conditions = AssayConditions()
+    system = System([MolecularComponent()])
+    measurement = pIC50Measurement([5, 6, 7], conditions=conditions, system=system)
+    assert measurement.values.shape == measurement.errors.shape == (3,)
+    assert np.isnan(measurement.errors).all()
+    with pytest.raises(AssertionError):
+        pIC50Measurement([5, 16], conditions=conditions, system=system)
+
+
+def test_mixed_observation_model():
+    import torch
+    from kinoml.core.measurements import (
+        PercentageDisplacementMeasurement,
+        pKiMeasurement,
+        mixed_observation_model,
+        observation_model_parameters,
+    )
+
+    assert observation_model_parameters(pKiMeasurement) == {"standard_conc": 1}
+    model = mixed_observation_model(
+        [PercentageDisplacementMeasurement, pKiMeasurement], parameters=["inhibitor_conc"]
+    )
+    dG = torch.tensor([-20.0, -20.0, -20.0, 30.0])
+    types = torch.tensor([0, 0, 1, 1])
+    conditions = torch.tensor([[1e-6], [float("nan")], [1e-6], [float("nan")]])
+    predicted = model(dG, types, conditions)
+    displacement = PercentageDisplacementMeasurement.observation_model()
+    pKi = pKiMeasurement.observation_model()
+    torch.testing.assert_close(predicted[0], displacement(dG[0], inhibitor_conc=1e-6))
+    torch.testing.assert_close(predicted[1], displacement(dG[1]))
+    torch.testing.assert_close(predicted[2:], pKi(dG[2:]))
@@ -2,6 +2,8 @@
 Test kinoml.core.sequences and derived objects
 """
 
+import pytest
+
 from ...core.sequences import Biosequence
 from ...core.proteins import AminoAcidSequence
 
@@ -16,6 +18,32 @@ def test_biosequence_mutation():
     assert s.mutate("A1T", "T2A", "T2-G4del") == "TAGTHCTCH"
 
 
+def test_biosequence_mutation_multiple_indels():
+    s = Biosequence("ATCGTHCTCH", name="test")
+    # positions always refer to the original sequence
+    mutated = s.mutate("5Tins", "A1T", "T2-G4del", "7Gins", "H10C")
+    assert mutated == "TTGTTHCGTCC"
+    assert mutated.name == "test (mutations: 5Tins, A1T, T2-G4del, 7Gins, H10C)"
+    assert mutated.metadata["mutations"] == ("5Tins", "A1T", "T2-G4del", "7Gins", "H10C")
+    with pytest.raises(ValueError):
+        s.mutate("T2-T5del", "C3P")  # overlapping
+    with pytest.raises(ValueError):
+        s.mutate("A20T")  # out of the sequence
+    assert s.mutate("T2-T5del", "C3P", raise_errors=False) is None
+    assert s.mutate("C3P", "unknown", raise_errors=False) == "ATPGTHCTCH"
+
+
+def test_biosequence_mutate_many():
+    s = AminoAcidSequence("ACDE")
+    variants = s.mutate_many("A1C", ("A1C", "D3E"), "2Wins")
+    assert variants == ["CCDE", "CCEE", "ACWDE"]
+    assert all(isinstance(v, AminoAcidSequence) for v in variants)
+    scan = [f"{s[i]}{i + 1}{new}" for i in range(len(s)) for new in s.ALPHABET if new != s[i]]
+    assert len(set(s.mutate_many(*scan))) == len(s) * (len(s.ALPHABET) - 1)
+    with pytest.raises(ValueError):
+        s.mutate("A1B")  # B is not an amino acid
+
+
 def test_biosequence_cut():
     s = Biosequence("ATCGTHCTCH")
     assert s.cut("T2", "T8") == "TCGTHCT"
@@ -31,3 +59,15 @@ def test_biosequence_from_ncbi():
 def test_biosequences_from_ncbis():
     ss = AminoAcidSequence.from_ncbi("NP_005148.2", "NP_001607.1")
     assert len(ss) == 2
+
+
+def test_biosequence_mutation_wildtype_mismatch(caplog):
+    s = AminoAcidSequence("ACDEFGHIK")
+    with pytest.raises(ValueError, match="W2 is C"):
+        s.mutate("W2Y")
+    with pytest.raises(ValueError, match="G7 is H"):
+        s.mutate("C2-G7del")
+    assert s.mutate("C2-H7del") == "ACHIK"
+    # without raise_errors, mismatches are applied but reported
+    assert s.mutate("W2Y", raise_errors=False) == "AYDEFGHIK"
+    assert "does not match the sequence" in caplog.text
@@ -11,3 +11,118 @@ def test_chembl():
         "https://github.com/openkinome/kinodata/releases/download/v0.2/activities-chembl28-sample100_v0.2.zip"
     )
     assert len(chembl) == 100
+
+
+def _chembl_like_csv(path):
+    import pandas as pd
+
+    records = [
+        # type, value, sequence, smiles
+        ("pIC50", 7.0, "ACDEFGHIK", "CCO"),
+        ("pIC50", 6.5, "ACDEFGHIK", "CCO"),
+        ("pKi", 8.0, "ACDEFGHIK", "CCN"),
+        ("pKd", 5.0, "MSVNSEKSS", "CCO"),
+        ("pIC50", 99.0, "MSVNSEKSS", "CCN"),  # out of range
+        ("pKd", 5.0, "MSVNSEKSSX", "CCN"),  # invalid sequence
+        ("pKi", None, "MSVNSEKSS", "CCN"),  # missing value
+        ("IC50", 100, "MSVNSEKSS", "CCN"),  # not requested
+    ]
+    df = pd.DataFrame.from_records(
+        records,
+        columns=[
+            "activities.standard_type",
+            "activities.standard_value",
+            "component_sequences.sequence",
+            "compound_structures.canonical_smiles",
+        ],
+    )
+    df["UniprotID"] = df["component_sequences.sequence"].str[:3]
+    df["target_dictionary.chembl_id"] = "CHEMBL" + df["component_sequences.sequence"].str[:3]
+    df["activities.standard_units"] = "nM"
+    df["assays.confidence_score"] = 9
+    df["activities.activity_id"] = range(len(df))
+    df["docs.chembl_id"] = "CHEMBL0"
+    df["docs.year"] = 2020
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_chembl_local(tmp_path, monkeypatch):
+    from kinoml.datasets.chembl import ChEMBLDatasetProvider
+
+    monkeypatch.setattr(
+        ChEMBLDatasetProvider, "_download_to_cache_or_retrieve", classmethod(lambda cls, p: p)
+    )
+    path = _chembl_like_csv(tmp_path / "activities.csv")
+    chembl = ChEMBLDatasetProvider.from_source(str(path), use_cache=False)
+    assert len(chembl) == 4
+    assert len(chembl.providers) == 3
+    assert sorted(chembl.rejected["reason"]) == [
+        "invalid sequence",
+        "missing values",
+        "value out of range",
+    ]
+    systems = {ms.system for ms in chembl.measurements}
+    assert len(systems) == 3  # both CCO measurements on the same kinase share a system
+    kinases = {id(ms.system.protein) for ms in chembl.measurements}
+    assert len(kinases) == 2
+    measurement = chembl.measurements[0]
+    assert measurement.metadata["unit"] == "-log10(nME-9)"
+    assert measurement.system.protein.metadata["uniprot"] == "ACD"
+
+
+def test_chembl_cache(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from kinoml.datasets import core
+    from kinoml.datasets.chembl import ChEMBLDatasetProvider
+
+    monkeypatch.setattr(core, "APPDIR", SimpleNamespace(user_cache_dir=str(tmp_path / "cache")))
+    monkeypatch.setattr(
+        ChEMBLDatasetProvider, "_download_to_cache_or_retrieve", classmethod(lambda cls, p: p)
+    )
+    path = _chembl_like_csv(tmp_path / "activities.csv")
+    cold = ChEMBLDatasetProvider.from_source(str(path))
+    assert len(list((tmp_path / "cache" / "ChEMBLDatasetProvider" / "providers").iterdir())) == 1
+
+    # warm loads must not parse the source file again
+    monkeypatch.setattr(ChEMBLDatasetProvider, "_from_dataframe", None)
+    warm = ChEMBLDatasetProvider.from_source(str(path))
+    assert warm.to_dataframe().equals(cold.to_dataframe())
+    assert len(warm.rejected) == 3
+
+    # a different selection of measurement types is a different cache entry
+    monkeypatch.undo()
+    monkeypatch.setattr(core, "APPDIR", SimpleNamespace(user_cache_dir=str(tmp_path / "cache")))
+    monkeypatch.setattr(
+        ChEMBLDatasetProvider, "_download_to_cache_or_retrieve", classmethod(lambda cls, p: p)
+    )
+    pic50 = ChEMBLDatasetProvider.from_source(str(path), measurement_types=("pIC50",))
+    assert len(pic50) == 2
+
+
+def test_chembl_streaming(tmp_path, monkeypatch):
+    import pandas as pd
+    from kinoml.datasets.chembl import ChEMBLDatasetProvider
+
+    monkeypatch.setattr(
+        ChEMBLDatasetProvider, "_download_to_cache_or_retrieve", classmethod(lambda cls, p: p)
+    )
+    path = _chembl_like_csv(tmp_path / "activities.csv")
+    df = pd.read_csv(path, dtype={"activities.standard_value": object})
+    df.loc[len(df)] = df.loc[0]
+    df.loc[len(df) - 1, "activities.standard_value"] = "inactive"
+    df.to_csv(path, index=False)
+
+    whole = ChEMBLDatasetProvider.from_source(str(path), use_cache=False, chunksize=None)
+    chunked = ChEMBLDatasetProvider.from_source(str(path), use_cache=False, chunksize=2)
+    assert chunked.to_dataframe().equals(whole.to_dataframe())
+    assert "non-numeric value" in set(chunked.rejected["reason"])
+
+    samples = [
+        ChEMBLDatasetProvider.from_source(str(path), sample=3, chunksize=2, random_state=seed)
+        for seed in (0, 0, 1, 2, 3)
+    ]
+    assert all(len(sample.to_dataframe()) + len(sample.rejected) <= 3 for sample in samples)
+    assert samples[0].to_dataframe().equals(samples[1].to_dataframe())
+    values = {tuple(sorted(s.to_dataframe()["Measurement"])) for s in samples}
+    assert len(values) > 1
@@ -19,3 +19,203 @@ def test_datasetprovider():
     provider = DatasetProvider(measurements=measurements, featurizers=[BaseFeaturizer()])
     assert len(provider.conditions) == 1
     assert next(iter(provider.conditions)) == conditions
+
+
+def _multi_measurements():
+    import numpy as np
+    from kinoml.core.systems import System
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.measurements import pIC50Measurement, pKdMeasurement
+    from kinoml.core.conditions import AssayConditions
+
+    conditions = AssayConditions()
+    measurements = []
+    for i in range(10):
+        system = System([MolecularComponent(name=f"c{i}")])
+        system.featurizations["last"] = np.full(3, i, dtype="float32")
+        measurement_type = pIC50Measurement if i % 2 else pKdMeasurement
+        measurements.append(measurement_type(i, conditions=conditions, system=system))
+    return measurements
+
+
+def test_multidatasetprovider_indexing():
+    import numpy as np
+    from kinoml.datasets.core import MultiDatasetProvider
+    from kinoml.datasets.tables import ConcatenatedSequence
+
+    provider = MultiDatasetProvider(_multi_measurements())
+    assert len(provider) == 10
+    assert isinstance(provider.measurements, ConcatenatedSequence)
+    first, second = provider.providers
+    assert provider.measurements[0] is first.measurements[0]
+    assert provider.measurements[5] is second.measurements[0]
+    assert provider[-1] is second.measurements[-1]
+    assert list(provider.measurements) == [*first.measurements, *second.measurements]
+    assert provider.indices_by_provider() == {
+        first.measurement_type: slice(0, 5),
+        second.measurement_type: slice(5, 10),
+    }
+    np.testing.assert_array_equal(provider.measurement_type_codes, [0] * 5 + [1] * 5)
+
+    subset = provider[3:7]
+    assert isinstance(subset, MultiDatasetProvider)
+    assert [len(p) for p in subset.providers] == [2, 2]
+    assert subset.measurements[0] is first.measurements[3]
+    assert len(provider[provider.measurement_type_codes == 1].providers) == 1
+    assert len(provider.select_types(second.measurement_type)) == 5
+
+    df = provider.to_dataframe()
+    assert df.shape == (10, 4)
+    assert df["MeasurementType"].tolist() == ["pKdMeasurement"] * 5 + ["pIC50Measurement"] * 5
+
+    columnar = provider.to_columnar()
+    assert all(p.is_columnar for p in columnar.providers)
+    assert columnar[7].values == provider[7].values
+
+
+def test_multidatasetprovider_stacked():
+    import numpy as np
+    from kinoml.datasets.core import MultiDatasetProvider
+
+    provider = MultiDatasetProvider(_multi_measurements())
+    X, y, codes = provider.to_numpy(stacked=True)
+    assert X.shape == (10, 3)
+    np.testing.assert_array_equal(X[:, 0], [0, 2, 4, 6, 8, 1, 3, 5, 7, 9])
+    np.testing.assert_array_equal(y, X[:, 0])
+    np.testing.assert_array_equal(codes, [0] * 5 + [1] * 5)
+    assert len(provider.to_numpy()) == 2
+
+    dataset = provider.to_pytorch(stacked=True)
+    assert len(dataset) == 10 and len(dataset.observation_models) == 2
+    X_i, y_i, code, conditions = dataset[7]
+    assert y_i.item() == 5 and code.item() == 1
+    assert conditions.shape == (3,)  # michaelis_constant, standard_conc, substrate_conc
+
+
+def test_multidatasetprovider_stacked_featurization():
+    import numpy as np
+    from kinoml.datasets.core import MultiDatasetProvider
+    from kinoml.features.core import BaseFeaturizer
+
+    class Doubled(BaseFeaturizer):
+        def _featurize(self, system):
+            return 2 * system.featurizations["last"]
+
+    measurements = _multi_measurements()
+    for ms in measurements:
+        ms.system.featurizations["other"] = -ms.system.featurizations["last"]
+    provider = MultiDatasetProvider(measurements)
+
+    dataset = provider.to_pytorch(stacked=True, featurization_key="other")
+    np.testing.assert_array_equal(dataset.systems[:, 0], -dataset.measurements)
+    dataset = provider.to_pytorch(stacked=True, featurizer=Doubled())
+    np.testing.assert_array_equal(dataset.systems[:, 0], 2 * dataset.measurements)
+    datasets = provider.to_pytorch(featurization_key="other")
+    np.testing.assert_array_equal(datasets[0].systems[1], [-2, -2, -2])
+
+
+def test_multidatasetprovider_mixed_batches():
+    import numpy as np
+    import torch
+    from kinoml.datasets.core import MultiDatasetProvider
+    from kinoml.core.conditions import AssayConditions
+    from kinoml.core.measurements import pIC50Measurement, pKdMeasurement
+
+    class KineticConditions(AssayConditions):
+        @property
+        def substrate_conc(self):
+            return 1e-3
+
+    measurements = _multi_measurements()
+    for ms in measurements[:4]:
+        ms.conditions = KineticConditions()
+    provider = MultiDatasetProvider(measurements)
+    dataset = provider.to_pytorch(stacked=True)
+    assert np.isnan(dataset.conditions).sum() == 3 * 10 - 4
+    np.testing.assert_allclose(dataset.conditions[[0, 1, 5, 6], -1], 1e-3)
+
+    x, y, types, conditions = next(iter(dataset.as_dataloader(batch_size=10)))
+    dG = (-x[:, :1] - 1).requires_grad_()
+    predicted = dataset.observation_model(dG, types, conditions)
+    assert predicted.shape == (10, 1)
+
+    pKd, pIC50 = pKdMeasurement.observation_model(), pIC50Measurement.observation_model()
+    expected = torch.cat(
+        [
+            pKd(dG[:5]),
+            pIC50(dG[5:7], substrate_conc=1e-3),
+            pIC50(dG[7:]),
+        ]
+    )
+    torch.testing.assert_close(predicted, expected)
+    predicted.sum().backward()
+    assert torch.isfinite(dG.grad).all()
+
+
+def test_aggregate_replicates():
+    import numpy as np
+    from kinoml.datasets.core import DatasetProvider, MultiDatasetProvider
+    from kinoml.core.systems import System
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.measurements import pIC50Measurement
+    from kinoml.core.conditions import AssayConditions
+
+    systems = [System([MolecularComponent(name=f"c{i}")]) for i in range(3)]
+    conditions = [AssayConditions(pH=7), AssayConditions(pH=8)]
+    rows = [(0, 0, 5.0), (1, 0, 6.0), (0, 1, 7.0), (2, 0, 8.0), (0, 0, 9.0), (1, 0, 4.0)]
+    measurements = [
+        pIC50Measurement(
+            value,
+            conditions=conditions[c],
+            system=systems[s],
+            errors=0.1 * i,
+            metadata={"year": 2000 + i, "source": f"doc{i}"},
+        )
+        for i, (s, c, value) in enumerate(rows)
+    ]
+    provider = DatasetProvider(measurements)
+
+    for backend in (provider, provider.to_columnar()):
+        aggregated = backend.aggregate_replicates(metadata_reducers={"year": min})
+        assert len(aggregated) == 3
+        first = aggregated.measurements[0]
+        assert first.system is systems[0]
+        np.testing.assert_array_equal(first.values, [5.0, 7.0, 9.0])
+        np.testing.assert_allclose(first.errors, [0.0, 0.2, 0.4])
+        assert first.metadata["source"] == ("doc0", "doc2", "doc4")
+        assert first.metadata["year"] == 2000 and first.metadata["replicates"] == 3
+        np.testing.assert_allclose(aggregated.measurements_as_array(), [7.0, 5.0, 8.0])
+        assert aggregated.measurements_as_array(reduce=np.max)[0] == 9.0
+
+    by_conditions = provider.aggregate_replicates(by_conditions=True)
+    assert len(by_conditions) == 4
+    assert [ms.conditions.pH for ms in by_conditions.measurements] == [7, 7, 8, 7]
+
+    multi = MultiDatasetProvider(measurements).aggregate_replicates()
+    assert len(multi) == 3
+
+
+def test_aggregate_replicates_without_conditions():
+    from kinoml.datasets.core import DatasetProvider
+    from kinoml.core.systems import System
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.measurements import pIC50Measurement
+    from kinoml.core.conditions import AssayConditions
+
+    systems = [System([MolecularComponent(name=f"c{i}")]) for i in range(3)]
+    rows = [(0, 5.0), (1, 6.0), (0, 7.0), (2, 8.0)]
+    measurements = [
+        pIC50Measurement(value, conditions=None, system=systems[s]) for s, value in rows
+    ]
+    provider = DatasetProvider(measurements)
+    for backend in (provider, provider.to_columnar()):
+        aggregated = backend.aggregate_replicates(by_conditions=True)
+        assert [len(ms.values) for ms in aggregated.measurements] == [2, 1, 1]
+        assert [ms.system for ms in aggregated.measurements] == systems
+        assert all(ms.conditions is None for ms in aggregated.measurements)
+
+    # None and actual conditions of the same system are kept apart
+    measurements[2].conditions = AssayConditions()
+    aggregated = DatasetProvider(measurements).aggregate_replicates(by_conditions=True)
+    assert [len(ms.values) for ms in aggregated.measurements] == [1, 1, 1, 1]
+    assert [ms.conditions for ms in aggregated.measurements][:3] == [None, None, AssayConditions()]
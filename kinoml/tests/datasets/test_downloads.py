@@ -0,0 +1,166 @@
+"""
+Test kinoml.datasets.downloads
+"""
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+FILES = {f"/data/file{i}.csv": bytes(range(256)) * (100 + i) for i in range(3)}
+
+
+@pytest.fixture
+def server():
+    requests, if_ranges = [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append((self.path, self.headers.get("Range")))
+            if_ranges.append(self.headers.get("If-Range"))
+            content = FILES.get(self.path)
+            if content is None:
+                self.send_error(404)
+                return
+            etag = f'"{hashlib.md5(content).hexdigest()}"'
+            match = re.match(r"bytes=(\d+)-", self.headers.get("Range") or "")
+            if self.headers.get("If-Range", etag) != etag:
+                match = None  # changed since; send the whole file
+            start = int(match.group(1)) if match else 0
+            self.send_response(206 if match else 200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(content) - start))
+            self.end_headers()
+            time.sleep(0.05)  # give concurrent clients a chance to overlap
+            self.wfile.write(content[start:])
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.requests = requests
+    httpd.if_ranges = if_ranges
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_download_and_validate(server, tmp_path):
+    from kinoml.datasets.downloads import MANIFEST, _read_manifest, download
+
+    url = server.url + "/data/file0.csv"
+    path = download(url, tmp_path)
+    assert path == tmp_path / "file0.csv"
+    assert path.read_bytes() == FILES["/data/file0.csv"]
+    assert (tmp_path / MANIFEST).is_file()
+    entry = _read_manifest(tmp_path)["file0.csv"]
+    assert entry["sha256"] == hashlib.sha256(FILES["/data/file0.csv"]).hexdigest()
+
+    assert download(url, tmp_path) == path
+    assert len(server.requests) == 1
+
+    # a corrupt copy is detected with the manifest and downloaded again
+    path.write_bytes(b"garbage")
+    download(url, tmp_path)
+    assert path.read_bytes() == FILES["/data/file0.csv"]
+    assert len(server.requests) == 2
+
+
+def _interrupted(part, url, content, size=1000):
+    import json
+
+    etag = f'"{hashlib.md5(content).hexdigest()}"'
+    part.write_bytes(content[:size])
+    part.with_name(f"{part.name}.validator").write_text(json.dumps({"url": url, "etag": etag}))
+    return etag
+
+
+def test_download_resume(server, tmp_path):
+    from kinoml.datasets.downloads import download
+
+    url = server.url + "/data/file1.csv"
+    content = FILES["/data/file1.csv"]
+    etag = _interrupted(tmp_path / "file1.csv.part", url, content)
+    path = download(url, tmp_path, sha256=hashlib.sha256(content).hexdigest())
+    assert path.read_bytes() == content
+    assert server.requests == [("/data/file1.csv", "bytes=1000-")]
+    assert server.if_ranges == [etag]
+    assert not list(tmp_path.glob("file1.csv.part*"))
+
+
+def test_download_resume_changed_source(server, tmp_path, monkeypatch):
+    from kinoml.datasets.downloads import _read_manifest, download
+
+    url = server.url + "/data/file1.csv"
+    old, new = FILES["/data/file1.csv"], bytes(reversed(range(256))) * 101
+    _interrupted(tmp_path / "file1.csv.part", url, old)
+    monkeypatch.setitem(FILES, "/data/file1.csv", new)
+    # without a sha256, spliced bytes would have become the reference digest
+    path = download(url, tmp_path)
+    assert path.read_bytes() == new
+    assert _read_manifest(tmp_path)["file1.csv"]["sha256"] == hashlib.sha256(new).hexdigest()
+    assert not list(tmp_path.glob("file1.csv.part*"))
+
+    # a leftover without a validator cannot be trusted either
+    (tmp_path / "file2.csv.part").write_bytes(old[:1000])
+    path = download(server.url + "/data/file2.csv", tmp_path)
+    assert path.read_bytes() == FILES["/data/file2.csv"]
+    assert server.requests[-1] == ("/data/file2.csv", None)
+
+
+def test_download_checksum_mismatch(server, tmp_path):
+    from kinoml.datasets.downloads import download
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        download(server.url + "/data/file2.csv", tmp_path, sha256="0" * 64)
+    assert not list(tmp_path.glob("file2.csv*"))
+
+
+def test_concurrent_downloads_and_prefetch(server, tmp_path):
+    from kinoml.datasets.downloads import download, prefetch
+
+    url = server.url + "/data/file0.csv"
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        paths = list(executor.map(lambda _: download(url, tmp_path), range(4)))
+    assert len(set(paths)) == 1
+    assert len(server.requests) == 1
+
+    urls = [server.url + path for path in FILES]
+    paths = prefetch(urls, tmp_path, max_workers=3)
+    assert [paths[url].read_bytes() for url in urls] == list(FILES.values())
+    assert len(server.requests) == 3
+
+
+def test_warm_cache_is_not_hashed(server, tmp_path, monkeypatch):
+    import os
+    from kinoml.datasets import downloads
+    from kinoml.datasets.storage import cache_key, file_hash
+
+    url = server.url + "/data/file0.csv"
+    path = downloads.download(url, tmp_path)
+    expected = file_hash(path)
+    key = cache_key(path, parameter=1)
+
+    hashed = []
+    monkeypatch.setattr(downloads, "file_hash", lambda p: hashed.append(p) or file_hash(p))
+    assert downloads.download(url, tmp_path) == path
+    assert downloads.cached_sha256(path) == expected
+    monkeypatch.setattr("kinoml.datasets.storage.file_hash", downloads.file_hash)
+    assert cache_key(path, parameter=1) == key
+    assert hashed == []
+
+    # an explicit digest, or a newer modification time, is checked against the contents
+    downloads.download(url, tmp_path, sha256=expected)
+    assert len(hashed) == 1
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert downloads.cached_sha256(path) is None
+    downloads.download(url, tmp_path)
+    assert len(hashed) == 2 and len(server.requests) == 1
+    assert downloads.cached_sha256(path) == expected
@@ -0,0 +1,90 @@
+"""
+Test kinoml.datasets.groups
+"""
+import numpy as np
+import pytest
+
+
+def _provider(n=100, columnar=True):
+    from kinoml.datasets.core import MultiDatasetProvider
+    from kinoml.core.systems import System
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.measurements import pIC50Measurement, pKdMeasurement
+    from kinoml.core.conditions import AssayConditions
+
+    system = System([MolecularComponent()])
+    conditions = AssayConditions()
+    measurements = [
+        (pIC50Measurement, pKdMeasurement)[i % 4 == 0](
+            3 + (i % 10) / 2,
+            conditions=conditions,
+            system=system,
+            metadata={"year": 2000 + i // 10},
+        )
+        for i in range(n)
+    ]
+    provider = MultiDatasetProvider(measurements)
+    if columnar:
+        provider = provider.to_columnar()
+    return provider
+
+
+def test_random_grouper():
+    from kinoml.datasets.groups import RandomGrouper
+
+    provider = _provider()
+    groups = RandomGrouper({"train": 0.8, "test": 0.2}, random_state=0).indices(provider)
+    assert [len(g) for g in groups.values()] == [80, 20]
+    assert sorted(np.concatenate(list(groups.values())).tolist()) == list(range(100))
+    again = RandomGrouper({"train": 0.8, "test": 0.2}, random_state=0).indices(provider)
+    assert (groups["test"] == again["test"]).all()
+
+
+@pytest.mark.parametrize("by", ["value", "measurement_type"])
+def test_stratified_grouper(by):
+    from kinoml.datasets.groups import StratifiedGrouper
+    from kinoml.datasets.views import measurement_column
+
+    provider = _provider()
+    grouper = StratifiedGrouper([0.6, 0.4], by=by, n_bins=5, random_state=1)
+    groups = grouper.indices(provider)
+    strata = grouper.strata(provider)
+    assert len(groups[0]) + len(groups[1]) == 100
+    for stratum in np.unique(strata):
+        members = np.flatnonzero(strata == stratum)
+        assert np.isin(members, groups[0]).sum() == round(0.6 * len(members))
+    if by == "measurement_type":
+        types = measurement_column(provider, "measurement_type")
+        assert (types[groups[1]] == "pKdMeasurement").sum() == 10
+
+
+def test_time_split_grouper():
+    from kinoml.datasets.groups import TimeSplitGrouper
+    from kinoml.datasets.views import measurement_column
+
+    provider = _provider(n=95)
+    groups = TimeSplitGrouper({"past": 0.7, "future": 0.3}).indices(provider)
+    years = measurement_column(provider, "year").astype(int)
+    assert years[groups["past"]].max() < years[groups["future"]].min()
+    assert len(groups["past"]) + len(groups["future"]) == 95
+    assert len(groups["past"]) == 60  # 66 rounded down to keep year 2006 together
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_assign(columnar):
+    from kinoml.datasets.groups import RandomGrouper
+
+    provider = _provider(columnar=columnar)
+    RandomGrouper({"train": 0.5, ("cv", 1): 0.5}, random_state=0).assign(provider)
+    split = {}
+    for sub in provider.providers:
+        for key, dataset in sub.split_by_groups().items():
+            split[key] = split.get(key, 0) + len(dataset)
+    assert split == {"train": 50, ("cv", 1): 50}
+    if columnar:
+        groups = provider.providers[0].measurements.groups
+        assert set(groups) == {"train", ("cv", 1)}
+    with pytest.raises(ValueError):
+        RandomGrouper([1.0]).assign(provider)
+    RandomGrouper([1.0]).assign(provider, overwrite=True)
+    assert {ms.group for ms in provider.measurements} == {0}
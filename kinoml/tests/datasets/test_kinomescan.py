@@ -21,6 +21,54 @@ def test_pkis2():
     assert (provider.measurements[0].values == 14.0).all()
 
 
+def test_pkis2_lazy(monkeypatch):
+    import pickle
+    from kinoml.datasets.kinomescan import pkis2
+    from kinoml.datasets.kinomescan.pkis2 import PKIS2DatasetProvider
+
+    class FakeMapper:
+        def sequence_for_name(self, name):
+            return "ACDEFGHIK"
+
+        def accession_for_name(self, name):
+            return "NP_000000.0"
+
+        def mutations_for_name(self, name):
+            return float("nan")
+
+        def start_stop_for_name(self, name):
+            return None
+
+    mapper = FakeMapper()
+    provider = PKIS2DatasetProvider.from_source(mapper=mapper)
+    assert provider.mapper is mapper
+    systems = provider.measurements.systems
+    assert len(provider) == 261_870
+    assert provider.measurements_as_array()[0] == 14.0
+    assert "259840 systems (0 created)" in repr(provider)
+    assert len(provider.systems) == 259_840
+    assert systems.n_materialized == 0
+
+    measurement = provider[1]
+    assert systems.n_materialized == 1
+    assert measurement.values[0] == provider.measurements_as_array()[1]
+    assert measurement.system.protein.metadata["mutations"] is None
+    assert provider[1].system is measurement.system
+    assert provider[0].system.ligand is measurement.system.ligand
+    assert provider[0].system.protein is not measurement.system.protein
+    assert provider.systems[1] is measurement.system
+
+    # by default, each provider builds its own mapper, with its own settings
+    built = []
+    monkeypatch.setattr(pkis2, "KINOMEScanMapper", lambda **kw: built.append(kw) or mapper)
+    offline = PKIS2DatasetProvider.from_source(mapper_kwargs={"offline": True})
+    restored = pickle.loads(pickle.dumps(offline.measurements.systems.factory))
+    assert built == []
+    assert offline[0].system.protein.metadata["accession"] == "NP_000000.0"
+    assert offline.mapper is mapper and built == [{"offline": True}]
+    assert restored.keywords["kinases"].factory.keywords["mapper"]._mapper is None
+
+
 def test_access_by_index_roundtrip():
     """
     Check notes in `kinoml.dataset.kinomescan.pkis2.PKIS2DatasetProvider.from_source()`
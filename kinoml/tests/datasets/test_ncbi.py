@@ -0,0 +1,126 @@
+"""
+Test kinoml.datasets.ncbi
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+SEQUENCES = {f"NP_{i:06d}.1": "ACDEFGHIKLMNPQRSTVWY"[i:] + "A" * i for i in range(7)}
+# records whose header does not start with the requested accession
+HEADERS = {"NP_000007.1": "ref|NP_000007.1| renamed", "NP_000008.1": "NP_000008.3 newer version"}
+RENAMED = {accession: "MKV" * 3 for accession in HEADERS}
+
+
+@pytest.fixture
+def server():
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            accessions = parse_qs(urlparse(self.path).query)["id"][0].split(",")
+            requests.append(accessions)
+            known = {**SEQUENCES, **RENAMED}
+            body = "".join(
+                f">{HEADERS.get(accession, f'{accession} protein {i}')}\n{known[accession]}\n"
+                for i, accession in enumerate(accessions)
+                if accession in known
+            )
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/efetch?db=protein&id={{}}"
+    httpd.requests = requests
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fasta_roundtrip(tmp_path):
+    from kinoml.datasets.ncbi import FastaStore, format_fasta, parse_fasta
+
+    records = [("NP_000001.1 kinase", "A" * 150), ("XP_2 other", "CDE")]
+    assert parse_fasta(format_fasta(records)) == records
+
+    store = FastaStore(tmp_path / "store.fasta")
+    store.add(records)
+    store.add(records[:1])
+    store = FastaStore(tmp_path / "store.fasta")
+    assert len(store) == 2
+    assert store.get("NP_000001.1") == store.get("NP_000001") == records[0]
+    assert "XP_2" in store and "XP_3" not in store
+
+
+def test_retriever_concurrent(server, tmp_path):
+    from kinoml.datasets.ncbi import NCBISequenceRetriever
+
+    store = tmp_path / "ncbi.fasta"
+    retriever = NCBISequenceRetriever(
+        store=store, url=server.url, batch_size=2, max_workers=3, rate_limit=100
+    )
+    accessions = sorted(SEQUENCES)
+    sequences = retriever.sequences(*accessions, accessions[0])
+    assert [str(s) for s in sequences] == [SEQUENCES[a] for a in accessions + accessions[:1]]
+    assert sequences[1].name.startswith(accessions[1])
+    assert sequences[1].metadata["accession"] == accessions[1]
+    assert sorted(a for batch in server.requests for a in batch) == accessions
+    assert max(len(batch) for batch in server.requests) == 2
+
+    # already stored: no new requests
+    retriever.fetch(*accessions[:3])
+    assert len(server.requests) == 4
+
+    with pytest.raises(LookupError):
+        retriever.fetch("NP_999999.1")
+
+
+def test_retriever_offline(server, tmp_path):
+    from kinoml.datasets.ncbi import NCBISequenceRetriever
+
+    store = tmp_path / "ncbi.fasta"
+    NCBISequenceRetriever(store=store, url=server.url).fetch(*SEQUENCES)
+    n_requests = len(server.requests)
+
+    offline = NCBISequenceRetriever(store=store, offline=True, url="http://invalid/{}")
+    records = offline.fetch("NP_000003.1", "NP_000004")
+    assert records["NP_000004"][1] == SEQUENCES["NP_000004.1"]
+    with pytest.raises(LookupError, match="offline"):
+        offline.fetch("NP_000010.1")
+    assert len(server.requests) == n_requests
+
+
+def test_retriever_maps_records_to_requested_accessions(server, tmp_path):
+    from kinoml.datasets.ncbi import NCBISequenceRetriever
+
+    store = tmp_path / "ncbi.fasta"
+    retriever = NCBISequenceRetriever(store=store, url=server.url, rate_limit=None)
+    padded = ["NP_000002.1 ", " NP_000007.1", "NP_000008.1"]
+    sequences = retriever.sequences(*padded)
+    assert server.requests == [["NP_000002.1", "NP_000007.1", "NP_000008.1"]]
+    expected = [SEQUENCES["NP_000002.1"], RENAMED["NP_000007.1"], RENAMED["NP_000008.1"]]
+    assert [str(s) for s in sequences] == expected
+    assert sequences[1].name == HEADERS["NP_000007.1"]
+    assert sequences[1].metadata["accession"] == "NP_000007.1"
+
+    # without the requested order to rely on, records are matched by unversioned accession
+    records = retriever._fetch_batch(["NP_000008.1", "NP_999999.1"])
+    assert records == ([(HEADERS["NP_000008.1"], RENAMED["NP_000008.1"])], ["NP_000008.1"])
+
+    # other versions of the same accession are found in the store file
+    offline = NCBISequenceRetriever(store=store, offline=True)
+    assert offline.fetch("NP_000008.1 ")["NP_000008.1"][0] == HEADERS["NP_000008.1"]
+
+    # the accessions records were requested with survive reopening the store
+    assert offline.fetch("NP_000007.1")["NP_000007.1"][0] == HEADERS["NP_000007.1"]
+    assert offline.store.aliases_path.read_text() == "NP_000007.1\tref|NP_000007.1|\n"
+    retriever.fetch("NP_000007.1", "NP_000002.1")
+    assert len(server.requests) == 2
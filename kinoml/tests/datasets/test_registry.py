@@ -0,0 +1,98 @@
+"""
+Test kinoml.datasets.registry
+"""
+
+
+def _measurements(n_systems=3, n_measurements=6):
+    from kinoml.core.systems import System
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.measurements import PercentageDisplacementMeasurement
+    from kinoml.core.conditions import AssayConditions
+
+    shared = MolecularComponent(name="shared")
+    systems = [System([shared, MolecularComponent(name=f"c{i}")]) for i in range(n_systems)]
+    return [
+        PercentageDisplacementMeasurement(
+            i, conditions=AssayConditions(), system=systems[(i * 2) % n_systems]
+        )
+        for i in range(n_measurements)
+    ]
+
+
+def test_registry_ids_and_index():
+    from kinoml.datasets.registry import SystemRegistry
+
+    measurements = _measurements()
+    registry = SystemRegistry.from_measurements(measurements)
+    # systems are numbered in order of first appearance
+    assert registry.measurement_systems.tolist() == [0, 1, 2, 0, 1, 2]
+    assert registry.used_systems() == [measurements[i].system for i in range(3)]
+
+    offsets, codes = registry.component_index()
+    assert offsets.tolist() == [0, 2, 4, 6]
+    assert codes.tolist() == [0, 1, 0, 2, 0, 3]
+    assert registry.summary()["components"] == {"MolecularComponent": 4}
+
+    new = _measurements(n_systems=1, n_measurements=1)
+    ids = registry.add_measurements(new + measurements[:1])
+    assert ids.tolist() == [3, 0]
+    assert len(registry) == 8
+    offsets, codes = registry.component_index()
+    assert offsets.tolist() == [0, 2, 4, 6, 8]
+    assert registry.summary()["systems"] == 4
+
+
+def test_provider_registry():
+    from kinoml.datasets.core import DatasetProvider, MultiDatasetProvider
+    from kinoml.core.measurements import pIC50Measurement
+
+    measurements = _measurements()
+    provider = DatasetProvider(measurements)
+    registry = provider.registry
+    assert provider.systems == [measurements[i].system for i in range(3)]
+    assert "3 systems (MolecularComponent=4)" in repr(provider)
+    assert provider.registry is registry
+
+    # appended measurements are registered incrementally
+    conditions = measurements[0].conditions
+    provider.measurements.append(
+        type(measurements[0])(50, conditions=conditions, system=measurements[0].system)
+    )
+    assert provider.registry is registry
+    assert len(registry) == 7
+
+    columnar = provider.to_columnar()
+    assert columnar.systems == provider.systems
+    assert [s.name for s in columnar.registry.systems_for()] == [
+        ms.system.name for ms in provider.measurements
+    ]
+
+    other = pIC50Measurement(5, conditions=conditions, system=measurements[1].system)
+    multi = MultiDatasetProvider(provider.measurements + [other])
+    assert len(multi.registry) == 8
+    assert len(multi.systems) == 3
+
+
+def test_provider_registry_replaced_in_place():
+    from kinoml.datasets.core import DatasetProvider, MultiDatasetProvider
+
+    measurements = _measurements()
+    new = _measurements(n_systems=1, n_measurements=1)[0]
+    new.system.components[1].name = "new"
+    for ms in measurements + [new]:
+        ms.system.featurizations["last"] = ms.system.components[1].name
+    provider = DatasetProvider(measurements)
+    assert provider.featurized_systems() == ["c0", "c2", "c1", "c0", "c2", "c1"]
+    multi = MultiDatasetProvider(provider.measurements)
+    multi_registry = multi.registry
+
+    provider.measurements[1] = new
+    assert provider.featurized_systems() == ["c0", "new", "c1", "c0", "c2", "c1"]
+    assert provider.registry.systems_for()[1] is new.system
+    del provider.measurements[0]
+    assert provider.featurized_systems() == ["new", "c1", "c0", "c2", "c1"]
+
+    # replacing the measurements of a provider also rebuilds the multi registry
+    multi.providers[0].measurements[0] = new
+    assert multi.registry is not multi_registry
+    assert multi.registry.systems_for()[0] is new.system
@@ -0,0 +1,127 @@
+"""
+Test kinoml.datasets.storage
+"""
+import json
+
+import pytest
+
+
+def _provider(cls=None):
+    from kinoml.datasets.core import DatasetProvider
+    from kinoml.core.systems import ProteinLigandComplex
+    from kinoml.core.proteins import AminoAcidSequence
+    from kinoml.core.ligands import SmilesLigand
+    from kinoml.core.measurements import pIC50Measurement
+    from kinoml.core.conditions import AssayConditions
+
+    kinases = [
+        AminoAcidSequence("ACDEFG", name="K1", metadata={"uniprot": "P1", "range": [1, 6]}),
+        AminoAcidSequence("MSVNSE", name="K2"),
+    ]
+    ligands = [SmilesLigand.from_smiles(smiles) for smiles in ("CCO", "CCN", "c1ccccc1")]
+    systems = [ProteinLigandComplex([k, l]) for k in kinases for l in ligands]
+    conditions = [AssayConditions(pH=7), AssayConditions(pH=6)]
+    measurements = [
+        pIC50Measurement(
+            5 + i / 10,
+            conditions=conditions[i % 2],
+            system=system,
+            group=("train", "test")[i % 2],
+            metadata={"year": 2000 + i},
+        )
+        for i, system in enumerate(systems)
+    ]
+    return (cls or DatasetProvider)(measurements)
+
+
+def test_save_load_roundtrip(tmp_path):
+    from kinoml.datasets.core import DatasetProvider
+    from kinoml.core.proteins import AminoAcidSequence
+    from kinoml.core.ligands import SmilesLigand
+
+    provider = _provider()
+    provider.save(tmp_path / "provider")
+    loaded = DatasetProvider.load(tmp_path / "provider")
+
+    assert loaded.is_columnar
+    assert loaded.to_dataframe().equals(provider.to_dataframe())
+    assert loaded.conditions == provider.conditions
+    assert loaded.split_by_groups().keys() == provider.split_by_groups().keys()
+    for original, recovered in zip(provider.measurements, loaded.measurements):
+        assert recovered.metadata == original.metadata
+        assert recovered.conditions == original.conditions
+        assert recovered.group == original.group
+    # components are shared across systems after loading, as before saving
+    assert len({id(s.protein) for s in loaded.systems}) == 2
+    kinase = loaded.measurements[0].system.protein
+    assert isinstance(kinase, AminoAcidSequence)
+    assert kinase == "ACDEFG" and kinase.name == "K1"
+    assert kinase.metadata == {"uniprot": "P1", "range": [1, 6]}
+    ligand = loaded.measurements[0].system.ligand
+    assert isinstance(ligand, SmilesLigand)
+    assert ligand.metadata["smiles"] == "CCO"
+
+    with pytest.raises(FileExistsError):
+        provider.save(tmp_path / "provider")
+    provider.save(tmp_path / "provider", overwrite=True)
+
+
+def test_save_load_multi(tmp_path):
+    from kinoml.datasets.core import DatasetProvider, MultiDatasetProvider
+    from kinoml.core.measurements import pKdMeasurement
+
+    single = _provider()
+    extra = pKdMeasurement(
+        7, conditions=single.measurements[0].conditions, system=single.measurements[0].system
+    )
+    provider = MultiDatasetProvider(list(single.measurements) + [extra])
+    provider.save(tmp_path / "multi")
+    loaded = DatasetProvider.load(tmp_path / "multi")
+
+    assert type(loaded) is MultiDatasetProvider
+    assert [p.measurement_type for p in loaded.providers] == [
+        p.measurement_type for p in provider.providers
+    ]
+    assert loaded.to_dataframe().equals(provider.to_dataframe())
+
+    from kinoml.datasets.chembl import ChEMBLDatasetProvider
+
+    with pytest.raises(TypeError):  # saved class is not a ChEMBLDatasetProvider
+        ChEMBLDatasetProvider.load(tmp_path / "multi")
+
+
+def test_load_rejects_other_versions(tmp_path):
+    from kinoml.datasets.core import DatasetProvider
+    from kinoml.datasets.storage import MANIFEST
+
+    _provider().save(tmp_path / "provider")
+    manifest_path = tmp_path / "provider" / MANIFEST
+    manifest = json.loads(manifest_path.read_text())
+    manifest["version"] += 1
+    manifest_path.write_text(json.dumps(manifest))
+    with pytest.raises(ValueError):
+        DatasetProvider.load(tmp_path / "provider")
+
+
+def test_cache_or_build_tracks_parser_version(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from kinoml.datasets import core
+    from kinoml.datasets.core import DatasetProvider
+
+    monkeypatch.setattr(core, "APPDIR", SimpleNamespace(user_cache_dir=str(tmp_path / "cache")))
+    source = tmp_path / "source.csv"
+    source.write_text("unchanged contents")
+    builds = []
+
+    def build():
+        builds.append(1)
+        return _provider()
+
+    for _ in range(2):
+        provider = DatasetProvider._from_cache_or_build(source, build, option=1)
+    assert len(builds) == 1 and len(provider) == 6
+
+    # same file and parameters, but the parser changed: do not serve the old copy
+    monkeypatch.setattr(DatasetProvider, "PARSER_VERSION", DatasetProvider.PARSER_VERSION + 1)
+    DatasetProvider._from_cache_or_build(source, build, option=1)
+    assert len(builds) == 2
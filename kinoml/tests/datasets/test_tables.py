@@ -0,0 +1,77 @@
+"""
+Test kinoml.datasets.tables
+"""
+import numpy as np
+import pytest
+
+
+def _measurements():
+    from kinoml.core.systems import System
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.measurements import PercentageDisplacementMeasurement
+    from kinoml.core.conditions import AssayConditions
+
+    conditions = AssayConditions(pH=7)
+    systems = [System([MolecularComponent(name=f"c{i}")]) for i in range(3)]
+    return [
+        PercentageDisplacementMeasurement(
+            value, conditions=conditions, system=systems[i % 3], group=i % 2, metadata={"i": i}
+        )
+        for i, value in enumerate([10, 20, 30, 40, 50])
+    ]
+
+
+def test_measurement_table_roundtrip():
+    from kinoml.datasets.tables import MeasurementTable
+
+    measurements = _measurements()
+    table = MeasurementTable.from_measurements(measurements)
+    assert len(table) == 5
+    assert len(table.systems) == 3
+    assert len(table.conditions) == 1
+    assert table.values.tolist() == [10, 20, 30, 40, 50]
+    for original, recovered in zip(measurements, table):
+        assert type(recovered) is type(original)
+        assert recovered.system is original.system
+        assert recovered.conditions == original.conditions
+        assert recovered.group == original.group
+        assert recovered.metadata == original.metadata
+        assert (recovered.values == original.values).all()
+
+    subset = table[np.array([True, False, True, False, False])]
+    assert isinstance(subset, MeasurementTable)
+    assert subset.values.tolist() == [10, 30]
+    assert subset.used_system_index.tolist() == [0, 2]
+
+
+def test_measurement_table_rejects_replicates():
+    from kinoml.datasets.tables import MeasurementTable
+    from kinoml.core.measurements import BaseMeasurement
+    from kinoml.core.systems import System
+    from kinoml.core.components import MolecularComponent
+
+    measurement = BaseMeasurement(1, conditions=None, system=System([MolecularComponent()]))
+    measurement._values = np.array([1.0, 2.0])
+    with pytest.raises(ValueError):
+        MeasurementTable.from_measurements([measurement])
+
+
+def test_columnar_datasetprovider():
+    from kinoml.datasets.core import DatasetProvider
+
+    provider = DatasetProvider(_measurements())
+    columnar = provider.to_columnar()
+    assert columnar.is_columnar and not provider.is_columnar
+    assert len(columnar) == len(provider)
+    assert columnar.measurement_type is provider.measurement_type
+    assert columnar.conditions == provider.conditions
+    assert set(columnar.systems) == set(provider.systems)
+    assert (columnar.measurements_as_array() == provider.measurements_as_array()).all()
+    assert columnar.to_dataframe().equals(provider.to_dataframe())
+
+    groups = columnar.split_by_groups()
+    assert sorted(groups) == [0, 1]
+    assert groups[0].measurements_as_array().tolist() == [10, 30, 50]
+    assert groups[1].is_columnar
+    assert isinstance(columnar[0], provider.measurement_type)
+    assert len(columnar[1:3]) == 2
@@ -0,0 +1,139 @@
+"""
+Test kinoml.datasets.torch_datasets
+"""
+import numpy as np
+
+
+def test_stacked_torch_dataset(tmp_path):
+    import torch
+    from kinoml.datasets.torch_datasets import StackedTorchDataset
+
+    X = np.arange(40, dtype="float32").reshape(10, 4)
+    y = np.arange(10, dtype="float32")
+    dataset = StackedTorchDataset(X, y, device="cpu")
+    assert len(dataset) == 10 and dataset.estimate_input_size() == (4,)
+
+    # tensors share memory with the arrays
+    X[0, 0] = -1
+    assert dataset[0][0][0].item() == -1
+    X_batch, y_batch = dataset[torch.tensor([3, 1])]
+    assert X_batch.tolist() == X[[3, 1]].tolist() and y_batch.tolist() == [3, 1]
+
+    memmap = np.lib.format.open_memmap(
+        tmp_path / "X.npy", mode="w+", dtype="float32", shape=X.shape
+    )
+    memmap[:] = X
+    dataset = StackedTorchDataset(memmap, y, device="cpu")
+    assert dataset.systems.data_ptr() == memmap.ctypes.data
+
+    batches = list(dataset.as_dataloader(batch_size=4))
+    assert [len(y) for _, y in batches] == [4, 4, 2]
+    assert torch.equal(torch.cat([X for X, _ in batches]), torch.from_numpy(X))
+
+    loader = dataset.as_dataloader(batch_size=4, shuffle=True, drop_last=True)
+    assert len(loader) == 2
+    seen = torch.cat([y for _, y in loader])
+    assert len(seen) == 8 and len(set(seen.tolist())) == 8
+
+
+def test_to_pytorch_stacked():
+    from kinoml.core.systems import System
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.measurements import pIC50Measurement
+    from kinoml.core.conditions import AssayConditions
+    from kinoml.datasets.core import DatasetProvider
+    from kinoml.datasets.torch_datasets import StackedTorchDataset
+
+    measurements = []
+    for i in range(6):
+        system = System([MolecularComponent()])
+        system.featurizations["last"] = np.full(3, i)
+        measurements.append(pIC50Measurement(i, conditions=AssayConditions(), system=system))
+    dataset = DatasetProvider(measurements).to_pytorch(stacked=True)
+    assert isinstance(dataset, StackedTorchDataset)
+    X, y = next(iter(dataset.as_dataloader(batch_size=6)))
+    assert X.shape == (6, 3) and y.tolist() == list(range(6))
+
+
+def _featurized_provider(n=10):
+    from kinoml.core.systems import System
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.measurements import pIC50Measurement
+    from kinoml.core.conditions import AssayConditions
+    from kinoml.datasets.core import DatasetProvider
+
+    measurements = []
+    for i in range(n):
+        system = System([MolecularComponent()])
+        system.featurizations["last"] = np.full(3, i)
+        measurements.append(
+            pIC50Measurement(i, conditions=AssayConditions(), system=system, strict=False)
+        )
+    return DatasetProvider(measurements)
+
+
+def test_mmap_xy_torch_dataset(tmp_path):
+    import pickle
+    import pytest
+    import torch
+    from kinoml.datasets.torch_datasets import MmapXyTorchDataset
+
+    provider = _featurized_provider()
+    indices = {"train": np.arange(7), "test": np.arange(7, 10)}
+    for shard_size in (None, 4):
+        path = provider.to_npy(tmp_path / f"xy-{shard_size}", indices, shard_size=shard_size)
+        dataset = MmapXyTorchDataset(path)
+        assert len(dataset) == 10 and dataset.input_size() == 3
+        assert isinstance(dataset._X[0], np.memmap)
+        assert dataset.indices["test"].tolist() == [7, 8, 9]
+        X, y = dataset[5]
+        assert X.tolist() == [5, 5, 5] and y.item() == 5
+        X, y = dataset[[9, 0, 4]]
+        assert X[:, 0].tolist() == y.tolist() == [9, 0, 4]
+
+        # memory maps are reopened, not pickled
+        assert len(pickle.dumps(dataset)) < 1000
+        assert pickle.loads(pickle.dumps(dataset))[-1][1].item() == 9
+    assert len(list(tmp_path.glob("xy-4/X.*.npy"))) == 3
+
+    loader = torch.utils.data.DataLoader(dataset, batch_size=4, num_workers=2)
+    assert sorted(torch.cat([y for _, y in loader]).tolist()) == list(range(10))
+
+    X = np.arange(12, dtype="float32").reshape(4, 3)
+    np.savez(tmp_path / "xy.npz", X=X, y=X[:, 0], idx_train=[0, 1])
+    dataset = MmapXyTorchDataset(tmp_path / "xy.npz")
+    assert dataset[3][0].tolist() == [9, 10, 11]
+    assert dataset.indices["train"].tolist() == [0, 1]
+    np.savez_compressed(tmp_path / "xy-compressed.npz", X=X, y=X[:, 0])
+    with pytest.raises(ValueError, match="compressed"):
+        MmapXyTorchDataset(tmp_path / "xy-compressed.npz")
+
+
+def test_sharded_iterable_torch_dataset(tmp_path):
+    import torch
+    from kinoml.datasets.torch_datasets import ShardedIterableTorchDataset
+
+    provider = _featurized_provider(n=50)
+    indices = {"train": np.arange(0, 50, 2)}
+    path = provider.to_npy(tmp_path / "shards", indices, shard_size=8)
+
+    dataset = ShardedIterableTorchDataset(path)
+    assert len(dataset) == 50
+    assert [y.item() for _, y in dataset] == list(range(50))
+
+    dataset = ShardedIterableTorchDataset(path, shuffle_buffer=10, seed=1)
+    order = [y.item() for _, y in dataset]
+    assert sorted(order) == list(range(50)) and order != list(range(50))
+    assert [y.item() for _, y in dataset] == order
+    dataset.set_epoch(1)
+    assert [y.item() for _, y in dataset] != order
+
+    train = ShardedIterableTorchDataset(path, shuffle_buffer=4, split="train")
+    assert len(train) == 25
+    assert sorted(y.item() for _, y in train) == list(range(0, 50, 2))
+
+    loader = torch.utils.data.DataLoader(dataset, batch_size=5, num_workers=2)
+    seen = torch.cat([y for _, y in loader]).tolist()
+    assert sorted(seen) == list(range(50))
+    X, y = next(iter(loader))
+    assert X.shape == (5, 3) and torch.equal(X[:, 0], y)
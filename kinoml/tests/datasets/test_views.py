@@ -0,0 +1,80 @@
+"""
+Test kinoml.datasets.views
+"""
+import numpy as np
+import pytest
+
+
+def _provider(columnar=False):
+    from kinoml.datasets.core import MultiDatasetProvider
+    from kinoml.core.systems import ProteinLigandComplex
+    from kinoml.core.proteins import AminoAcidSequence
+    from kinoml.core.ligands import SmilesLigand
+    from kinoml.core.measurements import pIC50Measurement, pKdMeasurement
+    from kinoml.core.conditions import AssayConditions
+
+    kinases = [AminoAcidSequence("ACDEFG", name="K1"), AminoAcidSequence("MSVNSE", name="K2")]
+    ligands = [SmilesLigand.from_smiles(smiles) for smiles in ("CCO", "CCN")]
+    systems = [ProteinLigandComplex([k, l]) for k in kinases for l in ligands]
+    conditions = AssayConditions()
+    measurements = []
+    for i in range(20):
+        measurement_type = (pIC50Measurement, pKdMeasurement)[i % 2]
+        measurements.append(
+            measurement_type(
+                4 + i / 4,
+                conditions=conditions,
+                system=systems[i % 4],
+                metadata={"year": 2000 + i, "confidence": 9 if i < 10 else 7},
+            )
+        )
+    provider = MultiDatasetProvider(measurements)
+    if columnar:
+        provider = provider.to_columnar()
+    return provider
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_query(columnar):
+    provider = _provider(columnar)
+    measurements = provider.measurements
+    expected = [
+        i
+        for i, ms in enumerate(measurements)
+        if ms.system.protein.name == "K1"
+        and ms.metadata["year"] >= 2005
+        and ms.metadata["confidence"] in (7, 8)
+    ]
+    view = provider.query(protein="K1", year=(2005, None), confidence=[7, 8])
+    assert view.indices.tolist() == expected
+    assert [ms.values[0] for ms in view] == [measurements[i].values[0] for i in expected]
+
+    # views compose
+    narrower = view.query(measurement_type="pKdMeasurement", value=(None, 8))
+    assert all(type(ms).__name__ == "pKdMeasurement" for ms in narrower)
+    assert (narrower.measurements_as_array() <= 8).all()
+    assert set(narrower.indices) < set(view.indices)
+    assert len(provider.query(ligand="CCN", protein="K2")) == 5
+    assert len(provider.query(ligand="missing")) == 0
+
+    subset = narrower.to_provider()
+    assert type(subset) is type(provider)
+    assert len(subset.measurements) == len(narrower)
+    assert np.allclose(
+        np.concatenate([p.measurements_as_array() for p in subset.providers]),
+        narrower.measurements_as_array(),
+    )
+
+
+def test_query_single_provider_view():
+    from kinoml.datasets.core import DatasetProvider
+
+    provider = _provider().providers[0].to_columnar()
+    view = provider.view()[::2]
+    assert len(view) == 5
+    assert view.query(year=(2000, 2008)).indices.tolist() == [0, 2, 4]
+    subset = view.query(year=(2000, 2008)).to_provider()
+    assert isinstance(subset, DatasetProvider) and subset.is_columnar
+    assert subset.measurements_as_array().tolist() == pytest.approx([4, 5, 6])
+    with pytest.raises(TypeError):
+        provider.query(protein=("A", "B"))
@@ -12,6 +12,8 @@ from kinoml.features.ligand import (
     OneHotSMILESFeaturizer,
     GraphLigandFeaturizer,
     SmilesToLigandFeaturizer,
+    RDKitConformerFeaturizer,
+    RDKitDescriptorFeaturizer,
 )
 
 
@@ -143,3 +145,62 @@ def test_ligand_GraphLigandFeaturizer_RDKit(smiles, solution):
     graph = system.featurizations[featurizer.name]
     assert (graph[0] == solution[0]).all()  # connectivity
     assert (graph[1] == solution[1]).all()  # features
+
+
+def test_ligand_RDKitConformerFeaturizer_cache(tmp_path):
+    ligand = RDKitLigand.from_smiles("CCO")
+    system = System([ligand])
+    featurizer = RDKitConformerFeaturizer(
+        n_conformers=3, minimize="MMFF", cache_directory=tmp_path
+    )
+    featurizer.featurize(system)
+    conformers = system.featurizations[featurizer.name]
+    molecule = conformers.to_rdkit()
+    assert isinstance(conformers, RDKitLigand)
+    assert 1 <= molecule.GetNumConformers() <= 3
+    assert len(conformers.metadata["conformer_energies"]) == molecule.GetNumConformers()
+
+    path = featurizer.cache_path(ligand.to_rdkit())
+    assert path.is_file()
+
+    # a second featurizer with the same parameters reads the cached ensemble
+    cached = RDKitConformerFeaturizer(
+        n_conformers=3, minimize="MMFF", cache_directory=tmp_path
+    ).generate_conformers(ligand.to_rdkit())
+    assert cached.GetNumConformers() == molecule.GetNumConformers()
+    assert np.allclose(
+        cached.GetConformer(0).GetPositions(), molecule.GetConformer(0).GetPositions(), atol=1e-3
+    )
+
+    # different parameters, different cache entry
+    other = RDKitConformerFeaturizer(n_conformers=2, cache_directory=tmp_path)
+    assert other.cache_path(ligand.to_rdkit()) != path
+
+
+def test_ligand_RDKitDescriptorFeaturizer():
+    ethanol, benzene = RDKitLigand.from_smiles("CCO"), RDKitLigand.from_smiles("c1ccccc1")
+    broken = SmilesLigand.from_smiles("C1CC")  # unclosed ring, RDKit cannot parse it
+    systems = [System([ethanol]), System([benzene]), System([ethanol]), System([broken])]
+    featurizer = RDKitDescriptorFeaturizer(
+        descriptors=RDKitDescriptorFeaturizer.PHYSCHEM_DESCRIPTORS, fill_value=-1
+    )
+    # same positional arguments as BaseFeaturizer.featurize_many()
+    values = featurizer.featurize_many(systems, False, processes=1)
+    assert featurizer.name not in systems[1].featurizations
+    with pytest.raises(TypeError):
+        featurizer.featurize_many(systems, True, 2)
+    values = featurizer.featurize_many(systems)
+    mask = featurizer.masks_for(systems)
+
+    assert values.shape == mask.shape == (4, 5)
+    assert values.dtype == np.float32
+    assert (values[0] == values[2]).all()
+    assert values[0, 0] == pytest.approx(46.069, abs=1e-2)  # MolWt, first column
+    assert values[1, 2] == 0  # TPSA of benzene
+    assert not mask[:3].any()
+    assert mask[3].all() and (values[3] == -1).all()
+    assert (systems[1].featurizations[featurizer.name] == values[1]).all()
+    assert len(featurizer._cache) == 3
+
+    with pytest.raises(ValueError):
+        RDKitDescriptorFeaturizer(descriptors=["NotADescriptor"])
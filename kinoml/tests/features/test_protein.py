@@ -0,0 +1,131 @@
+"""
+Test protein featurizers of `kinoml.features`
+"""
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from kinoml.core.ligands import SmilesLigand
+from kinoml.core.proteins import AminoAcidSequence
+from kinoml.core.systems import ProteinLigandComplex
+from kinoml.features.core import BaseOneHotEncodingFeaturizer
+from kinoml.features.protein import (
+    AminoAcidCompositionFeaturizer,
+    IndexEncodedSequenceFeaturizer,
+    KmerSpectrumFeaturizer,
+)
+
+
+def _systems(*sequences):
+    ligand = SmilesLigand.from_smiles("CCO")
+    return [ProteinLigandComplex([AminoAcidSequence(s), ligand]) for s in sequences]
+
+
+def test_AminoAcidCompositionFeaturizer():
+    sequence = "MSVNSEKSSSAAYYW"
+    system = _systems(sequence)[0]
+    featurizer = AminoAcidCompositionFeaturizer()
+    featurizer.featurize(system)
+    composition = system.featurizations[featurizer.name]
+    counter = Counter(sequence)
+    expected = [counter[aa] for aa in sorted(AminoAcidSequence.ALPHABET)]
+    assert (composition == expected).all()
+
+
+def test_AminoAcidCompositionFeaturizer_many():
+    systems = _systems("ACDA", "WWY", "ACDA")
+    featurizer = AminoAcidCompositionFeaturizer(normalize=True, dipeptides=True)
+    features = featurizer.featurize_many(systems)
+    assert features.shape == (3, 20 + 400)
+    assert len(featurizer._cache) == 2
+    assert np.allclose(features[0], features[2])
+    assert np.isclose(features[0, :20].sum(), 1) and np.isclose(features[0, 20:].sum(), 1)
+    # A=0, C=1, D=2 in alphabetical order; dipeptides "AC", "CD", "DA"
+    assert np.isclose(features[0, 0], 0.5)
+    assert np.isclose(features[0, 20 + 0 * 20 + 1], 1 / 3)
+    assert np.isclose(features[0, 20 + 2 * 20 + 0], 1 / 3)
+    # dipeptides must not span two different sequences ("A" + "W" -> "AW")
+    assert features[0, 20 + 0 * 20 + 18] == 0
+    assert (systems[1].featurizations[featurizer.name] == features[1]).all()
+
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_IndexEncodedSequenceFeaturizer(packed):
+    systems = _systems("ACDA", "WWY", "ACDA")
+    featurizer = IndexEncodedSequenceFeaturizer(packed=packed)
+    ids = featurizer.featurize_many(systems)
+    assert ids.tolist() == [0, 1, 0]
+    assert len(featurizer.encodings) == 2
+    assert systems[1].featurizations[featurizer.name] == 1
+
+    dense = featurizer.materialize(ids)
+    assert dense.shape == (3, 20, 4)
+    for system, matrix in zip(systems, dense):
+        sequence = system.protein.sequence
+        expected = BaseOneHotEncodingFeaturizer.one_hot_encode(
+            sequence, {c: i for i, c in enumerate(AminoAcidSequence.ALPHABET)}
+        )
+        assert (matrix[:, : len(sequence)] == expected).all()
+        assert (matrix[:, len(sequence) :] == 0).all()
+
+
+def test_IndexEncodedSequenceFeaturizer_collate():
+    torch = pytest.importorskip("torch")
+    systems = _systems("ACDA", "WY", "MSVNS")
+    collated = []
+    for packed in (False, True):
+        featurizer = IndexEncodedSequenceFeaturizer(packed=packed)
+        ids = featurizer.featurize_many(systems)
+        batch = [(id_, float(y)) for id_, y in zip(ids, range(3))]
+        X, y = featurizer.collate(batch)
+        assert isinstance(X, torch.Tensor) and X.dtype == torch.float32
+        # padded to the longest sequence in the batch
+        assert X.shape == (3, 20, 5)
+        assert y.tolist() == [0.0, 1.0, 2.0]
+        for system, matrix in zip(systems, X.numpy()):
+            sequence = system.protein.sequence
+            expected = BaseOneHotEncodingFeaturizer.one_hot_encode(
+                sequence, {c: i for i, c in enumerate(AminoAcidSequence.ALPHABET)}
+            )
+            assert (matrix[:, : len(sequence)] == expected).all()
+            assert (matrix[:, len(sequence) :] == 0).all()
+        collated.append(X)
+    # bit-packed encodings materialize to the same tensors
+    assert torch.equal(*collated)
+
+
+def test_KmerSpectrumFeaturizer():
+    systems = _systems("ACDAC", "WWY", "ACDAC")
+    featurizer = KmerSpectrumFeaturizer(k=(1, 2), gaps=(1,))
+    spectra = featurizer.featurize_many(systems)
+    assert spectra.shape == (3, 20 + 400 + 400)
+    assert len(featurizer._cache) == 2
+    dense = spectra.toarray()
+    assert (dense[0] == dense[2]).all()
+    # A=0, C=1, D=2 -> 1-mers A:2, C:2, D:1
+    assert dense[0, :3].tolist() == [2, 2, 1]
+    # dimers AC (x2), CD, DA
+    assert dense[0, 20 + 0 * 20 + 1] == 2
+    assert dense[0, 20:420].sum() == 4
+    # gap=1 pairs: A.D, C.A, D.C
+    assert dense[0, 420 + 0 * 20 + 2] == 1
+    assert dense[0, 420:].sum() == 3
+
+    hashed = KmerSpectrumFeaturizer(k=(1, 2, 3), n_features=64).featurize_many(systems)
+    assert hashed.shape == (3, 64)
+    assert hashed[0].sum() == 5 + 4 + 3
+
+
+def test_KmerSpectrumFeaturizer_hashing():
+    featurizer = KmerSpectrumFeaturizer(k=(1, 2, 3), n_features=64)
+    # codes sharing their low bits must not share their column
+    strided = featurizer._hash(np.arange(0, 64 * 256, 64))
+    assert len(np.unique(strided)) > 48
+    assert np.bincount(strided, minlength=64).max() <= 2 * 256 / 64
+    # all k-mer columns spread evenly across the hashed columns
+    loads = np.bincount(featurizer._hash(np.arange(featurizer._offsets[-1])), minlength=64)
+    assert loads.min() > 0.8 * loads.mean() and loads.max() < 1.2 * loads.mean()
+
+    with pytest.raises(ValueError, match="power of two"):
+        KmerSpectrumFeaturizer(n_features=100)
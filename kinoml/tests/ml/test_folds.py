@@ -0,0 +1,65 @@
+"""
+Test kinoml.ml.folds
+"""
+import numpy as np
+
+
+def test_fold_plan_is_deterministic():
+    from kinoml.ml.folds import FoldPlan
+
+    indices = np.arange(100, 150)
+    plan = FoldPlan.compute(indices, n_splits=5, shuffle=True, seed=3)
+    assert len(plan) == 5
+    for train, val, test in plan:
+        assert len(train) + len(val) + len(test) == 50
+        np.testing.assert_array_equal(np.sort(np.concatenate([train, val, test])), indices)
+    np.testing.assert_array_equal(
+        np.sort(np.concatenate([test for _, _, test in plan])), indices
+    )
+
+    again = FoldPlan.compute(indices, n_splits=5, shuffle=True, seed=3)
+    other = FoldPlan.compute(indices, n_splits=5, shuffle=True, seed=4)
+    for a, b, c in zip(plan, again, other):
+        for split_a, split_b in zip(a, b):
+            np.testing.assert_array_equal(split_a, split_b)
+    assert any(not np.array_equal(a[0], c[0]) for a, c in zip(plan, other))
+
+    train, val, test = FoldPlan.compute(10, n_splits=2, with_validation=False)[0]
+    assert len(val) == 0 and val.dtype == np.int64
+
+
+def test_fold_plan_persistence(tmp_path):
+    from kinoml.ml.folds import FoldPlan
+
+    path = tmp_path / "folds.npz"
+    plan = FoldPlan.load_or_compute(path, 40, n_splits=4, shuffle=True, seed=1)
+    assert path.is_file()
+    loaded = FoldPlan.load(path)
+    assert loaded.parameters == plan.parameters
+    for a, b in zip(plan, loaded):
+        for split_a, split_b in zip(a, b):
+            np.testing.assert_array_equal(split_a, split_b)
+
+    mtime = path.stat().st_mtime_ns
+    FoldPlan.load_or_compute(path, 40, n_splits=4, shuffle=True, seed=1)
+    assert path.stat().st_mtime_ns == mtime
+
+    # different parameters or indices invalidate the saved plan
+    assert FoldPlan.load_or_compute(path, 40, n_splits=4, shuffle=True, seed=2).seed == 2
+    fold = FoldPlan.load_or_compute(path, 30, n_splits=4, shuffle=True, seed=2)[0]
+    assert sum(len(indices) for indices in fold) == 30
+    assert FoldPlan.load(path).parameters["seed"] == 2
+
+
+def test_fold_plan_filename():
+    from kinoml.ml.folds import FoldPlan
+
+    names = {
+        FoldPlan.filename("folds_pKd", n_splits=k, with_validation=v, shuffle=s, seed=seed)
+        for k in (3, 5)
+        for v in (True, False)
+        for s in (True, False)
+        for seed in (0, 1)
+    }
+    assert len(names) == 16
+    assert FoldPlan.filename("folds_pKd") == "folds_pKd_k5_val1_shuffle0_seed0.npz"
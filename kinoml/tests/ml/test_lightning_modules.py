@@ -0,0 +1,73 @@
+"""
+Test kinoml.ml.lightning_modules
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("pytorch_lightning")
+
+
+def _datamodule(n=4096):
+    from kinoml.core.measurements import pKdMeasurement
+    from kinoml.datasets.torch_datasets import PrefeaturizedTorchDataset
+    from kinoml.ml.lightning_modules import MultiDataModule
+
+    rng = np.random.default_rng(0)
+    X = rng.random((n, 4), dtype="float32")
+    # X is large enough for share_arrays() to memory-map it
+    dataset = PrefeaturizedTorchDataset(X, X.sum(axis=1))
+    empty = np.array([], dtype="int64")
+    dataset.indices = {"train": np.arange(n), "val": empty, "test": empty}
+    return MultiDataModule(
+        [dataset], observation_models=[pKdMeasurement.observation_model()], batch_size=256
+    )
+
+
+def test_cross_validate_trainer_parallel(tmp_path):
+    from torch.utils.data import Subset
+    from kinoml.ml.lightning_modules import CrossValidateTrainer, ObservationModelModule
+    from kinoml.ml.parallel import SharedMemmap
+
+    torch.manual_seed(0)
+    nn_model = torch.nn.Linear(4, 1)
+    model = ObservationModelModule(
+        nn_model,
+        optimizer=torch.optim.SGD(nn_model.parameters(), lr=0.01),
+        loss_function=torch.nn.functional.mse_loss,
+        validate=False,
+    )
+    initial = {k: v.clone() for k, v in model.state_dict().items()}
+    datamodule = _datamodule()
+    trainer = CrossValidateTrainer(
+        nfolds=2,
+        with_validation=False,
+        n_jobs=2,
+        threads_per_job=1,
+        max_epochs=2,
+        default_root_dir=str(tmp_path),
+        logger=False,
+    )
+    trainer.fit(model, datamodule)
+
+    assert isinstance(datamodule.datasets[0].systems, SharedMemmap)
+    assert len(trainer._dataloaders["train"]) == 2
+    for loader in trainer._dataloaders["train"]:
+        assert isinstance(loader.dataset, Subset)
+        assert loader.dataset.dataset is datamodule.datasets[0]
+
+    assert len(trainer._models) == len(trainer._trainers) == 2
+    for fold_index, (fold_model, fold_trainer) in enumerate(
+        zip(trainer._models, trainer._trainers)
+    ):
+        state = fold_model.state_dict()
+        assert any(not torch.equal(state[k], initial[k]) for k in initial)
+        checkpoint = fold_trainer.checkpoint_callback
+        assert checkpoint.best_model_path.startswith(str(tmp_path / f"fold_{fold_index}"))
+        assert Path(checkpoint.best_model_path).is_file()
+    # folds train on different data, so they end up with different weights
+    first, second = (m.state_dict() for m in trainer._models)
+    assert any(not torch.equal(first[k], second[k]) for k in first)
+    trainer.clear()
@@ -0,0 +1,95 @@
+"""
+Test kinoml.ml.parallel
+"""
+
+
+def _inspect(dataset):
+    import numpy as np
+    import torch
+
+    systems = dataset.systems
+    total = float(np.sum(systems, dtype="float64"))
+    return type(systems).__name__, systems.filename, total, torch.get_num_threads()
+
+
+def test_process_pool_shares_arrays(tmp_path):
+    import numpy as np
+    from kinoml.datasets.torch_datasets import PrefeaturizedTorchDataset
+    from kinoml.ml.parallel import process_pool, share_arrays
+
+    X = np.random.default_rng(0).random((1000, 32), dtype="float32")
+    y = np.arange(10, dtype="float32")
+    dataset = share_arrays(PrefeaturizedTorchDataset(X, np.resize(y, 1000)), tmp_path)
+    assert isinstance(dataset.systems, np.memmap)
+    assert not dataset.systems.flags.writeable
+    np.testing.assert_array_equal(dataset.systems, X)
+
+    with process_pool(2, threads_per_job=1) as pool:
+        results = list(pool.map(_inspect, [dataset, dataset]))
+    for name, filename, total, threads in results:
+        assert name == "SharedMemmap"
+        assert filename == dataset.systems.filename
+        assert np.isclose(total, X.sum(dtype="float64"))
+        assert threads == 1
+
+
+def test_share_arrays_from_provider(tmp_path):
+    import pickle
+    import numpy as np
+    from kinoml.core.components import MolecularComponent
+    from kinoml.core.conditions import AssayConditions
+    from kinoml.core.measurements import PercentageDisplacementMeasurement
+    from kinoml.core.systems import System
+    from kinoml.datasets.core import DatasetProvider
+    from kinoml.ml.parallel import SharedMemmap, process_pool, share_arrays
+
+    rng = np.random.default_rng(0)
+    measurements = []
+    for i in range(1000):
+        system = System([MolecularComponent(name=f"c{i}")])
+        system.featurizations["last"] = rng.random(32, dtype="float32")
+        measurements.append(
+            PercentageDisplacementMeasurement(i % 100, conditions=AssayConditions(), system=system)
+        )
+    provider = DatasetProvider(measurements)
+    X = np.stack(provider.featurized_systems())
+    dataset = provider.to_pytorch()
+    assert isinstance(dataset.systems, list)
+
+    share_arrays(dataset, tmp_path)
+    assert isinstance(dataset.systems, SharedMemmap)
+    np.testing.assert_array_equal(dataset.systems, X)
+    np.testing.assert_array_equal(dataset[3][0].numpy(), X[3])
+    # the feature matrix travels as a file reference
+    assert len(pickle.dumps(dataset.systems)) < 1000
+
+    with process_pool(2, threads_per_job=1) as pool:
+        results = list(pool.map(_inspect, [dataset, dataset]))
+    for name, filename, total, _ in results:
+        assert name == "SharedMemmap"
+        assert filename == dataset.systems.filename
+        assert np.isclose(total, X.sum(dtype="float64"))
+
+
+def test_shared_memmap_pickles_by_reference(tmp_path):
+    import pickle
+    from multiprocessing.reduction import ForkingPickler
+    import numpy as np
+    from kinoml.ml.parallel import SharedMemmap
+
+    reducers = dict(ForkingPickler._extra_reducers)
+    path = tmp_path / "X.npy"
+    X = np.arange(100_000, dtype="float32").reshape(1000, 100)
+    np.save(path, X)
+    shared = SharedMemmap.open(path)
+    payload = pickle.dumps(shared)
+    assert len(payload) < 1000
+    restored = pickle.loads(payload)
+    assert isinstance(restored, SharedMemmap) and not restored.flags.writeable
+    np.testing.assert_array_equal(restored, X)
+
+    # slices cannot be reopened from the file, so they are copied
+    view = pickle.loads(pickle.dumps(shared[10:20]))
+    assert type(view) is np.ndarray
+    np.testing.assert_array_equal(view, X[10:20])
+    assert ForkingPickler._extra_reducers == reducers
@@ -0,0 +1,82 @@
+"""
+Test kinoml.ml.torch_loops
+"""
+import numpy as np
+import torch
+
+
+def _loaders():
+    from kinoml.datasets.torch_datasets import StackedTorchDataset
+
+    rng = np.random.default_rng(0)
+    loaders = {}
+    for key, n in (("pIC50", 64), ("pKd", 16)):
+        X = rng.random((n, 4), dtype="float32")
+        y = X.sum(axis=1) + (1 if key == "pKd" else 0)
+        loaders[key] = StackedTorchDataset(X, y, device="cpu").as_dataloader(batch_size=8)
+    return loaders
+
+
+def test_interleaved_training_loop():
+    from kinoml.ml.torch_loops import interleaved_training_loop
+
+    torch.manual_seed(0)
+    loaders = _loaders()
+    observation_models = {"pIC50": lambda x: x, "pKd": lambda x: x + 1}
+    model = torch.nn.Linear(4, 1)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.05)
+    steps = []
+    step = optimizer.step
+    optimizer.step = lambda: steps.append(1) or step()
+
+    _, history = interleaved_training_loop(
+        loaders,
+        observation_models,
+        model,
+        optimizer,
+        torch.nn.MSELoss(),
+        epochs=20,
+        accumulation_steps=3,
+        random_state=0,
+    )
+    assert len(history) == 20 and len(steps) == 20 * 4  # 10 batches per epoch
+    first, last = history[0], history[-1]
+    assert first["samples"] == 80 and set(first["loss_by_type"]) == {"pIC50", "pKd"}
+    assert last["loss"] < first["loss"]
+    assert first["samples_per_second"] > 0 and first["data_time"] > 0
+
+    _, history = interleaved_training_loop(
+        loaders,
+        observation_models,
+        model,
+        optimizer,
+        torch.nn.MSELoss(),
+        epochs=1,
+        ratios={"pIC50": 0, "pKd": 1},
+    )
+    assert history[0]["samples"] == 80 and list(history[0]["loss_by_type"]) == ["pKd"]
+
+
+def test_interleaved_training_loop_accumulation_and_ratios():
+    import pytest
+    from kinoml.datasets.torch_datasets import StackedTorchDataset
+    from kinoml.ml.torch_loops import interleaved_training_loop
+
+    # 4 identical batches: a group of 3 and a last group of 1
+    X, y = np.ones((32, 4), dtype="float32"), np.zeros(32, dtype="float32")
+    loaders = {"pIC50": StackedTorchDataset(X, y, device="cpu").as_dataloader(batch_size=8)}
+    observation_models = {"pIC50": lambda x: x}
+    model = torch.nn.Linear(4, 1)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0)
+    gradients = []
+    step = optimizer.step
+    optimizer.step = lambda: gradients.append(model.weight.grad.clone()) or step()
+    args = (loaders, observation_models, model, optimizer, torch.nn.MSELoss())
+    interleaved_training_loop(*args, epochs=1, accumulation_steps=3)
+    assert len(gradients) == 2
+    # the last group is averaged over its own size, not over accumulation_steps
+    assert torch.allclose(gradients[0], gradients[1])
+
+    for ratios in ({"pIC50": 0}, {"pKd": 1}, {"pIC50": -1}, {"pIC50": float("nan")}):
+        with pytest.raises(ValueError, match="ratios"):
+            interleaved_training_loop(*args, epochs=1, ratios=ratios)